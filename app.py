@@ -58,12 +58,18 @@ from managers.feedback_manager import FeedbackManager
 from src.utils.session_saver import save_to_json, load_from_json, save_to_sqlite
 from src.managers.guided_rag import GuidedRAG
 from sessions.answer_session import AnswerSession
-from src.sessions.context_tracker import add_context_entry, generate_following_action
+from src.sessions.context_tracker import add_context_entry_async, collect_context_entries
 from src.utils.prompt_builder import generate_option_notes
-from src.components.intro_fragment import render_intro_fragment
+from src.components.intro_fragment import (
+    render_intro_fragment,
+    render_suggestion_fragment,
+    set_next_suggestion,
+    clear_next_suggestion,
+)
 from src.components.question_guide_fragment import render_question_guide
-from src.utils.prompt_builder import generate_user_friendly_prompt
 from src.components.chatbox_fragment import render_chatbox
+from src.utils.prefetcher import get_prefetcher, plan_prefetch, current_session_key
+from src.utils.suggestion_store import lookup_suggestion
 
 from src.managers.profile_manager import get_user_profile
 user_profile = get_user_profile()
@@ -160,10 +166,25 @@ session: AnswerSession = st.session_state["session"]
 current_q = session.get_current_question()
 if not current_q:
     st.success("🎉 您已完成本階段問卷！")
+    render_suggestion_fragment(None)  # 最後一題的建議
     st.stop()
 
 qid = current_q["id"]
 
+# ✅ 背景預讀：取回已完成的結果，並預讀本題作答區與之後幾題的內容（換題時自動取消範圍外的工作）
+prefetcher = get_prefetcher()
+prefetch_key = current_session_key()
+for pqid, fields in prefetcher.collect(prefetch_key).items():
+    st.session_state["gpt_prefetch"].setdefault(pqid, {}).update(fields)
+collect_context_entries()  # 上一題提交時於背景產生的摘要
+prefetcher.schedule(
+    prefetch_key,
+    plan_prefetch(session.question_set, session.current_index, st.session_state, user_profile=user_profile),
+    user_profile,
+    tone=st.session_state.get("preferred_tone", "gentle"),
+    keep=[(qid, "prompt")]  # 換題前已開始預讀的本題導讀繼續執行，導論區塊直接取用
+)
+
 ready_flag = f"q{qid}_ready"
 selected_key = f"selected_{qid}"
 
@@ -176,15 +197,17 @@ if selected_key not in st.session_state:
 if not st.session_state[ready_flag]:
     is_first = session.question_set.index(current_q) == 0
 
-    # ✅ 讀取快取或即時生成導論語
+    # ✅ 讀取預讀快取；未預讀時由導論 fragment 串流生成
     cached = st.session_state["gpt_prefetch"].get(qid, {})
-    intro_prompt = cached.get("prompt") or generate_user_friendly_prompt(current_q, user_profile)
+    intro_prompt = cached.get("prompt")
+    if not intro_prompt and f"goal_note_{qid}" not in st.session_state:
+        intro_prompt = prefetcher.wait_for(prefetch_key, qid, "prompt")  # 預讀仍在執行時等待，避免重複呼叫
 
     render_intro_fragment(
         current_q=current_q,
+        user_profile=user_profile,
         is_first_question=is_first,
-        intro_prompt=intro_prompt,
-        previous_suggestion=st.session_state.get("last_suggestion", "")
+        intro_prompt=intro_prompt
     )
 
     with st.form(f"ready_form_{qid}"):
@@ -197,6 +220,7 @@ if st.session_state[ready_flag]:
     st.markdown(f"### 📝 ：{current_q.get('text', '（無題目內容）')}")
 
 
+    render_suggestion_fragment(qid)  # 已準備作答（重新造訪的題目）仍顯示剛提交的上一題建議
     render_question_guide(current_q)  # 這行非常重要，記得保留！
 
     # ✅ 初始化選項與補充說明（避免 notes 未定義）
@@ -265,22 +289,26 @@ if st.session_state[ready_flag]:
                 st.warning("⚠️ 請先作答再繼續")
             else:
                 session.submit_response(st.session_state[selected_key])
-                add_context_entry(qid, st.session_state[selected_key], current_q["text"])
+                add_context_entry_async(qid, st.session_state[selected_key], current_q["text"])
                 save_to_json(session)
 
-                try:
-                    selected = st.session_state[selected_key]
-                    if isinstance(selected, list):
-                        full_answer = "、".join(selected)
-                    else:
-                        full_answer = selected  # 單選題直接是字串
-                    suggestion = generate_following_action(current_q, full_answer, user_profile)
-                except Exception as e:
-                    suggestion = f"⚠️ 無法產生建議：{e}"
-
-                st.session_state["last_suggestion"] = suggestion
-                st.session_state["show_suggestion_box"] = True
+                selected = st.session_state[selected_key]
+                if isinstance(selected, list):
+                    full_answer = "、".join(selected)
+                else:
+                    full_answer = selected  # 單選題直接是字串
+
+                # ✅ 單選題先查預先計算的建議；查不到時於下一個畫面串流產生（與背景摘要並行）
                 session.go_forward()
+                next_q = session.get_current_question()
+                set_next_suggestion(
+                    current_q,
+                    full_answer,
+                    user_profile,
+                    target_qid=next_q["id"] if next_q else None,
+                    text=lookup_suggestion(current_q, selected, user_profile)
+                )
+                st.session_state["show_suggestion_box"] = True
                 st.rerun()
 
 
@@ -301,25 +329,16 @@ if st.session_state.get("jump_to"):
     index = next((i for i, item in enumerate(session.question_set) if item["id"] == qid), None)
     if index is not None:
         session.jump_to(index)
+        clear_next_suggestion()
 
-        # ✅ [第五步] 補快取：若該題尚未預讀，立即補上
-        if qid not in st.session_state["gpt_prefetch"]:
-            try:
-                from src.utils.prompt_builder import generate_user_friendly_prompt
-                from src.utils.prompt_builder import generate_option_notes
-
-
-                q = session.question_set[index]
-                prompt = generate_user_friendly_prompt(q, user_profile)
-                notes = generate_option_notes(q, user_profile)
-
-                st.session_state["gpt_prefetch"][qid] = {
-                    "prompt": prompt,
-                    "option_notes": notes
-                }
-                print(f"✅ 跳題補快取完成：{qid}")
-            except Exception as e:
-                print(f"⚠️ 跳題補快取失敗：{qid} - {e}")
+        # ✅ [第五步] 補快取：改由背景預讀目標題（含導讀）與之後幾題，不阻塞畫面
+        prefetcher.schedule(
+            prefetch_key,
+            plan_prefetch(session.question_set, index, st.session_state, include_current_prompt=True,
+                          user_profile=user_profile),
+            user_profile,
+            tone=st.session_state.get("preferred_tone", "gentle")
+        )
 
     st.session_state["jump_to"] = None
 
@@ -381,4 +400,5 @@ if session.current_index >= len(session.question_set):
 
                 # 產生新 session
                 st.session_state.session = AnswerSession(user_id=user_id, question_set=new_qset)
+                clear_next_suggestion()
                 st.rerun()
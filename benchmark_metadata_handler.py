@@ -0,0 +1,124 @@
+# benchmark_metadata_handler.py
+"""
+比較 MetadataHandler 關鍵字分類的效能（逐一關鍵字比對 vs. 單一編譯 regex）
+- 段落來源：data/db_pdf_data 中的 PDF（依目前的分段設定），或以 --synthetic 產生的模擬段落
+- 同時確認兩種實作的主題／產業／語言結果完全一致
+用法：
+    python benchmark_metadata_handler.py
+    python benchmark_metadata_handler.py --max-pdfs 20 --repeat 5
+    python benchmark_metadata_handler.py --synthetic 20000
+"""
+
+import argparse
+import random
+import re
+import time
+from pathlib import Path
+
+from vector_builder.metadata_handler import MetadataHandler, load_keyword_tables
+
+
+class LegacyClassifier:
+    """原本的實作：每個段落轉小寫後，逐類別逐關鍵字以 in 比對；語言以 findall 計數"""
+
+    def __init__(self):
+        tables = load_keyword_tables()
+        self.topic_keywords = tables["topic"]
+        self.industry_keywords = tables["industry"]
+
+    def detect_language(self, text: str) -> str:
+        chinese_char_count = len(re.findall(r'[一-鿿]', text))
+        total_char_count = len(text.strip())
+        if total_char_count == 0:
+            return "en"
+        return "zh" if chinese_char_count / total_char_count > 0.1 else "en"
+
+    def extract_topic(self, pdf_path: Path, text: str) -> str:
+        path_parts = pdf_path.parts
+        if "international" in path_parts:
+            return path_parts[path_parts.index("international") + 1].lower()
+        text_lower = text.lower()
+        for topic, kws in self.topic_keywords.items():
+            if any(kw.lower() in text_lower or kw.lower() in pdf_path.stem.lower() for kw in kws):
+                return topic
+        return "general"
+
+    def extract_industry(self, pdf_path: Path, text: str) -> str:
+        if "cases" in pdf_path.parts:
+            text_lower = text.lower()
+            for industry, keywords in self.industry_keywords.items():
+                if any(kw.lower() in text_lower or kw.lower() in pdf_path.stem.lower() for kw in keywords):
+                    return industry
+        return "cross_industry"
+
+    def classify(self, pdf_path: Path, text: str) -> dict:
+        return {
+            "main_topic": self.extract_topic(pdf_path, text),
+            "industry": self.extract_industry(pdf_path, text),
+            "language": self.detect_language(text)
+        }
+
+
+def load_corpus_chunks(base_dir: Path, max_pdfs: int) -> list:
+    from vector_builder.pdf_processor import PDFProcessor
+
+    processor = PDFProcessor()
+    chunks = []
+    for pdf_path in sorted(base_dir.rglob("*.pdf"))[:max_pdfs or None]:
+        try:
+            # 分類時與建置相同，以 metadata 的 source 建立路徑
+            chunks.extend((Path(meta["source"]), text) for text, meta in processor.iter_chunks(pdf_path))
+        except Exception as e:
+            print(f"⚠️ 略過 {pdf_path.name}：{e}")
+    return chunks
+
+
+def synthetic_chunks(count: int) -> list:
+    rng = random.Random(42)
+    tables = load_keyword_tables()
+    words = [kw for table in tables.values() for kws in table.values() for kw in kws]
+    filler = list("溫室氣體盤查排放範疇邊界量化報告") + ["emission", "scope", "boundary", "report", "inventory"]
+    chunks = []
+    for i in range(count):
+        tokens = [rng.choice(filler) for _ in range(200)]
+        tokens.insert(rng.randrange(len(tokens)), rng.choice(words))
+        chunks.append((Path(f"case_{i % 50}.pdf"), "".join(tokens) if i % 2 else " ".join(tokens)))
+    return chunks
+
+
+def timed(label: str, fn, chunks: list, repeat: int):
+    best, results = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [fn(pdf_path, text) for pdf_path, text in chunks]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<12} {best * 1000:10.1f} ms   {len(chunks) / best:12.0f} 段/秒")
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MetadataHandler 關鍵字分類效能比較")
+    parser.add_argument("--pdf-dir", default="data/db_pdf_data")
+    parser.add_argument("--max-pdfs", type=int, default=0, help="最多讀取的 PDF 數（0 表示全部）")
+    parser.add_argument("--synthetic", type=int, default=0, help="改用 N 筆模擬段落")
+    parser.add_argument("--repeat", type=int, default=3, help="重複次數（取最快一次）")
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.synthetic) if args.synthetic else load_corpus_chunks(Path(args.pdf_dir), args.max_pdfs)
+    if not chunks:
+        print("⚠️ 沒有可測試的段落")
+        return
+    print(f"📄 段落數：{len(chunks)}，總字元數：{sum(len(text) for _, text in chunks)}\n")
+
+    legacy = LegacyClassifier()
+    handler = MetadataHandler()
+    legacy_time, expected = timed("逐一比對", legacy.classify, chunks, args.repeat)
+    compiled_time, actual = timed("編譯 regex", handler._classify, chunks, args.repeat)
+
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+    print(f"\n⚡ 加速 {legacy_time / compiled_time:.1f} 倍；結果不一致：{mismatches} 筆")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmark_vector_index.py
+"""
+比較不同 FAISS 索引類型（flat / ivf_flat / hnsw / ivf_pq）的召回率與查詢延遲
+- 以 flat（精確搜尋）結果作為標準答案，計算 recall@k
+- 向量來源：既有的向量資料夾（須為 flat 索引），或隨機產生的模擬語料
+- 查詢語句：data/ 中各產業題庫的題目文字
+用法：
+    python benchmark_vector_index.py --vector-dir "data/vector_output_hf/ISO 14064-1"
+    python benchmark_vector_index.py --synthetic 200000
+"""
+
+import argparse
+import csv
+import time
+from pathlib import Path
+
+import numpy as np
+
+from vector_builder.vector_store import VectorStore, INDEX_TYPES
+
+QUESTION_FILES = ["Hotel.csv", "Logistics.csv", "Offices.csv", "Restaurant.csv", "Retail.csv", "SmallManufacturing.csv"]
+
+
+def load_question_texts(data_dir: Path, limit: int) -> list:
+    texts = []
+    for name in QUESTION_FILES:
+        path = data_dir / name
+        if not path.exists():
+            continue
+        with open(path, "r", encoding="utf-8-sig") as f:
+            texts.extend(row["question_text"] for row in csv.DictReader(f) if row.get("question_text"))
+    return texts[:limit]
+
+
+def load_corpus_vectors(args, dimension: int) -> np.ndarray:
+    if args.synthetic:
+        rng = np.random.default_rng(42)
+        return rng.standard_normal((args.synthetic, dimension)).astype("float32")
+
+    store = VectorStore()
+    store.load(args.vector_dir)
+    if store.index_type != "flat":
+        raise ValueError("基準比較需使用 flat 索引建置的向量資料夾")
+    _, vectors = store.reconstruct_all()  # 依向量 ID 讀回（增量建置移除過向量時 ID 不連續）
+    return vectors
+
+
+def run_queries(store: VectorStore, query_vecs: np.ndarray, top_k: int):
+    start = time.perf_counter()
+    indices = np.vstack([store.index.search(q[None, :], top_k)[1] for q in query_vecs])
+    elapsed_ms = (time.perf_counter() - start) * 1000 / len(query_vecs)
+    return indices, elapsed_ms
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray) -> float:
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS 索引類型召回率／延遲比較")
+    parser.add_argument("--vector-dir", default="data/vector_output_hf/ISO 14064-1")
+    parser.add_argument("--synthetic", type=int, default=0, help="改用 N 筆隨機向量模擬大型語料")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=100)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    args = parser.parse_args()
+
+    base = VectorStore(index_type="flat")
+    corpus = load_corpus_vectors(args, base.dimension)
+    texts = load_question_texts(Path("data"), args.queries)
+    query_vecs = base.backend.embed(texts)
+
+    print(f"📊 語料向量：{len(corpus)} 筆，查詢：{len(query_vecs)} 筆，top_k={args.top_k}\n")
+
+    base.add_vectors(corpus, [{}] * len(corpus))
+    truth, flat_ms = run_queries(base, query_vecs, args.top_k)
+
+    rows = [("flat", "-", 0.0, 1.0, flat_ms)]
+    for index_type in INDEX_TYPES[1:]:
+        store = VectorStore(index_type=index_type, nlist=args.nlist)
+        start = time.perf_counter()
+        store.add_vectors(corpus, [{}] * len(corpus))
+        store.build()
+        build_s = time.perf_counter() - start
+
+        if index_type == "hnsw":
+            sweep = [("efSearch", v, {"ef_search": v}) for v in args.ef_search]
+        else:
+            sweep = [("nprobe", v, {"nprobe": v}) for v in args.nprobe]
+
+        for name, value, params in sweep:
+            store.set_search_params(**params)
+            found, ms = run_queries(store, query_vecs, args.top_k)
+            rows.append((store.index_type, f"{name}={value}", build_s, recall_at_k(truth, found), ms))
+
+    print(f"{'索引類型':<10}{'查詢參數':<16}{'建置秒數':>10}{'recall@k':>10}{'毫秒/查詢':>12}")
+    print("-" * 58)
+    for index_type, param, build_s, recall, ms in rows:
+        print(f"{index_type:<10}{param:<16}{build_s:>10.2f}{recall:>10.3f}{ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# build_followup_suggestions.py
+"""
+離線預先產生單選題的「下一步行動建議」
+- 讀取 data/ 下各產業題庫（全部難度）中的單選題
+- 每個 (題目, 選項, 產業 × 角色分群) 呼叫一次 GPT，結果寫入 data/sqlite/followup_suggestions.sqlite
+- 已產生且題目未修改的組合自動略過，中斷後重跑會接續；題庫修改後重跑即可補上
+提交答案時先查此表，命中即直接顯示建議，不必等待 GPT
+"""
+
+import argparse
+import time
+
+from src.loaders.question_loader import INDUSTRY_FILE_MAP, load_question_bank
+from src.utils.suggestion_store import (
+    ROLE_OPTIONS,
+    SUGGESTION_DB_PATH,
+    SuggestionStore,
+    is_precomputable,
+    precompute_suggestions,
+    profile_bucket,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="單選題下一步建議預先產生")
+    parser.add_argument("--industry", nargs="*", choices=list(INDUSTRY_FILE_MAP),
+                        help="只產生指定產業（預設全部）")
+    parser.add_argument("--role", nargs="*", choices=ROLE_OPTIONS, help="只產生指定角色（預設全部）")
+    parser.add_argument("--workers", type=int, default=4, help="同時送出的 GPT 請求數")
+    parser.add_argument("--overwrite", action="store_true", help="已存在的組合也重新產生")
+    parser.add_argument("--dry-run", action="store_true", help="只計算需要產生的組合數")
+    parser.add_argument("--output", default=str(SUGGESTION_DB_PATH))
+    args = parser.parse_args()
+
+    store = SuggestionStore(args.output)
+    roles = args.role or ROLE_OPTIONS
+    start = time.perf_counter()
+    totals = {"total": 0, "skipped": 0, "stored": 0, "failed": 0}
+
+    # 分群的產業為前導問卷選的產業，與題庫檔案一一對應
+    for industry in args.industry or list(INDUSTRY_FILE_MAP):
+        questions = [q for q in load_question_bank([industry]) if is_precomputable(q)]
+        profiles = [{"industry": industry, "role": role} for role in roles]
+        if args.dry_run:
+            count = sum(len(store.missing_answers(q, profile_bucket(p))) for q in questions for p in profiles)
+            print(f"📚 {industry}：{len(questions)} 題單選題，待產生 {count} 筆")
+            continue
+
+        print(f"📚 {industry}：{len(questions)} 題單選題 × {len(roles)} 個角色，開始產生...")
+        stats = precompute_suggestions(questions, profiles, store, workers=args.workers, overwrite=args.overwrite)
+        for key in totals:
+            totals[key] += stats[key]
+        print(f"✅ {industry}：寫入 {stats['stored']} 筆，略過 {stats['skipped']} 筆，失敗 {stats['failed']} 筆")
+
+    if not args.dry_run:
+        print(f"✅ 完成：共 {totals['total']} 個組合，寫入 {totals['stored']}，略過 {totals['skipped']}，失敗 {totals['failed']}")
+        print(f"⏱️ 耗時 {time.perf_counter() - start:.1f} 秒，輸出：{args.output}")
+
+
+if __name__ == "__main__":
+    main()
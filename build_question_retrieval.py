@@ -0,0 +1,37 @@
+# build_question_retrieval.py
+"""
+離線預先計算題庫每一題的 RAG 檢索結果
+- 讀取 data/ 下所有產業題庫（全部難度）
+- 依 get_rag_doc_for_question 決定向量資料夾，批次查詢 top-k 段落
+- 只儲存段落的向量 ID 與分數（question_retrieval.npz），執行時依 ID 取段落
+向量庫重建後請重新執行本程式（版本不符的題目會自動改走即時查詢）
+"""
+
+import argparse
+import time
+
+from src.loaders.question_loader import load_question_bank
+from src.utils.rag_retriever import RAGRetriever
+from src.utils.question_retrieval import build_question_retrieval, QUESTION_RETRIEVAL_PATH, PRECOMPUTED_TOP_K
+
+
+def main():
+    parser = argparse.ArgumentParser(description="題庫 RAG 檢索預先計算")
+    parser.add_argument("--vector-root", default="data/vector_output_hf")
+    parser.add_argument("--top-k", type=int, default=PRECOMPUTED_TOP_K)
+    parser.add_argument("--output", default=str(QUESTION_RETRIEVAL_PATH))
+    args = parser.parse_args()
+
+    questions = load_question_bank()
+    print(f"📚 題庫共 {len(questions)} 題，開始預先檢索...")
+
+    start = time.perf_counter()
+    retriever = RAGRetriever(vector_root=args.vector_root, use_cache=False)
+    stats = build_question_retrieval(questions, retriever, top_k=args.top_k, output_path=args.output)
+
+    print(f"✅ 完成：寫入 {stats['stored']} 題，略過 {stats['skipped']} 題（找不到向量庫）")
+    print(f"⏱️ 耗時 {time.perf_counter() - start:.1f} 秒，輸出：{args.output}")
+
+
+if __name__ == "__main__":
+    main()
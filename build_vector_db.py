@@ -0,0 +1,375 @@
+# build_vector_db.py
+"""
+向量資料庫建置腳本（唯一入口）
+處理 PDF 並建立 FAISS 向量與 metadata，並記錄已處理檔案
+- 嵌入後端由 config/config.yaml 的 embedding 區段或命令列選擇：
+  sentence-transformers（本機，不會產生 OpenAI 費用）、openai、http（本機相容服務）
+- 向量維度與模型名稱一律取自後端
+用法：
+    python build_vector_db.py --unified
+    python build_vector_db.py --backend openai --model text-embedding-3-small --tokens-per-minute 500000
+"""
+
+from pathlib import Path
+import argparse
+import logging
+import shutil
+from typing import Callable, Dict, Optional
+from tqdm import tqdm
+from vector_builder.build_record import BuildRecord, build_fingerprint, apply_plan_to_store
+from vector_builder.pdf_processor import PDFProcessor
+from vector_builder.metadata_handler import METADATA_VERSION
+from vector_builder.ingest import iter_parsed_pages, parse_pdf
+from vector_builder.pipeline import iter_embedded_batches
+from vector_builder.spool import BuildSpool, resume_point, canonical_texts, SPOOL_DIR_NAME
+from vector_builder.dedup import ChunkDeduplicator, merge_duplicates
+from vector_builder.embedding_cache import EmbeddingCache
+from vector_builder.profiler import BuildProfiler, directory_bytes, format_summary
+from vector_builder.embedding_backends import BACKENDS, EmbeddingBackend, create_backend
+from vector_builder.vector_store import VectorStore, INDEX_TYPES, CORPUS_DIR_NAME
+
+
+# 各後端預設的輸出資料夾（沿用原本兩支建置腳本的位置）
+DEFAULT_OUTPUT_DIRS = {
+    "sentence-transformers": "data/vector_output_hf",
+    "openai": "data/vector_output",
+    "http": "data/vector_output_http",
+}
+CONFIG_PATH = "config/config.yaml"
+
+
+def load_embedding_config(path: str) -> Dict:
+    """讀取設定檔的 embedding 區段（檔案不存在或未安裝 PyYAML 時回傳空設定）"""
+    config_path = Path(path)
+    if not config_path.exists():
+        return {}
+    try:
+        import yaml
+    except ImportError:
+        logging.warning("⚠️ 未安裝 PyYAML，略過 %s", config_path)
+        return {}
+    with open(config_path, "r", encoding="utf-8") as f:
+        return (yaml.safe_load(f) or {}).get("embedding") or {}
+
+
+def build_backend(args) -> EmbeddingBackend:
+    """設定檔的 embedding 區段為預設值，命令列參數優先；指定不同後端時不沿用設定檔的參數"""
+    config = load_embedding_config(args.config)
+    name = args.backend or config.get("backend") or "sentence-transformers"
+    options = dict(config) if config.get("backend", name) == name else {}
+    options.pop("backend", None)
+    if "model" in options:
+        options["model_name"] = options.pop("model")
+    cli_options = {
+        "model_name": args.model,
+        "batch_size": args.batch_size,
+        "max_concurrency": args.concurrency,
+        "tokens_per_minute": args.tokens_per_minute,
+        "dimensions": args.dimensions,
+        "url": args.url,
+    }
+    options.update({k: v for k, v in cli_options.items() if v is not None})
+    # 只有特定後端使用的參數
+    if name != "openai":
+        options.pop("dimensions", None)
+    if name != "http":
+        options.pop("url", None)
+    return create_backend(name, **options)
+
+
+def update_pdf_dirs(record: BuildRecord, plan, output_dir: Path, base_dir: Path, pdf_paths,
+                    new_store: Callable[[], VectorStore], dedup: bool = True) -> list:
+    """
+    單檔索引模式：刪除已移除檔案的向量資料夾；搬移的檔案沿用向量、只更新 metadata 與資料夾名稱。
+    回傳需重新嵌入的檔案。
+    """
+    current_dirs = {p.stem.strip() for p in pdf_paths}
+    for sha in plan.removed:
+        entry = record.drop(sha)
+        old_dir = entry.get("output") if entry else None
+        if old_dir and old_dir not in current_dirs:
+            shutil.rmtree(output_dir / old_dir, ignore_errors=True)
+            logging.info(f"移除：{old_dir}")
+
+    to_embed = []
+    for pdf_path, sha in plan.moved:
+        old_dir = output_dir / record.files[sha].get("output", pdf_path.stem.strip())
+        new_dir = output_dir / pdf_path.stem.strip()
+        store = new_store()
+        metadata_list = parse_pdf(pdf_path, base_dir)
+        if dedup:
+            metadata_list = merge_duplicates(metadata_list)   # 與建置時相同的檔案內去重，才能與向量數對應
+        if not store.exists(old_dir) or len(metadata_list) != record.files[sha].get("chunks"):
+            record.drop(sha)
+            to_embed.append((pdf_path, sha))
+            continue
+        store.load(old_dir)
+        store.replace_metadata([vector_id for vector_id, _ in store.iter_metadata()], metadata_list)
+        store.save(new_dir)
+        if new_dir != old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+        record.set(sha, pdf_path, base_dir, output=new_dir.name)
+        logging.info(f"搬移：{pdf_path.name}（沿用 {len(metadata_list)} 筆向量）")
+    return to_embed
+
+def parse_args(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="建立 FAISS 向量資料庫")
+    parser.add_argument("--backend", choices=list(BACKENDS), help="嵌入後端（預設取自設定檔，否則為 sentence-transformers）")
+    parser.add_argument("--model", help="嵌入模型名稱（預設依後端）")
+    parser.add_argument("--config", default=CONFIG_PATH, help="設定檔（讀取 embedding 區段）")
+    parser.add_argument("--output-dir", help="輸出資料夾（預設依後端）")
+    parser.add_argument("--concurrency", type=int, help="同時進行的嵌入請求數（API 後端）")
+    parser.add_argument("--tokens-per-minute", type=int, help="每分鐘 token 上限（API 後端節流）")
+    parser.add_argument("--dimensions", type=int, help="OpenAI text-embedding-3 系列的輸出維度")
+    parser.add_argument("--url", help="http 後端的服務網址")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat",
+                        help="索引類型：flat（精確）、ivf_flat / hnsw / ivf_pq（近似搜尋）")
+    parser.add_argument("--nlist", type=int, default=100, help="IVF 分群數（依資料量自動下修）")
+    parser.add_argument("--nprobe", type=int, default=8, help="IVF 查詢時掃描的分群數")
+    parser.add_argument("--ef-search", type=int, default=64, help="HNSW 查詢候選數")
+    parser.add_argument("--workers", type=int, default=1, help="平行解析 PDF 的行程數（結果與順序不受影響）")
+    parser.add_argument("--no-embedding-cache", action="store_true",
+                        help="不使用段落嵌入快取（data/cache/embeddings），全部重新嵌入")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="不合併跨文件的重複／近似重複段落（預設只保留一個代表向量並記錄所有來源）")
+    parser.add_argument("--batch-size", type=int, help="每批嵌入的段落數（預設依後端）")
+    parser.add_argument("--unified", action="store_true",
+                        help=f"所有 PDF 寫入同一個索引（{CORPUS_DIR_NAME}/），查詢時以 metadata 過濾來源")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[list] = None):
+    args = parse_args(argv)
+    backend = build_backend(args)
+    index_options = {
+        "index_type": args.index_type,
+        "nlist": args.nlist,
+        "nprobe": args.nprobe,
+        "ef_search": args.ef_search
+    }
+    # ✅ 模型與維度由後端決定，索引、嵌入快取與建置紀錄皆以此為準
+    new_store = lambda: VectorStore(backend=backend, **index_options)
+    vector_store = new_store()
+
+    base_dir = Path("data/db_pdf_data")
+    output_dir = Path(args.output_dir or DEFAULT_OUTPUT_DIRS.get(backend.name, f"data/vector_output_{backend.name}"))
+
+    corpus_dir = output_dir / CORPUS_DIR_NAME
+
+    log_file = output_dir / "build_log.txt"
+    # 整合模式使用獨立的建置紀錄，避免與單檔索引互相略過
+    record_file = (corpus_dir if args.unified else output_dir) / "vector_build_record.json"
+    # 去重開關會改變索引內容，一併列入指紋
+    chunker_settings = dict(PDFProcessor().settings(), dedup=not args.no_dedup, metadata=METADATA_VERSION)
+    fingerprint = build_fingerprint(chunker_settings, vector_store.model_name,
+                                    vector_store.dimension, args.index_type)
+    record = BuildRecord(record_file, fingerprint)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    logging.basicConfig(
+        filename=log_file,
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s"
+    )
+
+    print(f"開始向量資料庫建置...（{backend.name}：{backend.model_name}，{backend.dimension} 維）")
+    logging.info("=== 啟動建置程序 ===")
+    logging.info(f"嵌入後端：{backend.describe()}")
+    if record.stale:
+        print("⚠️ 建置紀錄為舊版或分段／模型／索引設定已變更，將完整重建")
+        logging.info("建置紀錄失效，完整重建")
+
+    folder_list = ["cases", "international", "taiwan"]
+    # 排序確保每次建置（不論 worker 數）的處理順序一致
+    pdf_paths = sorted(p for folder in folder_list for p in (base_dir / folder).rglob("*.pdf"))
+
+    if args.unified:
+        corpus_dir.mkdir(parents=True, exist_ok=True)
+        if record.files and vector_store.exists(corpus_dir):
+            loaded = False
+            try:
+                vector_store.load(corpus_dir)  # ✅ 延續既有整合索引，只處理有變動的檔案
+                loaded = True
+            except RuntimeError as e:
+                logging.error(f"整合索引無法載入：{e}")
+                vector_store = new_store()
+            if not (loaded and record.matches_index(vector_store.index_version)):
+                # 儲存索引後、寫入建置紀錄前中斷：紀錄與索引內容不符，不能增量更新
+                print("⚠️ 建置紀錄與整合索引不一致（前次建置可能於儲存時中斷），將完整重建")
+                logging.info("建置紀錄與索引不一致，完整重建")
+                record.reset()
+
+    # ✅ 以內容雜湊比對：未變動略過、搬移只更新 metadata、修改或刪除則移除舊向量
+    plan = record.plan(pdf_paths, base_dir)
+    print(f"🟡 未變動：{len(plan.unchanged)}，新增／修改：{len(plan.added)}，"
+          f"搬移：{len(plan.moved)}，移除：{len(plan.removed)}")
+
+    if args.unified:
+        # 移除與搬移先套用在記憶體中的索引，紀錄於最後儲存索引後才寫回
+        to_embed = plan.added + apply_plan_to_store(vector_store, record, plan, base_dir, dedup=not args.no_dedup)
+    else:
+        to_embed = plan.added + update_pdf_dirs(record, plan, output_dir, base_dir, pdf_paths, new_store,
+                                                 dedup=not args.no_dedup)
+        record.save()
+
+    # ✅ 串流管線：頁段解析 → 批次嵌入 → 每批寫入暫存區，記憶體用量與語料大小無關
+    spool_root = output_dir / SPOOL_DIR_NAME
+    shas = {pdf_path: sha for pdf_path, sha in to_embed}
+
+    def spool_dir_for(pdf_path: Path) -> Path:
+        return spool_root / (CORPUS_DIR_NAME if args.unified else pdf_path.stem.strip())
+
+    # 各階段耗時與計數，建置結束時寫入 build_profile.json
+    profiler = BuildProfiler(base_dir, backend=backend.name, model=backend.model_name, workers=args.workers,
+                             index_type=args.index_type, unified=args.unified, files=len(to_embed))
+    # ✅ 頁面檢查點：中斷的檔案從未完成的頁繼續解析，已寫入的段落不再嵌入
+    resume_points = {}
+
+    def resume_for(pdf_path: Path):
+        if pdf_path not in resume_points:
+            point = resume_point(spool_dir_for(pdf_path), shas[pdf_path])
+            if point.start_page or point.skip_chunks:
+                logging.info(f"續傳：{pdf_path.name} 自第 {point.start_page + 1} 頁起（略過 {point.skip_chunks} 段）")
+            resume_points[pdf_path] = point
+        return resume_points[pdf_path]
+
+    parsed = iter_parsed_pages([pdf_path for pdf_path, _ in to_embed], base_dir, workers=args.workers,
+                               profiler=profiler, start_page_fn=lambda pdf_path: resume_for(pdf_path).start_page)
+    embed_fn = backend.embed
+    embedding_cache = None
+    if not args.no_embedding_cache:
+        # ✅ 已嵌入過的段落（相同模型與文字）直接取用，重建索引幾乎不需重新嵌入
+        embedding_cache = EmbeddingCache(vector_store.model_name, vector_store.dimension)
+        embed_fn = embedding_cache.wrap(embed_fn)
+    # ✅ 跨文件去重：整合模式對整個語料去重（既有索引的段落先列為代表段落）；
+    # 單檔模式每份 PDF 各自一個索引，只在檔案內去重
+    dedupers = {}
+    existing_keys = {}
+
+    def new_deduper(pdf_path: Path) -> ChunkDeduplicator:
+        deduper = ChunkDeduplicator()
+        for key, text in canonical_texts(spool_dir_for(pdf_path)):  # 續傳時暫存區已有的代表段落
+            deduper.register(text, key)
+        return deduper
+
+    if not args.no_dedup and args.unified:
+        dedupers[CORPUS_DIR_NAME] = new_deduper(corpus_dir)
+        existing_keys = dedupers[CORPUS_DIR_NAME].register_store(vector_store)
+
+    def dedup_scope(pdf_path: Path):
+        return CORPUS_DIR_NAME if args.unified else pdf_path
+
+    def dedup_fn(pdf_path: Path, meta: dict) -> bool:
+        scope = dedup_scope(pdf_path)
+        if scope not in dedupers:
+            dedupers[scope] = new_deduper(pdf_path)
+        return dedupers[scope].check(meta, owner=pdf_path)
+
+    items = iter_embedded_batches(
+        parsed,
+        embed_fn,
+        batch_size=backend.batch_size,
+        skip_fn=lambda pdf_path: resume_for(pdf_path).skip_chunks,
+        dedup_fn=None if args.no_dedup else dedup_fn,
+        profiler=profiler
+    )
+
+    spool = BuildSpool(spool_root / CORPUS_DIR_NAME, vector_store.dimension, fingerprint) if args.unified else None
+    progress = tqdm(total=len(to_embed), desc="📁 總體進度")
+    current_pdf = None
+    for item in items:
+        pdf_path = item.pdf_path
+        file_id = shas[pdf_path]
+        if pdf_path != current_pdf:
+            current_pdf = pdf_path
+            print(f"\n📄 處理檔案：{pdf_path.name}")
+            logging.info(f"處理：{pdf_path.name}")
+            if not args.unified:
+                spool = BuildSpool(spool_dir_for(pdf_path), vector_store.dimension, fingerprint)
+
+        if not item.done:
+            with profiler.timed("write", pdf_path, chunks=len(item.metadata), bytes=item.vectors.nbytes):
+                spool.append(file_id, item.vectors, item.metadata)
+            if dedup_scope(pdf_path) in dedupers:
+                # 代表段落已落盤，其他檔案才可標記為其重複
+                dedupers[dedup_scope(pdf_path)].confirm(item.metadata)
+            continue
+
+        progress.update(1)
+        profiler.file_done(pdf_path)
+        current_pdf = None
+        if item.error:
+            # 已寫入暫存區的段落保留，下次建置從中斷處續傳
+            logging.error(f"PDF 處理失敗 ({pdf_path.name})：{item.error}")
+            if dedup_scope(pdf_path) in dedupers:
+                dedupers[dedup_scope(pdf_path)].discard(pdf_path)
+            if not args.unified:
+                spool.close()
+            continue
+
+        spool.mark_done(file_id)
+        if args.unified:
+            continue
+
+        try:
+            pdf_output_dir = output_dir / pdf_path.stem.strip()
+            with profiler.timed("index", pdf_path) as counts:
+                result = spool.finalize_into(new_store(), pdf_output_dir)  # ✅ 每一份 PDF 使用新 index
+                counts["bytes"] = directory_bytes(pdf_output_dir)
+            spool.remove()
+            chunks = sum(end - start for start, end in result.file_ranges.get(file_id, []))
+            record.set(file_id, pdf_path, base_dir, output=pdf_output_dir.name, chunks=chunks)
+            record.save()
+        except Exception as e:
+            spool.close()
+            logging.error(f"儲存向量失敗 ({pdf_path.name})：{e}")
+    progress.close()
+    if backend.stats["batches"]:
+        print(f"🔗 嵌入請求：{backend.stats['batches']} 批，重試 {backend.stats['retries']} 次")
+        logging.info(f"嵌入後端統計：{backend.stats}")
+    if embedding_cache is not None:
+        print(f"💾 嵌入快取：命中 {embedding_cache.stats['hits']}，新嵌入 {embedding_cache.stats['misses']}")
+        logging.info(f"嵌入快取：{embedding_cache.stats}")
+        embedding_cache.close()
+    if dedupers:
+        stats = {name: sum(d.stats[name] for d in dedupers.values()) for name in ("exact", "near", "unique")}
+        print(f"🧹 去重：完全重複 {stats['exact']}，近似重複 {stats['near']}，保留 {stats['unique']}")
+        logging.info(f"去重：{stats}")
+
+    if args.unified:
+        # 整合索引於全部檔案處理完才訓練與儲存一次（含前次中斷時已寫入暫存區的檔案）
+        spool.retain(list(shas.values()))
+        unfinished = set(spool.unfinished(list(shas.values())))
+        if plan.has_changes or spool.ready_count() > 0 or not vector_store.exists(corpus_dir):
+            with profiler.timed("index") as counts:
+                result = spool.finalize_into(vector_store, corpus_dir, existing_keys, record.id_owner())
+                counts.update(chunks=int(vector_store.index.ntotal), bytes=directory_bytes(corpus_dir))
+            for pdf_path, sha in to_embed:
+                # 已完成的檔案都記錄（沒有段落的掃描檔記為 0 段，否則每次建置都會被視為新增）
+                if sha not in unfinished:
+                    ranges = result.file_ranges.get(sha, [])
+                    chunks = sum(end - start for start, end in ranges)
+                    record.set(sha, pdf_path, base_dir, ids=ranges, chunks=chunks)
+            record.link(result.links)
+            record.index_version = vector_store.index_version
+            record.save()
+            logging.info(f"整合索引完成：共 {vector_store.index.ntotal} 筆向量")
+        else:
+            print("✅ 語料未變動，不需重建")
+        if unfinished:
+            # 失敗檔案已寫入的段落保留，下次建置從中斷處續傳
+            print(f"⚠️ {len(unfinished)} 份檔案未完成，保留暫存區供下次續傳")
+            spool.close()
+        else:
+            spool.remove()
+
+    report = profiler.save(output_dir)
+    print("\n⏱️ 建置效能（詳見 build_profile.json）")
+    print(format_summary(report))
+    logging.info(f"建置效能：{report['wall_seconds']} 秒，吞吐量 {report['throughput']}，峰值 RSS {report['peak_rss_mb']}")
+
+    print("✅ 建置完成！")
+    logging.info("=== 建置完成 ===")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
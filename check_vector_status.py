@@ -1,5 +1,5 @@
 # check_vector_status.py
-# ✅ 用絕對路徑比對已建檔案，並顯示相對路徑避免報錯
+# ✅ 依建置紀錄比對已建檔案（內容有修改者視為尚未建置），並顯示相對路徑
 
 import os
 import json
@@ -10,12 +10,13 @@ PDF_ROOT = Path("data/db_pdf_data").resolve()
 VECTOR_ROOT = Path("data/vector_output_hf")
 VECTOR_METADATA = VECTOR_ROOT / "vector_build_record.json"
 
-# === 讀取已建置紀錄（絕對路徑為 key） ===
+# === 讀取已建置紀錄（以內容雜湊為 key，比對相對路徑與檔案大小、修改時間） ===
 if VECTOR_METADATA.exists():
     with open(VECTOR_METADATA, "r", encoding="utf-8") as f:
         metadata = json.load(f)
 else:
     metadata = {}
+built = {entry["path"]: entry for entry in metadata.get("files", {}).values()}
 
 # === 掃描所有 PDF 並比對 ===
 missing_vectors = []
@@ -25,9 +26,10 @@ for folder_path, _, files in os.walk(PDF_ROOT):
     for fname in files:
         if fname.lower().endswith(".pdf"):
             full_path = Path(os.path.join(folder_path, fname)).resolve()
-            full_path_str = str(full_path)
+            entry = built.get(full_path.relative_to(PDF_ROOT).as_posix())
+            stat = full_path.stat()
 
-            if full_path_str in metadata:
+            if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
                 existing_vectors.append(full_path)
             else:
                 missing_vectors.append(full_path)
@@ -0,0 +1,43 @@
+# migrate_chunk_metadata.py
+"""
+將既有向量資料夾中的 chunk_metadata.json 轉換為 chunk_metadata.sqlite
+（不需重新嵌入，FAISS 索引維持不變）
+用法：
+    python migrate_chunk_metadata.py                       # 轉換 data/vector_output_hf 下所有資料夾
+    python migrate_chunk_metadata.py data/vector_output --remove-json
+"""
+
+import argparse
+from pathlib import Path
+
+from vector_builder.metadata_store import convert_json_metadata, METADATA_JSON_NAME, METADATA_DB_NAME
+
+
+def main():
+    parser = argparse.ArgumentParser(description="chunk_metadata.json → SQLite 轉換")
+    parser.add_argument("vector_root", nargs="?", default="data/vector_output_hf")
+    parser.add_argument("--remove-json", action="store_true", help="轉換後刪除原本的 JSON 檔")
+    parser.add_argument("--force", action="store_true", help="已存在 SQLite 時仍重新轉換")
+    args = parser.parse_args()
+
+    root = Path(args.vector_root)
+    json_files = sorted(root.rglob(METADATA_JSON_NAME))
+    if not json_files:
+        print(f"⚠️ {root} 下沒有需要轉換的 {METADATA_JSON_NAME}")
+        return
+
+    converted = 0
+    for json_path in json_files:
+        folder = json_path.parent
+        if (folder / METADATA_DB_NAME).exists() and not args.force:
+            print(f"🟡 略過已轉換：{folder}")
+            continue
+        if convert_json_metadata(folder, remove_json=args.remove_json):
+            converted += 1
+            print(f"✅ 已轉換：{folder}")
+
+    print(f"\n完成：共轉換 {converted} 個資料夾")
+
+
+if __name__ == "__main__":
+    main()
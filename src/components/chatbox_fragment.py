@@ -1,6 +1,6 @@
 import streamlit as st
 from sessions.context_tracker import get_conversation, add_turn
-from src.utils.gpt_tools import call_gpt
+from src.utils.gpt_tools import call_gpt_stream, render_stream
 from src.components.suggest_box import render_suggested_questions
 from src.utils.topic_to_rag_map import get_rag_doc_for_question  # ✅ 新增：自動選擇向量庫
 
@@ -50,16 +50,18 @@ def render_chatbox():
 
                 rag_doc = get_rag_doc_for_question(current_q)  # ✅ 自動判斷對應的向量資料夾
 
-                reply = call_gpt(
+                deltas = call_gpt_stream(
                     prompt=prompt,
                     question_text=current_q["text"],
                     learning_goal=current_q.get("learning_goal", ""),
                     chat_history=get_conversation(chat_id),
                     industry=st.session_state.get("industry", ""),
-                    rag_doc=rag_doc
+                    rag_doc=rag_doc,
+                    use_cache=False  # 自由對話不重複使用回應
                 )
 
-                placeholder.markdown(f"🧑 {reply}")
+                # ✅ 逐段顯示回覆，完整文字再寫入對話紀錄
+                reply = render_stream(placeholder, deltas, "🧑 {}", unsafe_allow_html=False)
                 add_turn(chat_id, prompt, reply)
                 st.session_state["asked_follow_ups"].add(prompt)
                 st.session_state["_trigger_chat_fragment"] = st.session_state.get("_trigger_chat_fragment", 0) + 1
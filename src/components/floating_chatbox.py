@@ -31,7 +31,7 @@ def render_floating_chatbox(question_id: str):
         user_input = st.chat_input("你想問什麼？", key="chat_input")
         if user_input:
             st.session_state[chat_key].append({"role": "user", "content": user_input})
-            response = call_gpt(user_input)
+            response = call_gpt(user_input, use_cache=False)  # 自由對話不重複使用回應
             st.session_state[chat_key].append({"role": "assistant", "content": response})
             st.session_state["_trigger_chat_refresh"] += 1  # ✅ 觸發聊天 fragment 更新
 
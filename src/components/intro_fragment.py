@@ -3,60 +3,141 @@ from src.utils.prompt_builder import (
     build_intro_welcome_prompt,
     generate_user_friendly_prompt,
 )
-from src.managers.guided_rag import GuidedRAG
-from src.managers.profile_manager import get_user_profile
+from src.utils.gpt_tools import render_stream
+from src.utils.llm_fanout import stream_in_background
+from src.sessions.context_tracker import generate_following_action
+
+INTRO_BOX = """<div class="ai-intro-box">{}</div>"""
+SUGGESTION_BOX = """
+<div class="ai-intro-box" style="background-color:#f8fff4; border-left: 5px solid #cddc39;">
+{}
+</div>
+"""
+
+SUGGESTION_KEY = "next_suggestion"
+
+
+# --- 上一題建議：提交時記下「要在哪一題顯示」，只在該題（或問卷完成畫面）顯示 ---
+def set_next_suggestion(answered_q: dict, answer: str, user_profile: dict, target_qid: str = None,
+                        text: str = None):
+    """
+    提交答案時呼叫；target_qid 為下一個畫面的題號（最後一題為 None，於完成畫面顯示）
+    text 為預先計算的建議，None 表示尚待串流產生（以提交當下的 user_profile 產生）
+    """
+    st.session_state[SUGGESTION_KEY] = {
+        "target_qid": target_qid,
+        "question": answered_q,
+        "answer": answer,
+        "user_profile": user_profile,
+        "text": text,
+    }
+
+
+def clear_next_suggestion():
+    """跳題、重設或開始新問卷時清除，避免建議出現在不相關的題目下"""
+    st.session_state.pop(SUGGESTION_KEY, None)
+
+
+def get_next_suggestion(current_qid: str = None):
+    """取得要在此畫面顯示的建議；目標題號不同（已離開該題）時直接清除"""
+    entry = st.session_state.get(SUGGESTION_KEY)
+    if entry and entry["target_qid"] != current_qid:
+        clear_next_suggestion()
+        return None
+    return entry
+
+
+def _start_suggestion_stream(entry: dict):
+    return generate_following_action(entry["question"], entry["answer"], entry["user_profile"], stream=True)
+
+
+def render_suggestion(entry: dict, deltas=None):
+    """顯示建議；尚未產生時串流產生並存回 entry，之後 rerun 直接顯示"""
+    st.markdown("#### 📌 根據上一題的建議")
+    suggestion_box = st.empty()
+    if entry.get("text") is None:
+        try:
+            entry["text"] = render_stream(suggestion_box, deltas or _start_suggestion_stream(entry), SUGGESTION_BOX)
+        except Exception as e:
+            entry["text"] = f"⚠️ 無法產生建議：{e}"
+    suggestion_box.markdown(SUGGESTION_BOX.format(entry["text"]), unsafe_allow_html=True)
+
+
+@st.fragment
+def render_suggestion_fragment(current_qid: str = None):
+    """導論區塊以外的畫面（已準備作答、問卷完成）顯示上一題建議"""
+    entry = get_next_suggestion(current_qid)
+    if entry:
+        render_suggestion(entry)
 
-user_profile = get_user_profile()
 
 @st.fragment
 def render_intro_fragment(
     current_q: dict,
+    user_profile: dict,
     is_first_question: bool = False,
-    intro_prompt: str = None,
-    previous_suggestion: str = ""
+    intro_prompt: str = None
 ):
+    """
+    導論區塊：第一題歡迎語、學習目標說明、上一題建議
+    - 尚未產生的內容以串流逐段顯示，完成後存入 session_state，之後 rerun 直接顯示
+    - 上一題建議由 app.py 於提交時以 set_next_suggestion 記下，在目標題串流產生
+    - user_profile 由 app.py 於每次 rerun 傳入，與預讀使用相同的 profile（共用 llm_cache）
+    - 歡迎語、學習目標與上一題建議的串流同時開始產生（llm_fanout），依序顯示
+    """
     qid = current_q["id"]
     tone = st.session_state.get("preferred_tone", "gentle")
     intro_key = f"intro_{qid}"
     goal_key = f"goal_note_{qid}"
 
 
-    # ✅ 第一題歡迎語
-    if is_first_question and intro_key not in st.session_state:
-        try:
-            intro = build_intro_welcome_prompt(
-                user_profile=user_profile,
-                current_q=current_q,
-                tone=tone
-            )
-            st.session_state[intro_key] = intro
-        except Exception as e:
-            st.session_state[intro_key] = f"❗導論產生失敗：{e}"
+    # ✅ 同時送出歡迎語、學習目標與上一題建議，等待時間不相加
+    entry = get_next_suggestion(qid)
+    pending = entry if entry and entry.get("text") is None else None
+    welcome_deltas = goal_deltas = suggestion_deltas = None
+    try:
+        if is_first_question and intro_key not in st.session_state:
+            welcome_deltas = stream_in_background(
+                build_intro_welcome_prompt(user_profile=user_profile, current_q=current_q, tone=tone, stream=True))
+        if goal_key not in st.session_state and not intro_prompt:
+            goal_deltas = stream_in_background(
+                generate_user_friendly_prompt(current_q, user_profile, tone=tone, stream=True))
+        if pending:
+            suggestion_deltas = stream_in_background(_start_suggestion_stream(pending))
+    except Exception as e:
+        print(f"⚠️ 導論並行送出失敗：{e}")
 
+    # ✅ 第一題歡迎語
     if is_first_question:
-        st.markdown(f"""<div class="ai-intro-box">{st.session_state[intro_key]}</div>""", unsafe_allow_html=True)
+        intro_box = st.empty()
+        if intro_key not in st.session_state:
+            try:
+                deltas = welcome_deltas or build_intro_welcome_prompt(
+                    user_profile=user_profile,
+                    current_q=current_q,
+                    tone=tone,
+                    stream=True
+                )
+                st.session_state[intro_key] = render_stream(intro_box, deltas, INTRO_BOX)
+            except Exception as e:
+                st.session_state[intro_key] = f"❗導論產生失敗：{e}"
+        intro_box.markdown(INTRO_BOX.format(st.session_state[intro_key]), unsafe_allow_html=True)
 
-    # ✅ 每題學習目標說明
+    # ✅ 每題學習目標說明（已預讀則直接顯示）
+    st.markdown("#### 🎯 學習目標說明")
+    goal_box = st.empty()
     if goal_key not in st.session_state:
         try:
             if intro_prompt:
                 goal = intro_prompt
             else:
-                rag = GuidedRAG("data/vector_output/")
-                context = rag.query(current_q.get("learning_goal") or current_q.get("topic", ""))
-                goal = generate_user_friendly_prompt(current_q, user_profile, context, tone)
+                deltas = goal_deltas or generate_user_friendly_prompt(current_q, user_profile, tone=tone, stream=True)
+                goal = render_stream(goal_box, deltas, INTRO_BOX)
             st.session_state[goal_key] = goal
         except Exception as e:
             st.session_state[goal_key] = f"⚠️ 學習目標補充失敗：{e}"
+    goal_box.markdown(INTRO_BOX.format(st.session_state[goal_key]), unsafe_allow_html=True)
 
-    st.markdown("#### 🎯 學習目標說明")
-    st.markdown(f"""<div class="ai-intro-box">{st.session_state[goal_key]}</div>""", unsafe_allow_html=True)
-
-    # ✅ 顯示上一題的 GPT 建議
-    if previous_suggestion:
-        st.markdown("#### 📌 根據上一題的建議")
-        st.markdown(f"""
-        <div class="ai-intro-box" style="background-color:#f8fff4; border-left: 5px solid #cddc39;">
-        {previous_suggestion}
-        </div>
-        """, unsafe_allow_html=True)
+    # ✅ 顯示上一題的 GPT 建議（剛提交的答案則串流產生）
+    if entry:
+        render_suggestion(entry, suggestion_deltas)
@@ -5,6 +5,7 @@ from src.utils.prompt_builder import (
     generate_dynamic_question_block,
     generate_option_notes,
 )
+from src.utils.llm_fanout import iter_completed
 from src.managers.profile_manager import get_user_profile
 
 user_profile = get_user_profile()
@@ -18,30 +19,38 @@ def render_question_guide(current_q: dict):
         st.markdown(f"**題目原文：** {current_q.get('text', '')}")
 
 
-    # ✅ 題目導引（快取）
+    # ✅ 題目導引與選項補充說明（快取；背景預讀完成則直接取用）
+    prefetched = st.session_state.get("gpt_prefetch", {}).get(qid, {})
     guide_key = f"guide_{qid}"
-    if guide_key not in st.session_state:
-        try:
-            guide = generate_dynamic_question_block(user_profile, current_q, tone)
-            st.session_state[guide_key] = guide
-        except Exception as e:
-            st.session_state[guide_key] = f"⚠️ 題目導引產生失敗：{e}"
-
-    st.markdown(f"""<div class="ai-intro-box">{st.session_state[guide_key]}</div>""", unsafe_allow_html=True)
-
-    # ✅ 選項補充說明快取（僅快取，不顯示）
-    # ✅ 選項補充說明快取（用於顯示在選項下方說明）
     notes_key = f"option_notes_{qid}"
+    guide_box = st.empty()
+
+    tasks = {}
+    if guide_key not in st.session_state:
+        if prefetched.get("guide"):
+            st.session_state[guide_key] = prefetched["guide"]
+        else:
+            tasks["guide"] = lambda: generate_dynamic_question_block(user_profile, current_q, tone=tone)
     if (
         notes_key not in st.session_state
         or not isinstance(st.session_state[notes_key], dict)
         or len(st.session_state[notes_key]) == 0
     ):
-        try:
-            notes = generate_option_notes(current_q, user_profile, tone)
-            st.session_state[notes_key] = notes
-        except Exception as e:
+        if prefetched.get("option_notes"):
+            st.session_state[notes_key] = prefetched["option_notes"]
+        else:
+            tasks["option_notes"] = lambda: generate_option_notes(current_q, user_profile, tone)
+
+    # ✅ 未預讀的部分同時送出，導引一完成就先顯示（選項說明由主程式顯示在選項旁）
+    for name, result, error in iter_completed(tasks):
+        if name == "guide":
+            st.session_state[guide_key] = result if error is None else f"⚠️ 題目導引產生失敗：{error}"
+            guide_box.markdown(f"""<div class="ai-intro-box">{st.session_state[guide_key]}</div>""", unsafe_allow_html=True)
+        elif error is None:
+            st.session_state[notes_key] = result
+        else:
             st.session_state[notes_key] = {
-                opt: f"⚠️ 無法產生說明：{e}" for opt in current_q.get("options", [])
+                opt: f"⚠️ 無法產生說明：{error}" for opt in current_q.get("options", [])
             }
 
+    guide_box.markdown(f"""<div class="ai-intro-box">{st.session_state[guide_key]}</div>""", unsafe_allow_html=True)
@@ -4,6 +4,7 @@ import streamlit as st
 from collections import defaultdict
 from typing import List, Dict
 from src.utils.report_utils import generate_full_gpt_report
+from src.sessions.context_tracker import collect_context_entries
 from src.managers.profile_manager import get_user_profile
 
 user_profile = get_user_profile()
@@ -66,6 +67,7 @@ def render_sidebar_fragment(session, current_q, key=None):  # ← 多這個 key=
         )
     else:
         if st.button("📄 產出目前報告（GPT-4）", use_container_width=True):
+            collect_context_entries(wait=True)  # 等待背景產生中的摘要
             context_history = st.session_state.get("context_history", [])
             if not context_history:
                 st.warning("⚠️ 尚未有任何 AI 回饋紀錄，請先完成至少一題互動後再產出報告。")
@@ -131,7 +131,8 @@ if current_q:
                         question_text=current_q["text"],
                         learning_goal=current_q.get("learning_goal", ""),
                         chat_history=get_conversation(chat_id),
-                        industry=st.session_state.get("industry", "")
+                        industry=st.session_state.get("industry", ""),
+                        use_cache=False  # 自由對話不重複使用回應
                     )
                     st.markdown(gpt_reply)
                     add_turn(chat_id, prompt, gpt_reply)
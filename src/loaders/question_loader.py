@@ -1,6 +1,6 @@
 import pandas as pd
 import os
-from typing import List
+from typing import List, Optional
 
 # 題號開頭對應主題分類
 MODULE_MAP = {
@@ -128,4 +128,38 @@ def load_all_question_data() -> List[dict]:
                     "report_section": row.get("report_section", ""),
                     # 可再加其他欄位
                 })
-    return all_questions
\ No newline at end of file
+    return all_questions
+
+def load_question_bank(industries: Optional[List[str]] = None) -> List[dict]:
+    """
+    載入所有產業題庫的全部題目（不分難度），欄位格式與 load_questions 相同。
+    供離線預先計算（例如題目向量檢索、下一步建議）使用；industries 可只載入指定產業。
+    """
+    questions = []
+    for industry, filename in INDUSTRY_FILE_MAP.items():
+        if industries and industry not in industries:
+            continue
+        path = os.path.join("data", filename)
+        if not os.path.exists(path):
+            continue
+        df = pd.read_csv(path)
+        for _, row in df.iterrows():
+            qid = row["question_id"]
+            if not isinstance(qid, str) or not qid:
+                continue
+            topic = row.get("topic_category", "")
+            topic = topic.strip() if isinstance(topic, str) else ""
+            options = [row.get(f"option_{opt}") for opt in ["A", "B", "C", "D", "E"]
+                       if pd.notna(row.get(f"option_{opt}"))]
+            questions.append({
+                "id": qid,
+                "industry": row.get("industry_type", industry),
+                "text": row.get("question_text", "") if pd.notna(row.get("question_text")) else "",
+                "options": options,
+                "type": row.get("option_type", "single"),
+                "topic": topic or MODULE_MAP.get(qid[0], "未分類"),
+                "tags": row.get("answer_tags", "").split("|") if isinstance(row.get("answer_tags"), str) else [],
+                "question_note": row.get("question_note", "") if pd.notna(row.get("question_note")) else "",
+                "learning_goal": row.get("learning_goal", "") if pd.notna(row.get("learning_goal")) else ""
+            })
+    return questions
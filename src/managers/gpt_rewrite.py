@@ -3,13 +3,7 @@ GPT 題目自然語氣改寫器模組：將問卷題目轉換為適合對話語
 支援基本句型轉換與 GPT 模型增強改寫。
 """
 
-import openai
-import os
-from dotenv import load_dotenv
-
-# 載入環境變數
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+from src.utils.gpt_tools import chat_completion
 
 
 def basic_rewrite(question_text: str) -> str:
@@ -35,16 +29,16 @@ def gpt_rewrite(question_text: str, question_type: str = "single", learning_goal
     """
 
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
+        # 同一題的改寫結果固定，由 call_gpt 的回應快取取用
+        return chat_completion(
             messages=[
                 {"role": "system", "content": "你是一位擅長語言引導的 ESG 顧問助手。"},
                 {"role": "user", "content": prompt.strip()}
             ],
+            model="gpt-3.5-turbo",
             temperature=0.5,
             max_tokens=100
-        )
-        return response["choices"][0]["message"]["content"].strip()
+        ) or basic_rewrite(question_text)
     except Exception as e:
         print(f"⚠️ GPT 改寫失敗：{e}")
         return basic_rewrite(question_text)
@@ -2,11 +2,11 @@
 from typing import List, Tuple, Dict
 import streamlit as st
 from vector_builder.vector_store import VectorStore  # ✅ 替換為新的 HuggingFace VectorStore
+from vector_builder.store_cache import get_store_cache
 
 class GuidedRAG:
     def __init__(self, vector_path="data/vector_output_hf/", model="gpt-3.5-turbo"):
-        self.vector_store = VectorStore()
-        self.vector_store.load(vector_path)
+        self.vector_store: VectorStore = get_store_cache().get(vector_path)  # ✅ 跨 session 共用已載入的向量庫
         self.model = model
         self.max_turns = 3
 
@@ -1,11 +1,13 @@
 import os
 import json
 import streamlit as st
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Tuple, Union
 from openai import OpenAI
 from src.managers.profile_manager import get_user_profile
-from src.utils.gpt_tools import call_gpt
+from src.utils.gpt_tools import call_gpt, call_gpt_stream
+from src.utils.llm_fanout import submit
 from src.utils.topic_to_rag_map import get_rag_doc_for_question  # ✅ 自動選擇向量庫
+from vector_builder.vector_store import CORPUS_DIR_NAME
 
 # 初始化記憶結構
 if "context_history" not in st.session_state:
@@ -18,7 +20,8 @@ if "guided_turns" not in st.session_state:
     st.session_state["guided_turns"] = 0
 
 # --- 每題摘要紀錄（for 顧問用） ---
-def add_context_entry(question_id: str, user_response, question_text: str):
+def summarize_context_entry(question_id: str, user_response, question_text: str) -> Optional[Dict[str, str]]:
+    """產生單題摘要紀錄（不讀寫 session_state，可在背景執行緒執行）；失敗時回傳 None"""
     answer_text = ", ".join(user_response) if isinstance(user_response, list) else str(user_response)
 
     prompt = f"""請用80-120字總結以下 ESG 問題與回答的重點，用於顧問回顧使用：
@@ -31,25 +34,52 @@ def add_context_entry(question_id: str, user_response, question_text: str):
     try:
         from src.utils.gpt_tools import call_gpt
         summary = call_gpt(prompt)
-
-        # 先移除舊的同題紀錄
-        st.session_state["context_history"] = [
-            item for item in st.session_state["context_history"]
-            if item["id"] != question_id
-        ]
-
-        # 加入新摘要
-        st.session_state["context_history"].append({
+        return {
             "id": question_id,
             "answer": answer_text,
             "summary": summary
-        })
-
-        return summary
+        }
 
     except Exception as e:
         print(f"⚠️ GPT 摘要失敗：{e}")
+        return None
+
+def store_context_entry(entry: Dict[str, str]):
+    # 先移除舊的同題紀錄
+    st.session_state["context_history"] = [
+        item for item in st.session_state["context_history"]
+        if item["id"] != entry["id"]
+    ]
+
+    # 加入新摘要
+    st.session_state["context_history"].append(entry)
+
+def add_context_entry(question_id: str, user_response, question_text: str):
+    entry = summarize_context_entry(question_id, user_response, question_text)
+    if entry is None:
         return "（摘要失敗）"
+    store_context_entry(entry)
+    return entry["summary"]
+
+def add_context_entry_async(question_id: str, user_response, question_text: str):
+    """
+    背景產生摘要，提交答案後不必等待即可換題（與下一題的建議串流並行）
+    結果由 collect_context_entries() 在主執行緒寫入 context_history
+    """
+    future = submit(summarize_context_entry, question_id, user_response, question_text)
+    st.session_state.setdefault("pending_context_entries", []).append(future)
+
+def collect_context_entries(wait: bool = False):
+    """把已完成的背景摘要寫入 context_history；wait=True 時等待全部完成（產出報告前使用）"""
+    remaining = []
+    for future in st.session_state.get("pending_context_entries", []):
+        if wait or future.done():
+            entry = future.result()
+            if entry is not None:
+                store_context_entry(entry)
+        else:
+            remaining.append(future)
+    st.session_state["pending_context_entries"] = remaining
 
 def get_all_summaries() -> List[str]:
     """從 `qa_threads` 中獲取所有問題的摘要（最後一輪回答）。"""
@@ -71,7 +101,9 @@ def add_turn(question_id: str, user_input: str, assistant_reply: str):
     })
 
 # --- 自動產生後續建議（進階版） ---
-def generate_following_action(current_q: dict, user_answer: str = "", user_profile: dict = None) -> str:
+def build_following_action_prompt(current_q: dict, user_answer: str = "",
+                                  user_profile: dict = None) -> Tuple[str, Optional[dict]]:
+    """組合下一步建議的 prompt，回傳 (prompt, rag_question)；即時產生與離線預先計算共用"""
     question_text = current_q.get("text", "")
     topic = current_q.get("topic", "")
     learning_goal = current_q.get("learning_goal", "")
@@ -81,7 +113,8 @@ def generate_following_action(current_q: dict, user_answer: str = "", user_profi
     try:
         rag_doc = get_rag_doc_for_question(current_q)
         rag_path = os.path.join("data", "vector_output_hf", rag_doc)
-        if not os.path.exists(rag_path):
+        corpus_path = os.path.join("data", "vector_output_hf", CORPUS_DIR_NAME)
+        if not os.path.exists(rag_path) and not os.path.exists(corpus_path):
             print(f"⚠️ 找不到向量資料夾：{rag_path}，略過 RAG。")
             rag_doc = None
     except Exception as e:
@@ -131,8 +164,18 @@ def generate_following_action(current_q: dict, user_answer: str = "", user_profi
 請產出專業建議（3 條），語氣中性、不空談、不客套。
     """
 
+    # 有對應向量庫時，改用題目本身的預先檢索段落（免即時嵌入與搜尋）
+    return prompt, (current_q if rag_doc else None)
+
+def generate_following_action(current_q: dict, user_answer: str = "", user_profile: dict = None,
+                              stream: bool = False) -> Union[str, Iterator[str]]:
+    """下一步行動建議；stream=True 時回傳逐段文字的 generator（錯誤訊息也以文字產出）"""
+    prompt, rag_question = build_following_action_prompt(current_q, user_answer, user_profile)
+    if stream:
+        return call_gpt_stream(prompt=prompt, rag_question=rag_question)
+
     try:
-        reply = call_gpt(prompt=prompt, rag_doc=rag_doc)
+        reply = call_gpt(prompt=prompt, rag_question=rag_question)
         return reply.strip()
     except Exception as e:
         print(f"⚠️ GPT 呼叫失敗：{e}")
@@ -3,8 +3,10 @@
 from openai import OpenAI
 from dotenv import load_dotenv
 import os
-from typing import List, Dict
+import time
+from typing import List, Dict, Iterator
 from src.utils.message_builder import build_chat_messages
+from src.utils.llm_cache import get_llm_cache, make_key
 import inspect
 import streamlit as st
 
@@ -12,7 +14,7 @@ import streamlit as st
 USE_RAG = os.getenv("USE_RAG", "false").lower() == "true"
 if USE_RAG:
     try:
-        from src.utils.rag_retriever import RAGRetriever
+        from src.utils.rag_retriever import get_retriever
     except ImportError:
         print("⚠️ 啟用 USE_RAG 但找不到 rag_retriever，自動關閉 RAG 功能")
         USE_RAG = False
@@ -22,6 +24,116 @@ load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 client = OpenAI(api_key=api_key, timeout=20)  # ✅ 建議加上 timeout 保護
 
+def chat_completion(
+    messages: List[Dict[str, str]],
+    model: str = "gpt-3.5-turbo-1106",
+    temperature: float = 0.4,
+    max_tokens: int = 700,
+    use_cache: bool = True
+) -> str:
+    """
+    送出 messages 並回傳文字（失敗時拋出例外）
+    - use_cache=True：相同（模型、temperature、max_tokens、messages）的回應由 llm_cache 直接取用
+    """
+    cache = get_llm_cache() if use_cache else None
+    key = make_key(model, temperature, messages, max_tokens) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            print("💾 [call_gpt] 快取命中")
+            return cached
+
+    response = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
+    content = (response.choices[0].message.content or "").strip()
+    if cache and content:
+        cache.put(key, model, content)
+    return content
+
+def stream_chat_completion(
+    messages: List[Dict[str, str]],
+    model: str = "gpt-3.5-turbo-1106",
+    temperature: float = 0.4,
+    max_tokens: int = 700,
+    use_cache: bool = True
+) -> Iterator[str]:
+    """
+    與 chat_completion 相同，但以 stream=True 逐段產出文字（失敗時拋出例外）
+    - 快取命中時一次產出完整回應；完整收完才寫入快取，中途中斷的回應不會留下
+    - 快取 key 與 chat_completion 相同，兩種呼叫方式共用結果
+    """
+    cache = get_llm_cache() if use_cache else None
+    key = make_key(model, temperature, messages, max_tokens) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            print("💾 [call_gpt] 快取命中")
+            yield cached
+            return
+
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True
+    )
+    parts = []
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    content = "".join(parts).strip()
+    if cache and content:
+        cache.put(key, model, content)
+
+def _build_messages(
+    prompt: str,
+    question_text: str = "",
+    learning_goal: str = "",
+    chat_history: List[Dict[str, str]] = None,
+    industry: str = "",
+    rag_doc: str = None,
+    rag_question: dict = None
+) -> List[Dict[str, str]]:
+    """組合 messages 並插入 RAG 段落（call_gpt 與 call_gpt_stream 共用）"""
+    rag_context = ""
+    if USE_RAG and rag_question:
+        rag_context = get_retriever().get_question_context(rag_question)
+    elif USE_RAG and rag_doc:
+        rag_context = get_retriever().get_context(prompt, doc_folder=rag_doc)
+
+    # 組合 messages
+    messages = build_chat_messages(
+        prompt=prompt,
+        question_text=question_text,
+        learning_goal=learning_goal,
+        chat_history=chat_history,
+        industry=industry
+    )
+
+    # 插入 RAG 段落（若有）
+    if rag_context and messages:
+        rag_block = f"以下是輔助參考段落（來自文獻）：\n{rag_context}"
+        if messages[0]["role"] == "system":
+            messages[0]["content"] += f"\n\n{rag_block}"
+        else:
+            messages.insert(0, {"role": "system", "content": rag_block})
+
+    # ✅ 印出實際送出的內容（最多前 100 字）
+    print("🧪 [call_gpt] 實際送出的 messages：")
+    for msg in messages:
+        print(f"{msg['role']}: {msg['content'][:100]}...")
+    return messages
+
 def call_gpt(
     prompt: str,
     question_text: str = "",
@@ -29,60 +141,90 @@ def call_gpt(
     chat_history: List[Dict[str, str]] = None,
     industry: str = "",
     rag_doc: str = None,
+    rag_question: dict = None,
     model: str = "gpt-3.5-turbo-1106",
-    temperature: float = 0.4
+    temperature: float = 0.4,
+    use_cache: bool = True,
+    raise_errors: bool = False
 ) -> str:
     """
     呼叫 GPT 模型，整合問題脈絡與歷史記憶給出回答
     可選用 RAG 模式補充段落背景（需環境變數 USE_RAG=true）
+    - rag_question：題庫題目 dict，改用該題預先計算的檢索段落（不需即時嵌入與搜尋）
+    - use_cache：相同 prompt 的回應由磁碟快取取用；自由對話請傳 False
+    - raise_errors：失敗或回覆為空時拋出例外，而非回傳提示文字（離線批次產生時使用，避免存下錯誤訊息）
     """
     try:
-        rag_context = ""
-        if USE_RAG and rag_doc:
-            retriever = RAGRetriever()
-            rag_context = retriever.get_context(prompt, doc_folder=rag_doc)
-
-        # 組合 messages
-        messages = build_chat_messages(
-            prompt=prompt,
-            question_text=question_text,
-            learning_goal=learning_goal,
-            chat_history=chat_history,
-            industry=industry
-        )
-
-        # 插入 RAG 段落（若有）
-        if rag_context and messages:
-            rag_block = f"以下是輔助參考段落（來自文獻）：\n{rag_context}"
-            if messages[0]["role"] == "system":
-                messages[0]["content"] += f"\n\n{rag_block}"
-            else:
-                messages.insert(0, {"role": "system", "content": rag_block})
-
-        # ✅ 印出實際送出的內容（最多前 100 字）
-        print("🧪 [call_gpt] 實際送出的 messages：")
-        for msg in messages:
-            print(f"{msg['role']}: {msg['content'][:100]}...")
-
-        # 呼叫 OpenAI GPT
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=700
-        )
-
-        content = response.choices[0].message.content.strip()
+        messages = _build_messages(prompt, question_text, learning_goal, chat_history, industry, rag_doc, rag_question)
+
+        # 呼叫 OpenAI GPT（可快取的 prompt 先查快取）
+        content = chat_completion(messages, model=model, temperature=temperature, use_cache=use_cache)
         if not content:
             print("⚠️ GPT 回傳為空")
+            if raise_errors:
+                raise RuntimeError("GPT 回傳為空")
             return "⚠️ AI 回覆為空，請稍後再試。"
 
         return content
 
     except Exception as e:
         print(f"⚠️ GPT 回應錯誤：{e}")
+        if raise_errors:
+            raise
         st.warning(f"⚠️ 無法取得 AI 回覆，請稍後再試：{e}")
         return f"⚠️ 無法取得 AI 回覆，請稍後再試：{e}"
 
+def call_gpt_stream(
+    prompt: str,
+    question_text: str = "",
+    learning_goal: str = "",
+    chat_history: List[Dict[str, str]] = None,
+    industry: str = "",
+    rag_doc: str = None,
+    rag_question: dict = None,
+    model: str = "gpt-3.5-turbo-1106",
+    temperature: float = 0.4,
+    use_cache: bool = True
+) -> Iterator[str]:
+    """
+    call_gpt 的串流版：參數相同，逐段產出回覆文字（搭配 render_stream 顯示）
+    - 使用者等待的是第一個 token，而不是整段回覆
+    - 失敗或回覆為空時產出與 call_gpt 相同的提示文字，不拋出例外
+    """
+    received = False
+    try:
+        messages = _build_messages(prompt, question_text, learning_goal, chat_history, industry, rag_doc, rag_question)
+        for delta in stream_chat_completion(messages, model=model, temperature=temperature, use_cache=use_cache):
+            received = received or bool(delta.strip())
+            yield delta
+        if not received:
+            print("⚠️ GPT 回傳為空")
+            yield "⚠️ AI 回覆為空，請稍後再試。"
+
+    except Exception as e:
+        print(f"⚠️ GPT 回應錯誤：{e}")
+        # 已顯示部分內容時，錯誤訊息另起一段
+        prefix = "\n\n" if received else ""
+        yield f"{prefix}⚠️ 無法取得 AI 回覆，請稍後再試：{e}"
+
+def render_stream(placeholder, deltas: Iterator[str], template: str = "{}", min_interval: float = 0.05,
+                  unsafe_allow_html: bool = True) -> str:
+    """
+    將串流文字逐段寫入 st.empty() placeholder，回傳完整文字（已 strip）
+    - template：外框格式（如 '<div class="ai-intro-box">{}</div>'）；純文字回覆請傳 unsafe_allow_html=False
+    - 每 min_interval 秒最多更新一次畫面，避免每個 token 都送一次前端訊息
+    """
+    text = ""
+    last_update = 0.0
+    for delta in deltas:
+        text += delta
+        now = time.monotonic()
+        if now - last_update >= min_interval:
+            placeholder.markdown(template.format(text + "▌"), unsafe_allow_html=unsafe_allow_html)
+            last_update = now
+    text = text.strip()
+    placeholder.markdown(template.format(text), unsafe_allow_html=unsafe_allow_html)
+    return text
+
 # ✅ 確認來源與是否正確載入
 print("✅ call_gpt 被載入了！來源：", inspect.getfile(call_gpt))
@@ -0,0 +1,180 @@
+# src/utils/llm_cache.py
+"""
+GPT 回應的磁碟快取（SQLite）
+- key 為 (模型, temperature, max_tokens, 完整 messages) 的雜湊；同產業／角色／語氣的使用者
+  送出相同 prompt 時直接取用，不再呼叫 OpenAI
+- 每筆有存活時間（TTL），過期視為未命中
+- 總大小超過上限時依最後使用時間淘汰
+- 多個 Streamlit session 執行緒共用同一連線，以 lock 保護
+- 命中／未命中等計數同時累計在資料庫（counters 表），於其他行程（例如直接執行本檔）也能查看
+- LLM_CACHE_PATH 設為空字串可停用；自由對話等不適合重複使用的呼叫以 use_cache=False 略過
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "data/cache/llm_cache.sqlite")
+DEFAULT_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600   # 預設 7 天
+DEFAULT_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "100")) * 1024 * 1024
+# 超過上限時淘汰到上限的比例，避免每次寫入都觸發淘汰
+EVICT_TARGET_RATIO = 0.9
+
+
+def make_key(model: str, temperature: float, messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> str:
+    payload = {"model": model, "temperature": temperature, "max_tokens": max_tokens,
+               "messages": [{"role": m["role"], "content": m["content"]} for m in messages]}
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, db_path: Optional[str] = DEFAULT_CACHE_PATH, ttl_seconds: int = DEFAULT_TTL_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "expired": 0, "evicted": 0}
+        self._lock = threading.Lock()
+
+        self._conn = None
+        self._total_bytes = 0
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, model TEXT, response TEXT, "
+                "size INTEGER, created_at REAL, used_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_used ON responses (used_at)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+            self._conn.commit()
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def _count(self, name: str, n: int = 1):
+        """呼叫端需持有 lock；本行程計數與資料庫累計一併增加（隨呼叫端的交易提交）"""
+        if not n:
+            return
+        self.stats[name] += n
+        self._conn.execute(
+            "INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, n)
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        if self._conn is None:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, size, created_at FROM responses WHERE key = ?",
+                                     (key,)).fetchone()
+            if row and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= row[1]
+                self._count("expired")
+                row = None
+            if row is None:
+                self._count("misses")
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+            self._count("hits")
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        if self._conn is None:
+            return
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                               (key, model, response, size, now, now))
+            self._total_bytes += size - (old[0] if old else 0)
+            self._count("writes")
+            if self._total_bytes > self.max_bytes:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """先清除過期資料，仍超過上限時依最後使用時間由舊到新淘汰"""
+        cur = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._count("expired", cur.rowcount)
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        if self._total_bytes <= target:
+            return
+        to_delete = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY used_at"):
+            if self._total_bytes <= target:
+                break
+            to_delete.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+        self._count("evicted", len(to_delete))
+
+    def summary(self) -> Dict:
+        """
+        命中率與目前大小：上層欄位為本行程的計數，lifetime 為資料庫累計（所有行程、上次清空以來）
+        """
+        entries = 0
+        lifetime = {name: 0 for name in self.stats}
+        if self._conn is not None:
+            with self._lock:
+                entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                lifetime.update(self._conn.execute("SELECT name, value FROM counters"))
+        return dict(self.stats, entries=entries, size_mb=round(self._total_bytes / 1024 / 1024, 2),
+                    hit_rate=_hit_rate(self.stats), lifetime=dict(lifetime, hit_rate=_hit_rate(lifetime)))
+
+    def clear(self):
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("DELETE FROM counters")
+            self._conn.commit()
+            self._total_bytes = 0
+
+
+def _hit_rate(stats: Dict) -> float:
+    lookups = stats["hits"] + stats["misses"]
+    return round(stats["hits"] / lookups, 3) if lookups else 0.0
+
+
+_llm_cache: Optional[LLMCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """行程層級的單一快取實例"""
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMCache()
+    return _llm_cache
+
+
+# ✅ 直接執行可查看快取大小，或加上 --clear 清空
+if __name__ == "__main__":
+    import sys
+
+    cache = get_llm_cache()
+    if "--clear" in sys.argv:
+        cache.clear()
+        print("🧹 已清空 GPT 回應快取")
+    summary = cache.summary()
+    lifetime = summary["lifetime"]
+    print(f"💾 GPT 回應快取：{summary['entries']} 筆，{summary['size_mb']} MB")
+    print(f"📊 累計：命中 {lifetime['hits']}，未命中 {lifetime['misses']}，命中率 {lifetime['hit_rate']}，"
+          f"寫入 {lifetime['writes']}，過期 {lifetime['expired']}，淘汰 {lifetime['evicted']}")
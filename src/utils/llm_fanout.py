@@ -0,0 +1,93 @@
+# src/utils/llm_fanout.py
+"""
+同一題的多個 LLM 呼叫並行送出，等待時間由「各呼叫相加」變成「最慢的一個」
+- 題目載入：學習目標導讀、上一題建議（兩段串流同時產生）、題目導引與選項說明
+- 提交答案：摘要（add_context_entry）於背景產生，與下一題的建議串流並行
+- 行程層級共用一個執行緒池；OpenAI 呼叫多在等網路，執行緒即可並行
+- 在本次 rerun 內等待的工作可附上 ScriptRunContext（call_gpt 的 st.warning 仍會顯示）；
+  跨 rerun 的背景工作不附上，結果由主執行緒取回後寫入 session_state
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+LLM_FANOUT_WORKERS = int(os.getenv("LLM_FANOUT_WORKERS", "8"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_DONE = object()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=LLM_FANOUT_WORKERS, thread_name_prefix="llm-fanout")
+    return _executor
+
+
+def _with_script_ctx(fn: Callable) -> Callable:
+    """把目前 rerun 的 ScriptRunContext 帶進背景執行緒（非 Streamlit 環境直接回傳原函式）"""
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    except ImportError:
+        return fn
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return fn
+
+    def run(*args, **kwargs):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args, **kwargs)
+    return run
+
+
+def submit(fn: Callable, *args, attach_ctx: bool = False, **kwargs) -> Future:
+    """送出單一背景工作；attach_ctx=True 僅用於本次 rerun 內會等待結果的工作"""
+    if attach_ctx:
+        fn = _with_script_ctx(fn)
+    return get_executor().submit(fn, *args, **kwargs)
+
+
+def iter_completed(tasks: Dict[str, Callable]) -> Iterator[Tuple[str, object, Optional[Exception]]]:
+    """
+    同時送出多個無參數工作，依完成先後產出 (名稱, 結果, 例外)
+    呼叫端可在每個結果完成時立即顯示，不必等全部完成
+    """
+    futures = {submit(fn, attach_ctx=True): name for name, fn in tasks.items()}
+    for future in as_completed(futures):
+        error = future.exception()
+        yield futures[future], (None if error else future.result()), error
+
+
+def stream_in_background(deltas: Iterator[str]) -> Iterator[str]:
+    """
+    在背景執行緒先行消耗串流 generator，回傳可在主執行緒逐段讀取的 iterator
+    多段串流同時開始產生，主執行緒依序顯示時，後面的段落通常已經完成
+    """
+    buffer: "queue.Queue" = queue.Queue()
+
+    def pump():
+        try:
+            for delta in deltas:
+                buffer.put(delta)
+        except Exception as e:
+            buffer.put(e)
+        finally:
+            buffer.put(_DONE)
+
+    submit(pump, attach_ctx=True)
+
+    def drain() -> Iterator[str]:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    return drain()
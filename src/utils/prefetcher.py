@@ -0,0 +1,252 @@
+# src/utils/prefetcher.py
+"""
+背景預讀：使用者閱讀第 N 題時，先在背景產生後續 K 題的導讀、題目導引與選項說明
+- 行程層級共用一個 ThreadPoolExecutor，結果依 Streamlit session 分開存放
+- 背景執行緒不碰 st.session_state；主執行緒每次 rerun 以 collect() 取回，併入 gpt_prefetch
+- 換題或跳題時以新的預讀範圍呼叫 schedule()：範圍外的排隊工作直接移除，
+  執行中的工作結果丟棄（已送出的 OpenAI 請求無法中斷）；keep 中的執行中工作保留但不新排
+  （例如換題後目前題目的導讀：改由導論 fragment 產生，但已在執行的預讀可用 wait_for 取得）
+- 每個欄位是獨立的工作，同一題的導讀、導引與選項說明並行產生（等待時間取最慢的一個）
+- 每個 session 同時執行的預讀數有上限，避免單一使用者佔滿執行緒與 OpenAI 配額
+- 回應同時寫入 llm_cache，預讀結果被丟棄時，之後同一 prompt 仍可命中快取
+- 單選題另外推測產生各選項的下一步建議（suggestion:<選項>），寫入 suggestion_store 供提交時查表
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.utils.prompt_builder import (
+    generate_user_friendly_prompt,
+    generate_dynamic_question_block,
+    generate_option_notes,
+)
+from src.utils.suggestion_store import (
+    get_suggestion_store,
+    is_precomputable,
+    profile_bucket,
+    speculate_suggestion,
+)
+
+PREFETCH_AHEAD = int(os.getenv("PREFETCH_AHEAD", "2"))              # 預讀目前題目之後幾題
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "6"))          # 整個行程的執行緒數
+PREFETCH_PER_SESSION = int(os.getenv("PREFETCH_PER_SESSION", "3"))  # 每位使用者同時執行的預讀呼叫數
+PREFETCH_WAIT_SECONDS = float(os.getenv("PREFETCH_WAIT_SECONDS", "5"))   # 畫面等待執行中預讀的上限
+SESSION_IDLE_SECONDS = 3600   # 超過一小時未使用的 session 結果清除
+SPECULATE_SUGGESTIONS = os.getenv("SPECULATE_SUGGESTIONS", "true").lower() == "true"
+SUGGESTION_FIELD_PREFIX = "suggestion:"
+
+# 預讀欄位 → 畫面上使用該結果的 session_state key 前綴（已存在表示不需預讀）
+FIELDS = {
+    "prompt": "goal_note_",
+    "guide": "guide_",
+    "option_notes": "option_notes_",
+}
+
+
+def generate_field(field: str, question: dict, user_profile: dict, tone: str = "gentle"):
+    """產生單一欄位；參數與各 fragment 即時產生時相同，確保共用 llm_cache"""
+    if field == "prompt":
+        return generate_user_friendly_prompt(question, user_profile, tone=tone)
+    if field == "guide":
+        return generate_dynamic_question_block(user_profile, question, tone=tone)
+    if field == "option_notes":
+        return generate_option_notes(question, user_profile, tone)
+    if field.startswith(SUGGESTION_FIELD_PREFIX):
+        return speculate_suggestion(question, field[len(SUGGESTION_FIELD_PREFIX):], user_profile)
+    raise ValueError(f"未知的預讀欄位：{field}")
+
+
+def plan_prefetch(question_set: Sequence[dict], current_index: int, session_state,
+                  ahead: int = PREFETCH_AHEAD, include_current_prompt: bool = False,
+                  user_profile: dict = None) -> List[Tuple[dict, List[str]]]:
+    """
+    列出需要預讀的 (題目, 欄位)，依優先順序排列
+    - 目前題目只預讀作答區用的導引與選項說明（導讀由導論 fragment 串流產生）；
+      跳題時畫面尚未顯示目標題，可傳 include_current_prompt=True 一併預讀
+    - 已在 gpt_prefetch 或畫面 session_state 中的欄位略過
+    - 傳入 user_profile 時，目前題目若為單選題，最後加上查表中尚未有建議的選項
+    """
+    prefetched = session_state.get("gpt_prefetch", {})
+    jobs = []
+    for offset, question in enumerate(question_set[current_index: current_index + 1 + ahead]):
+        qid = question["id"]
+        have = prefetched.get(qid, {})
+        fields = [field for field, prefix in FIELDS.items()
+                  if not have.get(field) and f"{prefix}{qid}" not in session_state]
+        if offset == 0 and not include_current_prompt and "prompt" in fields:
+            fields.remove("prompt")
+        if fields:
+            jobs.append((question, fields))
+
+    current = question_set[current_index] if current_index < len(question_set) else None
+    if SPECULATE_SUGGESTIONS and user_profile is not None and current and is_precomputable(current):
+        try:
+            missing = get_suggestion_store().missing_answers(current, profile_bucket(user_profile))
+        except Exception as e:
+            print(f"⚠️ 無法讀取建議查表：{e}")
+            missing = []
+        if missing:
+            jobs.append((current, [f"{SUGGESTION_FIELD_PREFIX}{opt}" for opt in missing]))
+    return jobs
+
+
+def current_session_key() -> str:
+    """目前 Streamlit session 的識別碼（非 Streamlit 環境回傳 default）"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else "default"
+    except ImportError:
+        return "default"
+
+
+class _Job:
+    """單一題目的單一欄位"""
+    def __init__(self, question: dict, field: str, user_profile: dict, tone: str):
+        self.qid = question["id"]
+        self.question = question
+        self.field = field
+        self.user_profile = user_profile
+        self.tone = tone
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        self.value = None
+
+
+class _SessionState:
+    def __init__(self):
+        self.pending: List[_Job] = []            # 排隊中（依優先順序）
+        self.running: Dict[Tuple[str, str], _Job] = {}   # (qid, 欄位) → 執行中的工作
+        self.results: Dict[str, Dict] = {}       # qid → {欄位: 結果}，collect() 後清空
+        self.touched = time.time()
+
+
+class Prefetcher:
+    def __init__(self, max_workers: int = PREFETCH_WORKERS, per_session: int = PREFETCH_PER_SESSION):
+        self.per_session = max(1, per_session)
+        self.stats = {"scheduled": 0, "completed": 0, "cancelled": 0, "failed": 0}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gpt-prefetch")
+        self._sessions: Dict[str, _SessionState] = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, session_key: str, jobs: List[Tuple[dict, List[str]]], user_profile: dict,
+                 tone: str = "gentle", keep: Iterable[Tuple[str, str]] = ()):
+        """
+        以新的預讀範圍取代該 session 目前的範圍（jobs 由 plan_prefetch 產生）
+        keep：(題號, 欄位) 已在執行時繼續執行，但不新排
+        """
+        now = time.time()
+        wanted = {(question["id"], field) for question, fields in jobs for field in fields}
+        keep_running = wanted | set(keep)
+        with self._lock:
+            self._prune(now)
+            state = self._sessions.setdefault(session_key, _SessionState())
+            state.touched = now
+
+            # 🧹 取消範圍外的工作；回到範圍內的執行中工作則繼續
+            for key, job in state.running.items():
+                if key in keep_running:
+                    job.cancelled.clear()
+                elif not job.cancelled.is_set():
+                    job.cancelled.set()
+                    self.stats["cancelled"] += 1
+            self.stats["cancelled"] += sum(1 for job in state.pending if (job.qid, job.field) not in wanted)
+
+            state.pending = []
+            for question, fields in jobs:
+                qid = question["id"]
+                for field in fields:
+                    if (qid, field) in state.running or field in state.results.get(qid, {}):
+                        continue
+                    state.pending.append(_Job(question, field, user_profile, tone))
+                    self.stats["scheduled"] += 1
+            self._submit_ready(state)
+
+    def collect(self, session_key: str) -> Dict[str, Dict]:
+        """取回已完成的欄位（可能只有部分欄位），取回後即從預讀器移除"""
+        with self._lock:
+            state = self._sessions.get(session_key)
+            if state is None or not state.results:
+                return {}
+            results, state.results = state.results, {}
+            return results
+
+    def wait_for(self, session_key: str, qid: str, field: str, timeout: float = PREFETCH_WAIT_SECONDS):
+        """
+        取得某欄位的預讀結果：已完成（尚未 collect）直接回傳，執行中則最多等待 timeout 秒
+        沒有預讀、逾時或失敗時回傳 None，由呼叫端自行產生
+        """
+        with self._lock:
+            state = self._sessions.get(session_key)
+            if state is None:
+                return None
+            job = state.running.get((qid, field))
+            if job is None:
+                return state.results.get(qid, {}).get(field)
+        if not job.finished.wait(timeout) or job.cancelled.is_set():
+            return None
+        return job.value
+
+    def cancel(self, session_key: str):
+        """停止該 session 所有預讀（例如登出或重設問卷）"""
+        self.schedule(session_key, [], user_profile={})
+
+    def summary(self) -> Dict:
+        with self._lock:
+            running = sum(len(s.running) for s in self._sessions.values())
+            pending = sum(len(s.pending) for s in self._sessions.values())
+            return dict(self.stats, sessions=len(self._sessions), running=running, pending=pending)
+
+    def _submit_ready(self, state: _SessionState):
+        """呼叫端需持有 lock；依每個 session 的上限送出排隊中的工作"""
+        while state.pending and len(state.running) < self.per_session:
+            job = state.pending.pop(0)
+            state.running[(job.qid, job.field)] = job
+            self._executor.submit(self._run, state, job)
+
+    def _run(self, state: _SessionState, job: _Job):
+        key = (job.qid, job.field)
+        try:
+            if job.cancelled.is_set():
+                return
+            value = generate_field(job.field, job.question, job.user_profile, job.tone)
+            job.value = value
+            with self._lock:
+                if not job.cancelled.is_set():
+                    state.results.setdefault(job.qid, {})[job.field] = value
+                    self.stats["completed"] += 1
+            print(f"✅ 預讀完成：{job.qid}/{job.field}")
+        except Exception as e:
+            print(f"⚠️ 預讀失敗：{job.qid}/{job.field} - {e}")
+            with self._lock:
+                self.stats["failed"] += 1
+        finally:
+            job.finished.set()
+            with self._lock:
+                if state.running.get(key) is job:
+                    del state.running[key]
+                self._submit_ready(state)
+
+    def _prune(self, now: float):
+        """呼叫端需持有 lock；清除閒置過久且沒有執行中工作的 session"""
+        idle = [key for key, state in self._sessions.items()
+                if now - state.touched > SESSION_IDLE_SECONDS and not state.running]
+        for key in idle:
+            del self._sessions[key]
+
+
+_prefetcher: Optional[Prefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Prefetcher:
+    """行程層級的單一預讀器（所有 Streamlit session 共用執行緒）"""
+    global _prefetcher
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = Prefetcher()
+    return _prefetcher
@@ -1,7 +1,8 @@
 # src/utils/prompt_builder.py
 
 import json
-from src.utils.gpt_tools import call_gpt
+from typing import Iterator, Union
+from src.utils.gpt_tools import call_gpt, call_gpt_stream
 from src.managers.profile_manager import get_user_profile
 from src.utils.rag_retriever import get_rag_context_for_question
 
@@ -53,7 +54,9 @@ def build_learning_prompt(
     return call_gpt(prompt).strip()
 
 
-def build_intro_welcome_prompt(user_profile: dict, current_q: dict, tone: str = "gentle") -> str:
+def build_intro_welcome_prompt(user_profile: dict, current_q: dict, tone: str = "gentle",
+                               stream: bool = False) -> Union[str, Iterator[str]]:
+    """第一題歡迎語；stream=True 時回傳逐段文字的 generator（搭配 render_stream）"""
     style_instruction = TONE_STYLE_MAP.get(tone, TONE_STYLE_MAP["gentle"])
     industry = user_profile.get("industry", "某產業")
     role = user_profile.get("role", "一般成員")
@@ -85,6 +88,8 @@ def build_intro_welcome_prompt(user_profile: dict, current_q: dict, tone: str =
 - 回應只產出文字內容，不要加上標題或其他說明。
 - 不可使用「你」「妳」或「企業主」等稱謂，保持中性實務風格。
 """
+    if stream:
+        return call_gpt_stream(prompt)
     return call_gpt(prompt).strip()
 
 def build_learning_prompt(user_profile: dict, current_q: dict, previous_summary: str, tone: str = "gentle") -> str:
@@ -113,7 +118,9 @@ def build_learning_prompt(user_profile: dict, current_q: dict, previous_summary:
 """
     return call_gpt(prompt).strip()
 
-def generate_user_friendly_prompt(current_q: dict, user_profile: dict, rag_context: str = "", tone: str = "gentle") -> str:
+def generate_user_friendly_prompt(current_q: dict, user_profile: dict, rag_context: str = "", tone: str = "gentle",
+                                  stream: bool = False) -> Union[str, Iterator[str]]:
+    """每題學習目標導讀；stream=True 時回傳逐段文字的 generator（搭配 render_stream）"""
     learning_goal = current_q.get("learning_goal", "")
     topic = current_q.get("topic", "")
     user_profile_json = json.dumps(user_profile, ensure_ascii=False, indent=2)
@@ -189,6 +196,8 @@ def generate_user_friendly_prompt(current_q: dict, user_profile: dict, rag_conte
 
 請依以上格式撰寫內容。
 """
+    if stream:
+        return call_gpt_stream(prompt)
     return call_gpt(prompt).strip()
 
 def generate_dynamic_question_block(user_profile: dict, current_q: dict, user_answer: str = "", tone: str = "gentle") -> str:
@@ -0,0 +1,156 @@
+# 📂 src/utils/question_retrieval.py
+"""
+題庫題目的離線預先檢索
+- 題庫為靜態 CSV，可事先為每一題查好 top-k 段落的向量 ID 與分數
+- 執行時已知題目直接依 ID 取段落，不需嵌入與 FAISS 搜尋
+- 向量庫重建（index_version 改變）後，該題自動退回即時查詢
+"""
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.utils.topic_to_rag_map import get_rag_doc_for_question
+
+QUESTION_RETRIEVAL_PATH = Path("data/vector_output_hf/question_retrieval.npz")
+PRECOMPUTED_TOP_K = 5
+
+
+def question_key(question: dict) -> str:
+    """題號在各產業題庫中會重複，以「產業:題號」識別"""
+    return f"{question.get('industry', '')}:{question.get('id', '')}"
+
+
+def question_query_text(question: dict) -> str:
+    """題目檢索時使用的查詢文字（離線與即時查詢一致）"""
+    parts = [question.get("text", ""), question.get("learning_goal", "")]
+    return "\n".join(p for p in parts if isinstance(p, str) and p.strip())
+
+
+def retrieval_key(question: dict) -> Optional[str]:
+    """
+    查表用的 key：「產業:題號#查詢文字雜湊」
+    同一題庫中題號可能重複（如 Restaurant.csv 的 S001–S004），加上查詢文字雜湊後，
+    不同題目不會取到彼此的段落；題號空白的題目不查表（回傳 None，改走即時查詢）
+    """
+    qid = question.get("id")
+    if not isinstance(qid, str) or not qid.strip():
+        return None
+    digest = hashlib.sha256(question_query_text(question).encode("utf-8")).hexdigest()[:16]
+    return f"{question_key(question)}#{digest}"
+
+
+def build_question_retrieval(questions: List[dict], retriever, top_k: int = PRECOMPUTED_TOP_K,
+                             output_path: Path = QUESTION_RETRIEVAL_PATH) -> Dict[str, int]:
+    """
+    為每一題計算 top-k 段落並寫入壓縮的查表檔（.npz）。
+    同一向量資料夾的題目以 search_many 批次查詢。
+    回傳統計：{"questions": 總題數, "stored": 成功寫入題數, "skipped": 找不到向量庫的題數}
+    """
+    # 相同 key（同題號且同查詢文字）只需查一次；題號空白的題目不寫入
+    unique: Dict[str, dict] = {}
+    for q in questions:
+        key = retrieval_key(q)
+        if key is not None:
+            unique.setdefault(key, q)
+
+    by_folder: Dict[str, List[dict]] = {}
+    for q in unique.values():
+        by_folder.setdefault(get_rag_doc_for_question(q), []).append(q)
+
+    keys, stores, ids_rows, score_rows = [], [], [], []
+    versions: Dict[str, str] = {}
+    skipped = 0
+    for folder, folder_questions in by_folder.items():
+        try:
+            store_name, index_version = retriever.resolve_store(folder)
+            batch = retriever.search_many(
+                [question_query_text(q) for q in folder_questions], folder, top_k=top_k
+            )
+        except FileNotFoundError:
+            skipped += len(folder_questions)
+            continue
+
+        versions[store_name] = index_version
+        for q, chunks in zip(folder_questions, batch):
+            ids = np.full(top_k, -1, dtype="int64")
+            scores = np.zeros(top_k, dtype="float32")
+            for i, chunk in enumerate(chunks[:top_k]):
+                ids[i] = chunk["vector_id"]
+                scores[i] = chunk["score"]
+            keys.append(retrieval_key(q))
+            stores.append(store_name)
+            ids_rows.append(ids)
+            score_rows.append(scores)
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        output_path,
+        keys=np.array(keys, dtype=str),
+        stores=np.array(stores, dtype=str),
+        ids=np.vstack(ids_rows) if ids_rows else np.zeros((0, top_k), dtype="int64"),
+        scores=np.vstack(score_rows).astype("float16") if score_rows else np.zeros((0, top_k), dtype="float16"),
+        header=np.array(json.dumps({"top_k": top_k, "index_versions": versions}, ensure_ascii=False))
+    )
+    return {"questions": len(questions), "stored": len(keys), "skipped": skipped}
+
+
+class PrecomputedRetrieval:
+    """唯讀查表；檔案更新時自動重新載入"""
+
+    def __init__(self, path: Path = QUESTION_RETRIEVAL_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._rows: Dict[str, int] = {}
+        self._data = None
+        self._header: Dict = {}
+
+    def _ensure_loaded(self) -> bool:
+        if not self.path.exists():
+            return False
+        mtime = self.path.stat().st_mtime_ns
+        if mtime == self._mtime:
+            return True
+        with self._lock:
+            if mtime != self._mtime:
+                with np.load(self.path, allow_pickle=False) as npz:
+                    data = {name: npz[name] for name in ("keys", "stores", "ids", "scores")}
+                    self._header = json.loads(str(npz["header"]))
+                self._rows = {key: i for i, key in enumerate(data["keys"].tolist())}
+                self._data = data
+                self._mtime = mtime
+        return True
+
+    def lookup(self, question: dict) -> Optional[Dict]:
+        """
+        回傳 {"store": 向量資料夾, "index_version": 建置時版本, "ids": [...], "scores": [...]}，
+        題目不在查表中時回傳 None。
+        """
+        if not self._ensure_loaded():
+            return None
+        key = retrieval_key(question)
+        row = self._rows.get(key) if key is not None else None
+        if row is None:
+            return None
+        ids = self._data["ids"][row]
+        valid = ids >= 0
+        store = str(self._data["stores"][row])
+        return {
+            "store": store,
+            "index_version": self._header.get("index_versions", {}).get(store),
+            "ids": ids[valid].tolist(),
+            "scores": self._data["scores"][row][valid].astype("float32").tolist()
+        }
+
+
+_precomputed = PrecomputedRetrieval()
+
+
+def get_precomputed_retrieval() -> PrecomputedRetrieval:
+    return _precomputed
@@ -1,12 +1,15 @@
 # rag_helper.py
 from vector_builder.vector_store import VectorStore
+from vector_builder.store_cache import get_store_cache
 from src.managers.profile_manager import get_user_profile
 
 user_profile = get_user_profile()
 
-# ✅ 新增：用向量庫搜尋與自動補上下文
-vs = VectorStore()
-vs.load("data/vector_output_hf/ISO 14064-1")  # 📁 可改為對應主題的資料夾
+# ✅ 新增：用向量庫搜尋與自動補上下文（首次查詢時才載入，與其他模組共用行程層級的向量庫快取）
+RAG_HELPER_VECTOR_PATH = "data/vector_output_hf/ISO 14064-1"  # 📁 可改為對應主題的資料夾
+
+def _get_vector_store() -> VectorStore:
+    return get_store_cache().get(RAG_HELPER_VECTOR_PATH)
 
 def generate_rag_based_prompt(
     current_q: dict,
@@ -20,7 +23,7 @@ def generate_rag_based_prompt(
 
     # ✅ 自動查詢相關段落（若未傳入 rag_context）
     if not rag_context:
-        results = vs.search(question_text, top_k=4)
+        results = _get_vector_store().search(question_text, top_k=4)
         rag_context = "\n\n".join([r["text"] for r in results])
 
     # ✅ 串接 Prompt
@@ -1,53 +1,170 @@
 # 📂 src/utils/rag_retriever.py
 
+import json
 from pathlib import Path
-from typing import List, Dict
-from vector_builder.vector_store import VectorStore
+from typing import List, Dict, Optional, Tuple, Union
+from vector_builder.vector_store import VectorStore, CORPUS_DIR_NAME
+from vector_builder.store_cache import get_store_cache
+from vector_builder.query_cache import get_query_cache
+from vector_builder.tokenizer import count_tokens
+from src.utils.question_retrieval import get_precomputed_retrieval, question_query_text
+from src.utils.topic_to_rag_map import get_rag_doc_for_question
+
+# 補充資料放入 prompt 的 token 上限（段落以 token 分段，3 段約 900 tokens）
+RAG_CONTEXT_MAX_TOKENS = 1200
+
+
+def join_chunks(chunks: List[Dict], max_tokens: Optional[int] = None) -> str:
+    """依相似度順序串接段落文字，超過 token 上限的段落不再加入"""
+    texts, used = [], 0
+    for chunk in chunks:
+        text = chunk.get("text", "")
+        tokens = count_tokens(text)
+        if max_tokens is not None and texts and used + tokens > max_tokens:
+            break
+        texts.append(text)
+        used += tokens
+    return "\n\n".join(texts)
+
 
 class RAGRetriever:
     """
     RAG 向量段落擷取模組
     - 載入指定子資料夾的向量庫
+    - 若無單檔向量庫，改用整合語料庫（_corpus）並以 doc 欄位過濾
     - 查詢相關段落（for GPT 回答 / 報告輔助）
     """
-    def __init__(self, vector_root: str = "data/vector_output_hf"):
+    def __init__(self, vector_root: str = "data/vector_output_hf", use_cache: bool = True):
         self.vector_root = Path(vector_root)
-        self.loaded_stores: Dict[str, VectorStore] = {}
+        self.use_cache = use_cache  # 查詢結果快取（索引重建後自動失效）
 
     def _load_store(self, folder_name: str) -> VectorStore:
-        if folder_name in self.loaded_stores:
-            return self.loaded_stores[folder_name]
-
         vector_path = self.vector_root / folder_name
         if not vector_path.exists():
             raise FileNotFoundError(f"❌ 找不到向量資料夾：{vector_path}")
 
-        store = VectorStore()
-        store.load(vector_path)
-        self.loaded_stores[folder_name] = store
-        return store
+        # ✅ 由行程共用快取取得（跨 session 共用、檔案變更才重新載入）
+        return get_store_cache().get(vector_path)
+
+    def _resolve(self, doc_folder: Optional[str]) -> Tuple[str, Dict]:
+        """
+        決定查詢用的向量庫資料夾與過濾條件：
+        - 優先使用單檔向量資料夾（舊版建置方式）
+        - 否則使用整合語料庫，並限定 doc = doc_folder
+        """
+        if doc_folder and (self.vector_root / doc_folder).exists():
+            return doc_folder, {}
+
+        if (self.vector_root / CORPUS_DIR_NAME).exists():
+            filters = {"doc": doc_folder} if doc_folder else {}
+            return CORPUS_DIR_NAME, filters
+
+        raise FileNotFoundError(f"❌ 找不到向量資料夾：{self.vector_root / (doc_folder or CORPUS_DIR_NAME)}")
+
+    def resolve_store(self, doc_folder: Optional[str]) -> Tuple[str, str]:
+        """回傳 doc_folder 實際查詢的向量庫資料夾與其 index_version（供離線預先計算記錄版本）"""
+        store_name, _ = self._resolve(doc_folder)
+        return store_name, self._load_store(store_name).index_version
 
-    def search_chunks(self, query: str, doc_folder: str, top_k: int = 5) -> List[Dict]:
-        store = self._load_store(doc_folder)
-        return store.search(query, top_k=top_k)
+    def search_chunks(self, query: str, doc_folder: Optional[str], top_k: int = 5, filters: Dict = None) -> List[Dict]:
+        """
+        查詢相關段落；filters 可再限定 source / folder / region / industry / language 等欄位。
+        """
+        return self.search_many([query], [doc_folder], top_k=top_k, filters=filters)[0]
 
-    def get_context(self, query: str, doc_folder: str, top_k: int = 5) -> str:
-        chunks = self.search_chunks(query, doc_folder, top_k=top_k)
-        return "\n\n".join([c.get("text", "") for c in chunks])
+    def search_many(
+        self,
+        queries: List[str],
+        doc_folders: Union[Optional[str], List[Optional[str]]],
+        top_k: int = 5,
+        filters: Dict = None
+    ) -> List[List[Dict]]:
+        """
+        批次查詢多筆問題：
+        - doc_folders 可為單一資料夾，或與 queries 等長的資料夾清單
+        - 先查結果快取；未命中且指向同一向量庫（與相同過濾條件）的查詢合併為一次 search_batch
+        - 回傳結果依 queries 順序分組
+        """
+        if not isinstance(doc_folders, list):
+            doc_folders = [doc_folders] * len(queries)
+        if len(doc_folders) != len(queries):
+            raise ValueError("doc_folders 數量需與 queries 相同")
+
+        cache = get_query_cache() if self.use_cache else None
+        results: List[List[Dict]] = [[] for _ in queries]
+        groups: Dict[str, Dict] = {}
+        for i, (query, folder) in enumerate(zip(queries, doc_folders)):
+            store_name, scope = self._resolve(folder)
+            scope.update(filters or {})
+            scope_key = json.dumps([store_name, scope], ensure_ascii=False, sort_keys=True)
+            if scope_key not in groups:
+                groups[scope_key] = {"store": self._load_store(store_name), "scope": scope, "positions": [], "queries": []}
+            group = groups[scope_key]
+
+            if cache is not None:
+                cached = cache.get_results(group["store"].index_version, scope_key, query, top_k)
+                if cached is not None:
+                    results[i] = cached
+                    continue
+            group["positions"].append(i)
+            group["queries"].append(query)
+
+        for scope_key, group in groups.items():
+            if not group["queries"]:
+                continue
+            batch = group["store"].search_batch(group["queries"], top_k=top_k, filters=group["scope"] or None)
+            for pos, query, chunks in zip(group["positions"], group["queries"], batch):
+                results[pos] = chunks
+                if cache is not None:
+                    cache.put_results(group["store"].index_version, scope_key, query, top_k, chunks)
+        return results
+
+    def search_question(self, question: dict, top_k: int = 3) -> List[Dict]:
+        """
+        題庫題目專用查詢：
+        - 有預先計算結果且向量庫版本一致時，直接依向量 ID 取段落（不需嵌入與搜尋）
+        - 否則以題目文字即時查詢對應的向量資料夾
+        """
+        hit = get_precomputed_retrieval().lookup(question)
+        if hit and len(hit["ids"]) >= top_k:
+            store = self._load_store(hit["store"])
+            if store.index_version == hit["index_version"]:
+                return store.get_chunks(hit["ids"][:top_k], hit["scores"][:top_k])
+
+        rag_doc = get_rag_doc_for_question(question)
+        return self.search_chunks(question_query_text(question), rag_doc, top_k=top_k)
+
+    def get_question_context(self, question: dict, top_k: int = 3, max_tokens: Optional[int] = None) -> str:
+        chunks = self.search_question(question, top_k=top_k)
+        return join_chunks(chunks, max_tokens)
+
+    def get_context(self, query: str, doc_folder: Optional[str], top_k: int = 5, filters: Dict = None,
+                    max_tokens: Optional[int] = None) -> str:
+        chunks = self.search_chunks(query, doc_folder, top_k=top_k, filters=filters)
+        return join_chunks(chunks, max_tokens)
 
 
 # ✅ 提供外部使用的簡化接口
 _rag_retriever = RAGRetriever()
 
-def get_rag_context_for_question(question_text: str, rag_doc: str = None, top_k: int = 3) -> str:
+def get_retriever() -> RAGRetriever:
+    """回傳模組共用的 RAGRetriever（向量庫本身由 store cache 跨 session 共用）"""
+    return _rag_retriever
+
+def get_rag_context_for_question(question_text: Union[str, dict], rag_doc: str = None, top_k: int = 3,
+                                 max_tokens: Optional[int] = RAG_CONTEXT_MAX_TOKENS) -> str:
     """
     提供外部模組使用的簡化接口：
-    - 輸入題目文字與指定資料夾名稱（如：ISO_14064-1）
-    - 回傳向量擷取的段落文字（預設 3 段）
+    - 輸入題目 dict：優先使用離線預先計算的檢索結果，資料夾自動判斷
+    - 輸入題目文字與指定資料夾名稱（如：ISO_14064-1）：即時查詢
+    - 回傳向量擷取的段落文字（預設 3 段，總長不超過 max_tokens）
     """
-    if not rag_doc:
-        return ""
     try:
-        return _rag_retriever.get_context(query=question_text, doc_folder=rag_doc, top_k=top_k)
+        if isinstance(question_text, dict):
+            return _rag_retriever.get_question_context(question_text, top_k=top_k, max_tokens=max_tokens)
+        if not rag_doc:
+            return ""
+        return _rag_retriever.get_context(query=question_text, doc_folder=rag_doc, top_k=top_k,
+                                         max_tokens=max_tokens)
     except Exception as e:
         return f"⚠️ 無法取得 RAG 段落：{str(e)}"
@@ -38,6 +38,7 @@ def generate_basic_report(
     report_sections = {}
     retriever = RAGRetriever()
     question_map = {q["question_id"]: q for questions in question_data.values() for q in questions}
+    rag_requests = []  # (section, 插入位置, 查詢文字)
 
     for ans in user_answers:
         qid = ans["question_id"]
@@ -55,16 +56,29 @@ def generate_basic_report(
 
         if section not in report_sections:
             report_sections[section] = []
-        report_sections[section].append(f"- {selected_sentence}")
+        report_sections[section].append([f"- {selected_sentence}"])
 
-        # 加入向量段落
         if use_rag:
-            try:
-                chunks = retriever.search_chunks(query=question_text, doc_folder=rag_folder, top_k=2)
-                for chunk in chunks:
-                    report_sections[section].append(f"> {chunk['text']}")
-            except Exception as e:
-                report_sections[section].append(f"> ⚠️ 向量補充失敗：{e}")
+            rag_requests.append((section, len(report_sections[section]) - 1, question_text))
+
+    # 加入向量段落（所有題目一次批次查詢）
+    if rag_requests:
+        try:
+            batch = retriever.search_many(
+                queries=[query for _, _, query in rag_requests],
+                doc_folders=rag_folder,
+                top_k=2
+            )
+            for (section, pos, _), chunks in zip(rag_requests, batch):
+                report_sections[section][pos].extend(f"> {chunk['text']}" for chunk in chunks)
+        except Exception as e:
+            for section, pos, _ in rag_requests:
+                report_sections[section][pos].append(f"> ⚠️ 向量補充失敗：{e}")
+
+    report_sections = {
+        section: [line for entry in entries for line in entry]
+        for section, entries in report_sections.items()
+    }
 
     # 組合報告內容
     report_text = ""
@@ -0,0 +1,192 @@
+# src/utils/suggestion_store.py
+"""
+預先計算的「下一步行動建議」查表（SQLite）
+- 單選題的答案只有 CSV 中的 2–5 個選項，可事先為每個 (題目, 選項, 使用者分群) 產生建議
+- 使用者分群：產業 × 角色（前導問卷 q4）；prompt 只帶分群欄位、不含姓名等個人資料，同分群共用
+- 題目文字或學習目標修改後（question_hash 不符）視為未命中，重新產生
+- 提交答案時先查表，命中即直接顯示；多選、自訂答案或尚未產生的組合才即時串流產生
+- 離線：build_followup_suggestions.py 批次產生；線上：背景預讀（prefetcher）為目前題目各選項推測產生並寫回
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.utils.gpt_tools import call_gpt
+from src.utils.question_retrieval import question_key
+from src.sessions.context_tracker import build_following_action_prompt
+
+SUGGESTION_DB_PATH = Path(os.getenv("SUGGESTION_DB_PATH", "data/sqlite/followup_suggestions.sqlite"))
+
+# 與前導問卷 q4（角色）選項一致
+ROLE_OPTIONS = [
+    "老闆 / 負責人",
+    "永續專責 / 管理部門",
+    "現場部門主管 / 員工",
+    "顧問 / 教育人員",
+    "學生或自由學習者",
+]
+DEFAULT_ROLE = "未填"
+
+
+def profile_bucket(user_profile: dict) -> str:
+    """使用者分群：產業|角色"""
+    profile = bucket_profile(user_profile)
+    return f"{profile['industry']}|{profile['role']}"
+
+
+def bucket_profile(user_profile: dict) -> Dict[str, str]:
+    """只保留分群欄位的 profile，作為預先計算建議的 prompt 背景"""
+    user_profile = user_profile or {}
+    return {
+        "industry": user_profile.get("industry") or "未知產業",
+        "role": user_profile.get("role") or DEFAULT_ROLE,
+    }
+
+
+def question_hash(question: dict) -> str:
+    text = f"{question.get('text', '')}\n{question.get('learning_goal', '')}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def is_precomputable(question: dict) -> bool:
+    return question.get("type") == "single" and bool(question.get("options"))
+
+
+def generate_suggestion(question: dict, answer: str, user_profile: dict) -> str:
+    """以分群 profile 產生建議；失敗時拋出例外（不寫入錯誤訊息）"""
+    prompt, rag_question = build_following_action_prompt(question, answer, bucket_profile(user_profile))
+    return call_gpt(prompt=prompt, rag_question=rag_question, raise_errors=True).strip()
+
+
+class SuggestionStore:
+    def __init__(self, db_path: Path = SUGGESTION_DB_PATH):
+        self.db_path = Path(db_path)
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS suggestions (question_key TEXT, answer TEXT, bucket TEXT, "
+            "question_hash TEXT, suggestion TEXT, source TEXT, created_at REAL, "
+            "PRIMARY KEY (question_key, answer, bucket))"
+        )
+        self._conn.commit()
+
+    def get(self, question: dict, answer: str, bucket: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT suggestion FROM suggestions WHERE question_key = ? AND answer = ? AND bucket = ? "
+                "AND question_hash = ?",
+                (question_key(question), str(answer).strip(), bucket, question_hash(question))
+            ).fetchone()
+            self.stats["hits" if row else "misses"] += 1
+        return row[0] if row else None
+
+    def missing_answers(self, question: dict, bucket: str) -> List[str]:
+        """該題在此分群下尚未產生建議的選項（依題目選項順序）"""
+        with self._lock:
+            done = {row[0] for row in self._conn.execute(
+                "SELECT answer FROM suggestions WHERE question_key = ? AND bucket = ? AND question_hash = ?",
+                (question_key(question), bucket, question_hash(question))
+            )}
+        return [opt for opt in question.get("options", []) if str(opt).strip() not in done]
+
+    def put_many(self, rows: Iterable[Tuple[dict, str, str, str]], source: str = "precompute"):
+        """rows：(題目, 選項, 分群, 建議)"""
+        now = time.time()
+        records = [(question_key(q), str(answer).strip(), bucket, question_hash(q), suggestion, source, now)
+                   for q, answer, bucket, suggestion in rows]
+        if not records:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO suggestions VALUES (?, ?, ?, ?, ?, ?, ?)", records)
+            self._conn.commit()
+            self.stats["writes"] += len(records)
+
+    def put(self, question: dict, answer: str, bucket: str, suggestion: str, source: str = "speculative"):
+        self.put_many([(question, answer, bucket, suggestion)], source=source)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM suggestions").fetchone()[0]
+            by_source = dict(self._conn.execute("SELECT source, COUNT(*) FROM suggestions GROUP BY source"))
+        return dict(self.stats, entries=entries, by_source=by_source)
+
+
+_store: Optional[SuggestionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_suggestion_store() -> SuggestionStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SuggestionStore()
+    return _store
+
+
+def lookup_suggestion(question: dict, selected, user_profile: dict) -> Optional[str]:
+    """提交答案時查表；只有單選且答案為題目選項之一時可能命中"""
+    answers = selected if isinstance(selected, list) else [selected]
+    if not is_precomputable(question) or len(answers) != 1 or answers[0] not in question.get("options", []):
+        return None
+    try:
+        return get_suggestion_store().get(question, answers[0], profile_bucket(user_profile))
+    except Exception as e:
+        print(f"⚠️ 建議查表失敗：{e}")
+        return None
+
+
+def speculate_suggestion(question: dict, answer: str, user_profile: dict) -> str:
+    """線上推測：使用者仍在閱讀時為單一選項產生建議並寫回查表（由 prefetcher 於背景呼叫）"""
+    suggestion = generate_suggestion(question, answer, user_profile)
+    get_suggestion_store().put(question, answer, profile_bucket(user_profile), suggestion)
+    return suggestion
+
+
+def precompute_suggestions(questions: List[dict], profiles: List[dict], store: SuggestionStore,
+                           workers: int = 4, overwrite: bool = False, flush_every: int = 50) -> Dict[str, int]:
+    """
+    為每個 (單選題, 選項, 分群 profile) 產生建議並寫入查表
+    - 已存在且題目未修改的組合略過（overwrite=True 則全部重算），中斷後重跑會接續
+    - 每 flush_every 筆寫入一次，中途失敗的組合不寫入，下次重跑補上
+    回傳統計：{"total": 組合數, "skipped": 已存在, "stored": 新寫入, "failed": 失敗}
+    """
+    tasks = []
+    for q in questions:
+        if not is_precomputable(q):
+            continue
+        for profile in profiles:
+            bucket = profile_bucket(profile)
+            answers = q["options"] if overwrite else store.missing_answers(q, bucket)
+            tasks.extend((q, answer, profile) for answer in answers)
+
+    total = sum(len(q["options"]) for q in questions if is_precomputable(q)) * len(profiles)
+    stats = {"total": total, "skipped": total - len(tasks), "stored": 0, "failed": 0}
+    buffer = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(generate_suggestion, q, answer, profile): (q, answer, profile)
+                   for q, answer, profile in tasks}
+        for i, future in enumerate(as_completed(futures), 1):
+            q, answer, profile = futures[future]
+            try:
+                buffer.append((q, answer, profile_bucket(profile), future.result()))
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"⚠️ 建議產生失敗：{question_key(q)} / {answer} / {profile_bucket(profile)} - {e}")
+            if len(buffer) >= flush_every:
+                store.put_many(buffer)
+                stats["stored"] += len(buffer)
+                buffer = []
+                print(f"💾 已寫入 {stats['stored']} 筆（進度 {i}/{len(tasks)}）")
+    store.put_many(buffer)
+    stats["stored"] += len(buffer)
+    return stats
@@ -2,7 +2,7 @@
 
 import streamlit as st
 from pathlib import Path
-from vector_builder.vector_store import VectorStore
+from vector_builder.vector_store import VectorStore, CORPUS_DIR_NAME
 
 def ensure_vector_ready():
     """
@@ -12,6 +12,7 @@ def ensure_vector_ready():
     vector_store = VectorStore()
     vector_path = Path("data/vector_output")
 
-    if not vector_store.exists(vector_path):
+    # 單一索引模式存於 _corpus/
+    if not (vector_store.exists(vector_path) or vector_store.exists(vector_path / CORPUS_DIR_NAME)):
         st.warning("⚠️ 尚未建置知識庫，請先至後台執行向量建置流程（build_vector_db.py）。")
         st.stop()
@@ -1,5 +1,7 @@
 # test_vector_search.py
-from vector_builder.vector_store import VectorStore
+from pathlib import Path
+
+from vector_builder.vector_store import CORPUS_DIR_NAME, VectorStore
 
 vector_path = "data/vector_output_hf"
 store = VectorStore(model_name="sentence-transformers/all-MiniLM-L6-v2")
@@ -16,4 +18,22 @@ else:
     for i, r in enumerate(results, 1):
         print(f"[{i}] 相似度分數：{r['score']:.4f}")
         print(r['text'][:200].strip().replace('\n', ' ') + "...")
+        if r.get("sources"):
+            print("出處：" + "、".join(f"{s.get('source')} p.{s.get('page')}" for s in r["sources"]))
         print("---")
+
+# ✅ 整合索引的 metadata 過濾：各地區／產業資料夾應至少命中一筆，且結果皆符合條件
+corpus_path = Path(vector_path) / CORPUS_DIR_NAME
+corpus = VectorStore(model_name="sentence-transformers/all-MiniLM-L6-v2")
+if corpus.exists(corpus_path):
+    corpus.load(corpus_path)
+    checks = [{"region": "taiwan"}, {"region": "global"}, {"folder": "cases"}]
+    for filters in checks:
+        hits = corpus.search(query, top_k=5, filters=filters)
+        field, value = next(iter(filters.items()))
+        if not hits:
+            print(f"⚠️ 過濾 {filters} 沒有命中（metadata 可能未依資料夾分類，請重建索引）")
+        elif any(hit.get(field) != value for hit in hits):
+            print(f"⚠️ 過濾 {filters} 的結果含不符合條件的段落")
+        else:
+            print(f"✅ 過濾 {filters}：{len(hits)} 筆")
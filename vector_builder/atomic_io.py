@@ -0,0 +1,69 @@
+# vector_builder/atomic_io.py
+"""
+原子寫入：先寫入同資料夾的暫存檔並 fsync，再以 os.replace 取代正式檔案
+- 建置中途被終止時，正式檔案不是舊版就是完整的新版，不會留下寫到一半的索引或紀錄
+- 查詢端（Streamlit）同時讀取時也只會看到完整的檔案
+- 暫存檔以 . 開頭、.tmp 結尾；前次中斷留下的暫存檔於下次寫入時覆蓋
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+def fsync_file(path: Path):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def fsync_dir(path: Path):
+    """讓 rename 本身落盤（Windows 不支援開啟資料夾，略過）"""
+    if os.name == "nt":
+        return
+    fd = os.open(str(path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def temp_path_for(path: Path) -> Path:
+    path = Path(path)
+    return path.with_name(f".{path.name}.tmp")
+
+
+@contextmanager
+def atomic_path(path) -> Iterator[Path]:
+    """
+    提供暫存檔路徑給以路徑寫檔的函式（faiss.write_index、sqlite3 等）；
+    區塊正常結束才取代正式檔案，發生例外時刪除暫存檔、保留原檔。
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temp_path_for(path)
+    if tmp_path.exists():
+        tmp_path.unlink()
+    try:
+        yield tmp_path
+        fsync_file(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+    fsync_dir(path.parent)
+
+
+@contextmanager
+def atomic_write(path, mode: str = "w", encoding: str = "utf-8"):
+    """以檔案物件寫入，結束時原子取代正式檔案"""
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, mode, encoding=None if "b" in mode else encoding) as f:
+            yield f
+
+
+def write_json_atomic(path, data, indent: int = 2):
+    with atomic_write(path) as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
@@ -0,0 +1,219 @@
+# vector_builder/build_record.py
+"""
+以內容雜湊為 key 的建置紀錄（vector_build_record.json）
+- 每份 PDF 以 SHA-256 識別：搬移或改名不需重新嵌入，內容修改則只重建該檔的段落
+- 紀錄附帶「分段設定 + 嵌入模型 + 索引類型」指紋，設定變更時整批重建
+- 每筆紀錄保存該檔的向量 ID 範圍，修改或刪除時可自索引中移除
+- 檔案大小與修改時間未變時沿用上次的雜湊，未變動的語料不需重新讀檔
+- 跨檔去重的檔案互相記錄關聯（linked），其中一份移除或搬移時關聯檔案一併重建
+- 整合模式記錄對應索引的 index_version；儲存索引後、寫入紀錄前中斷時，兩者不一致即完整重建
+- 紀錄以暫存檔加 rename 原子寫入
+"""
+
+from bisect import bisect_right
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from .atomic_io import write_json_atomic
+
+RECORD_VERSION = 2
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_fingerprint(chunker_settings: Dict, model_name: str, dimension: int, index_type: str = "flat") -> str:
+    """索引類型也列入指紋：改用其他索引時整批重建（段落向量由嵌入快取取得，不需重新嵌入）"""
+    payload = {"chunker": chunker_settings, "model": model_name, "dimension": dimension, "index_type": index_type}
+    return hashlib.sha1(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def expand_ranges(ranges: List[List[int]]) -> List[int]:
+    return [i for start, end in ranges for i in range(start, end)]
+
+
+class BuildPlan(NamedTuple):
+    added: List[Tuple[Path, str]]     # 新檔或內容已修改：(路徑, 雜湊)
+    moved: List[Tuple[Path, str]]     # 內容相同但路徑改變：只需更新 metadata
+    removed: List[str]                # 已刪除或已修改檔案的舊雜湊
+    unchanged: List[Tuple[Path, str]]
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.moved or self.removed)
+
+
+class BuildRecord:
+    """
+    紀錄格式：
+    {"version": 2, "fingerprint": "...", "index_version": 整合索引的版本（單檔模式為 null）,
+     "files": {sha256: {"path": 相對路徑, "filename": 檔名,
+      "size": ..., "mtime_ns": ..., "chunks": 段落數, "ids": [[起, 迄), ...], "output": 單檔資料夾}}}
+    """
+
+    def __init__(self, path: Path, fingerprint: str):
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.files: Dict[str, Dict] = {}
+        self.index_version: Optional[str] = None
+        # 舊版（以絕對路徑為 key）或設定不同的紀錄：需完整重建
+        self.stale = False
+
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == RECORD_VERSION and data.get("fingerprint") == fingerprint:
+                self.files = data.get("files", {})
+                self.index_version = data.get("index_version")
+            else:
+                self.stale = bool(data)
+
+    def save(self):
+        write_json_atomic(self.path, {"version": RECORD_VERSION, "fingerprint": self.fingerprint,
+                                      "index_version": self.index_version, "files": self.files})
+
+    def matches_index(self, index_version: str) -> bool:
+        """紀錄是否描述此版本的索引（舊紀錄沒有版本欄位時視為相符）"""
+        return self.index_version is None or self.index_version == index_version
+
+    def reset(self):
+        """紀錄與索引不一致時捨棄紀錄，整批重建"""
+        self.files = {}
+        self.index_version = None
+        self.stale = True
+
+    def _relative(self, pdf_path: Path, base_dir: Path) -> str:
+        return pdf_path.resolve().relative_to(base_dir.resolve()).as_posix()
+
+    def hash_file(self, pdf_path: Path, base_dir: Path, known: Optional[Dict[str, Tuple[str, Dict]]] = None) -> str:
+        """大小與修改時間和紀錄相同時直接沿用紀錄中的雜湊"""
+        stat = pdf_path.stat()
+        rel_path = self._relative(pdf_path, base_dir)
+        if known and rel_path in known:
+            sha, entry = known[rel_path]
+            if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+                return sha
+        return file_sha256(pdf_path)
+
+    def plan(self, pdf_paths: List[Path], base_dir: Path) -> BuildPlan:
+        """比對目前的 PDF 與紀錄，決定需新增、搬移、移除的檔案"""
+        base_dir = Path(base_dir)
+        known = {entry["path"]: (sha, entry) for sha, entry in self.files.items()}
+
+        added, moved, unchanged = [], [], []
+        seen: Dict[str, Path] = {}
+        for pdf_path in pdf_paths:
+            sha = self.hash_file(pdf_path, base_dir, known)
+            if sha in seen:
+                logging.warning("⚠️ 內容與 %s 相同，略過：%s", seen[sha].name, pdf_path)
+                continue
+            seen[sha] = pdf_path
+
+            entry = self.files.get(sha)
+            if entry is None:
+                added.append((pdf_path, sha))
+            elif entry["path"] != self._relative(pdf_path, base_dir):
+                moved.append((pdf_path, sha))
+            else:
+                unchanged.append((pdf_path, sha))
+
+        removed = [sha for sha in self.files if sha not in seen]
+
+        # 去重關聯：移除或搬移的檔案與其他檔案共用代表段落／來源清單時，關聯檔案一併重建
+        affected = self._linked_closure(removed + [sha for _, sha in moved if self.files[sha].get("linked")])
+        if affected:
+            cascaded = [(p, sha) for p, sha in moved + unchanged if sha in affected]
+            logging.info("去重關聯需重建：%d 份檔案", len(cascaded))
+            moved = [(p, sha) for p, sha in moved if sha not in affected]
+            unchanged = [(p, sha) for p, sha in unchanged if sha not in affected]
+            added += cascaded
+            removed += [sha for _, sha in cascaded]
+        return BuildPlan(added, moved, removed, unchanged)
+
+    def _linked_closure(self, shas: List[str]) -> Set[str]:
+        closure, stack = set(), list(shas)
+        while stack:
+            sha = stack.pop()
+            if sha in closure:
+                continue
+            closure.add(sha)
+            stack.extend(self.files.get(sha, {}).get("linked", []))
+        return closure
+
+    def link(self, links: Dict[str, Set[str]]):
+        """記錄去重產生的檔案關聯（雙向）"""
+        for sha, others in links.items():
+            if sha in self.files:
+                entry = self.files[sha]
+                entry["linked"] = sorted(set(entry.get("linked", [])) | (set(others) & set(self.files)))
+
+    def set(self, sha: str, pdf_path: Path, base_dir: Path, **fields):
+        stat = pdf_path.stat()
+        entry = self.files.get(sha, {})
+        entry.update({
+            "path": self._relative(pdf_path, base_dir),
+            "filename": pdf_path.name,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns
+        })
+        entry.update(fields)
+        self.files[sha] = entry
+
+    def vector_ids(self, sha: str) -> List[int]:
+        return expand_ranges(self.files.get(sha, {}).get("ids", []))
+
+    def id_owner(self) -> Callable[[int], Optional[str]]:
+        """回傳「向量 ID → 所屬檔案雜湊」的查詢函式（以 ID 範圍二分搜尋）"""
+        spans = sorted((start, end, sha) for sha, entry in self.files.items() for start, end in entry.get("ids", []))
+        starts = [start for start, _, _ in spans]
+
+        def owner(vector_id: int) -> Optional[str]:
+            pos = bisect_right(starts, vector_id) - 1
+            if pos >= 0 and vector_id < spans[pos][1]:
+                return spans[pos][2]
+            return None
+        return owner
+
+    def drop(self, sha: str) -> Optional[Dict]:
+        return self.files.pop(sha, None)
+
+
+def apply_plan_to_store(store, record: BuildRecord, plan: BuildPlan, base_dir: Path,
+                        dedup: bool = True) -> List[Tuple[Path, str]]:
+    """
+    整合索引（單一索引）模式：移除已刪除／已修改檔案的向量，搬移的檔案只更新 metadata。
+    回傳需重新嵌入的檔案（搬移後段落數不一致，例如 metadata 規則改變時）。
+    dedup 與建置時一致：先在檔案內去重，再與紀錄中的向量數比對。
+    """
+    from .dedup import merge_duplicates
+    from .ingest import parse_pdf
+
+    for sha in plan.removed:
+        removed = store.remove_ids(record.vector_ids(sha))
+        entry = record.drop(sha)
+        logging.info("移除：%s（%d 筆向量）", entry.get("filename") if entry else sha, removed)
+
+    to_embed = []
+    for pdf_path, sha in plan.moved:
+        ids = record.vector_ids(sha)
+        metadata_list = parse_pdf(pdf_path, base_dir)
+        if dedup:
+            metadata_list = merge_duplicates(metadata_list)
+        if len(metadata_list) != len(ids):
+            store.remove_ids(ids)
+            record.drop(sha)
+            to_embed.append((pdf_path, sha))
+            continue
+        store.replace_metadata(ids, metadata_list)
+        record.set(sha, pdf_path, base_dir)
+        logging.info("搬移：%s（沿用 %d 筆向量）", pdf_path.name, len(ids))
+    return to_embed
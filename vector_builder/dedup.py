@@ -0,0 +1,206 @@
+# vector_builder/dedup.py
+"""
+建置時的段落去重
+- 完全重複：正規化文字（NFKC、去空白、小寫）的 SHA-1 相同
+- 近似重複：字元 4-gram（中英文皆適用）的 64 位元 SimHash，漢明距離 ≤ max_distance（預設 3）且長度相近
+  以 4 段 × 16 位元分桶：距離 ≤ 3 的兩個指紋至少有一段完全相同，只需比對同桶候選
+- 重複段落不嵌入、不加入索引，而是記錄為代表段落的來源（metadata 的 sources 欄位）
+- 新的代表段落先只對同一份檔案可見，寫入暫存區後（confirm）才供其他檔案比對；
+  檔案失敗時（discard）未寫入的代表段落一併移除，其他檔案不會指向從未寫入的段落
+"""
+
+import hashlib
+import threading
+import unicodedata
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# 段落 metadata 上的暫存欄位（寫入暫存區時移除）
+CONTENT_KEY_FIELD = "_content_key"
+DUPLICATE_OF_FIELD = "_duplicate_of"
+
+# 來源參照保留的欄位（含所有可過濾欄位，讓以來源過濾時仍能命中代表段落）
+SOURCE_REF_FIELDS = ("source", "doc", "path", "folder", "region", "industry", "language", "main_topic",
+                     "page", "chunk_id")
+
+SHINGLE_SIZE = 4
+NUM_BANDS = 4
+BAND_BITS = 16
+MIN_SHINGLES = 8          # 太短的段落只做完全重複比對
+MIN_LENGTH_RATIO = 0.8    # 長度差異過大的段落不視為近似重複
+
+
+def normalize_text(text: str) -> str:
+    return "".join(unicodedata.normalize("NFKC", text).lower().split())
+
+
+def content_key(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _shingle_hashes(normalized: str) -> np.ndarray:
+    """字元 shingle 的 64 位元雜湊（多項式滾動雜湊 + splitmix64 混合，全程向量化）"""
+    codepoints = np.frombuffer(normalized.encode("utf-32-le"), dtype="uint32").astype("uint64")
+    n = len(codepoints) - SHINGLE_SIZE + 1
+    if n <= 0:
+        return np.zeros(0, dtype="uint64")
+    hashes = np.zeros(n, dtype="uint64")
+    for offset in range(SHINGLE_SIZE):
+        hashes = hashes * np.uint64(1000003) + codepoints[offset:offset + n]
+    hashes = np.unique(hashes)
+    hashes ^= hashes >> np.uint64(30)
+    hashes *= np.uint64(0xBF58476D1CE4E5B9)
+    hashes ^= hashes >> np.uint64(27)
+    hashes *= np.uint64(0x94D049BB133111EB)
+    hashes ^= hashes >> np.uint64(31)
+    return hashes
+
+
+def simhash(normalized: str) -> Optional[int]:
+    """字元 shingle 的 64 位元 SimHash；shingle 太少時回傳 None"""
+    hashes = _shingle_hashes(normalized)
+    if len(hashes) < MIN_SHINGLES:
+        return None
+    bits = np.unpackbits(hashes.view("uint8").reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype="int64") * 2 > len(hashes)
+    return int(np.packbits(votes, bitorder="little").view("uint64")[0])
+
+
+def source_ref(meta: Dict) -> Dict:
+    return {field: meta[field] for field in SOURCE_REF_FIELDS if meta.get(field) is not None}
+
+
+class ChunkDeduplicator:
+    """
+    依處理順序決定代表段落：第一次出現者為代表，之後完全或近似重複者標記為重複。
+    代表段落以 content key 識別。
+    check 於解析執行緒呼叫，confirm / discard 於寫入端呼叫，以 lock 保護。
+    """
+
+    def __init__(self, max_distance: int = 3):
+        if max_distance >= NUM_BANDS:
+            raise ValueError(f"max_distance 需小於分段數 {NUM_BANDS}")
+        self.max_distance = max_distance
+        self._keys: Dict[str, Tuple[Optional[int], int]] = {}   # content key → (simhash, 長度)
+        self._bands: List[Dict[int, List[str]]] = [{} for _ in range(NUM_BANDS)]
+        # 尚未寫入暫存區的代表段落 → 產生該段落的檔案（只對這些檔案可見）
+        self._pending: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"exact": 0, "near": 0, "unique": 0}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _add(self, key: str, signature: Optional[int], length: int):
+        self._keys[key] = (signature, length)
+        if signature is not None:
+            for band, bucket in enumerate(self._bands):
+                bucket.setdefault((signature >> (band * BAND_BITS)) & 0xFFFF, []).append(key)
+
+    def _remove(self, key: str):
+        signature, _ = self._keys.pop(key)
+        if signature is not None:
+            for band, bucket in enumerate(self._bands):
+                bucket[(signature >> (band * BAND_BITS)) & 0xFFFF].remove(key)
+
+    def _visible(self, key: str, owner: Hashable) -> bool:
+        owners = self._pending.get(key)
+        return owners is None or owner in owners
+
+    def register(self, text: str, key: Optional[str] = None) -> str:
+        """加入既有的代表段落（已在索引或暫存區中）"""
+        normalized = normalize_text(text)
+        key = key or hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        with self._lock:
+            if key not in self._keys:
+                self._add(key, simhash(normalized), len(normalized))
+            self._pending.pop(key, None)
+        return key
+
+    def register_store(self, store) -> Dict[str, int]:
+        """加入既有索引的全部段落，回傳 content key → 向量 ID（供合併來源時更新代表段落）"""
+        return {self.register(meta.get("text", "")): vector_id for vector_id, meta in store.iter_metadata()}
+
+    def _find_near(self, signature: int, length: int, owner: Hashable) -> Optional[str]:
+        seen = set()
+        for band, bucket in enumerate(self._bands):
+            for key in bucket.get((signature >> (band * BAND_BITS)) & 0xFFFF, ()):
+                if key in seen or not self._visible(key, owner):
+                    continue
+                seen.add(key)
+                other, other_length = self._keys[key]
+                if min(length, other_length) < MIN_LENGTH_RATIO * max(length, other_length):
+                    continue
+                if bin(signature ^ other).count("1") <= self.max_distance:
+                    return key
+        return None
+
+    def check(self, meta: Dict, owner: Hashable = None) -> bool:
+        """
+        標記段落：代表段落設定 CONTENT_KEY_FIELD；重複段落另設 DUPLICATE_OF_FIELD（代表段落的 key）。
+        owner 為段落所屬檔案：新的代表段落在 confirm 前只對同一 owner 可見。
+        回傳是否為重複。
+        """
+        normalized = normalize_text(meta["text"])
+        key = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        meta[CONTENT_KEY_FIELD] = key
+        signature = simhash(normalized)
+
+        with self._lock:
+            if key in self._keys and self._visible(key, owner):
+                meta[DUPLICATE_OF_FIELD] = key
+                self.stats["exact"] += 1
+                return True
+
+            if signature is not None:
+                near = self._find_near(signature, len(normalized), owner)
+                if near is not None:
+                    meta[DUPLICATE_OF_FIELD] = near
+                    self.stats["near"] += 1
+                    return True
+
+            if key not in self._keys:
+                self._add(key, signature, len(normalized))
+                self._pending[key] = {owner}
+            elif key in self._pending:
+                self._pending[key].add(owner)   # 其他檔案尚未寫入的相同段落：兩者各自成為代表段落
+            self.stats["unique"] += 1
+            return False
+
+    def confirm(self, metadata_list: Iterable[Dict]):
+        """一批段落已寫入暫存區：其中的代表段落開放給所有檔案比對"""
+        with self._lock:
+            for meta in metadata_list:
+                if DUPLICATE_OF_FIELD not in meta and CONTENT_KEY_FIELD in meta:
+                    self._pending.pop(meta[CONTENT_KEY_FIELD], None)
+
+    def discard(self, owner: Hashable):
+        """檔案處理失敗：移除該檔案尚未寫入暫存區的代表段落"""
+        with self._lock:
+            for key in [key for key, owners in self._pending.items() if owner in owners]:
+                owners = self._pending[key]
+                owners.discard(owner)
+                if not owners:
+                    del self._pending[key]
+                    self._remove(key)
+
+
+def merge_duplicates(metadata_list: List[Dict]) -> List[Dict]:
+    """
+    單一檔案內去重，回傳代表段落的 metadata（重複段落併入其 sources），與建置時寫入索引的列一一對應。
+    搬移檔案時用於比對段落數與更新 metadata（有跨檔關聯的檔案會整份重建，不經過此處）。
+    """
+    deduper = ChunkDeduplicator()
+    canonicals: Dict[str, Dict] = {}
+    for meta in metadata_list:
+        meta = dict(meta)
+        deduper.check(meta)
+        key = meta.pop(CONTENT_KEY_FIELD)
+        dup_of = meta.pop(DUPLICATE_OF_FIELD, None)
+        if dup_of is None:
+            canonicals[key] = meta
+        else:
+            canonical = canonicals[dup_of]
+            canonical.setdefault("sources", [source_ref(canonical)]).append(source_ref(meta))
+    return list(canonicals.values())
@@ -0,0 +1,259 @@
+# vector_builder/embedding_backends.py
+"""
+可替換的段落嵌入後端
+- sentence-transformers：本機模型（由 model_registry 共用，同一行程只載入一次）
+- openai：OpenAI Embeddings API
+- http：OpenAI 相容格式的本機／內網嵌入服務（測試或離線替代用）
+
+共同行為（EmbeddingBackend.embed）：
+- 依 batch_size 分批呼叫，最多 max_concurrency 批同時進行，結果依輸入順序組合
+- 可重試的錯誤（429、5xx、逾時、連線失敗）以指數退避加隨機抖動重試 max_retries 次
+- tokens_per_minute 設定時以 token bucket 節流，避免觸發 API 的 TPM 上限
+- 模型名稱與向量維度一律由後端提供，建置索引時不會出現維度不一致
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from vector_builder.model_registry import get_model, DEFAULT_MODEL_NAME
+from vector_builder.tokenizer import count_tokens
+
+# 已知 OpenAI 模型的預設維度（未列出者以一次試算取得）
+OPENAI_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+
+
+class RateLimiter:
+    """每分鐘 token 數的 token bucket；單批超過上限時等到桶滿後放行"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int):
+        tokens = min(float(tokens), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                wait = (tokens - self.available) / self.rate
+            time.sleep(wait)
+
+
+class EmbeddingBackend:
+    """子類別實作 _embed_batch（單批文字 → (n, dim) 向量）與 dimension"""
+
+    name = "base"
+
+    def __init__(self, model_name: str, batch_size: int = 64, max_concurrency: int = 1,
+                 max_retries: int = 5, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 tokens_per_minute: Optional[int] = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = RateLimiter(tokens_per_minute) if tokens_per_minute else None
+        self.stats = {"batches": 0, "retries": 0, "tokens": 0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def dimension(self) -> int:
+        raise NotImplementedError
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def is_retryable(self, error: Exception) -> bool:
+        status = getattr(error, "status_code", None) or getattr(error, "code", None)
+        if isinstance(status, int):
+            return status in RETRYABLE_STATUS
+        return isinstance(error, (TimeoutError, ConnectionError, urllib.error.URLError))
+
+    def _call_with_retry(self, texts: List[str]) -> np.ndarray:
+        tokens = sum(count_tokens(t) for t in texts) if self.limiter else 0
+        for attempt in range(self.max_retries + 1):
+            if self.limiter:
+                self.limiter.acquire(tokens)
+            try:
+                vectors = np.asarray(self._embed_batch(texts), dtype="float32")
+                with self._stats_lock:
+                    self.stats["batches"] += 1
+                    self.stats["tokens"] += tokens
+                return vectors
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+                logging.warning("⚠️ 嵌入失敗（%s），%.1f 秒後重試（%d/%d）", e, delay, attempt + 1, self.max_retries)
+                with self._stats_lock:
+                    self.stats["retries"] += 1
+                time.sleep(delay)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """回傳 (len(texts), dimension) 的 float32 矩陣"""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype="float32")
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if self.max_concurrency == 1 or len(batches) == 1:
+            results = [self._call_with_retry(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                results = list(executor.map(self._call_with_retry, batches))
+
+        vectors = np.vstack(results)
+        if vectors.shape != (len(texts), self.dimension):
+            raise ValueError(f"{self.name} 回傳的向量形狀 {vectors.shape} 與預期 ({len(texts)}, {self.dimension}) 不一致")
+        return vectors
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        return self.embed(texts)
+
+    def describe(self) -> Dict:
+        return {"backend": self.name, "model": self.model_name, "dimension": self.dimension}
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, batch_size: int = 64, **kwargs):
+        # 本機模型自行分批推論，不需並行與節流
+        kwargs.pop("max_concurrency", None)
+        kwargs.pop("tokens_per_minute", None)
+        kwargs.pop("max_retries", None)
+        super().__init__(model_name, batch_size=batch_size, max_retries=0, **kwargs)
+
+    @property
+    def model(self):
+        return get_model(self.model_name)
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype="float32")
+        vectors = self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+        return np.asarray(vectors, dtype="float32")
+
+
+class OpenAIBackend(EmbeddingBackend):
+    name = "openai"
+
+    def __init__(self, model_name: str = "text-embedding-3-small", dimensions: Optional[int] = None,
+                 api_key: Optional[str] = None, batch_size: int = 100, max_concurrency: int = 4,
+                 tokens_per_minute: Optional[int] = 1_000_000, timeout: float = 60.0, **kwargs):
+        super().__init__(model_name, batch_size=batch_size, max_concurrency=max_concurrency,
+                         tokens_per_minute=tokens_per_minute, **kwargs)
+        self.dimensions = dimensions  # text-embedding-3 系列可縮減輸出維度
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.timeout = timeout
+        self._client = None
+        self._dimension = dimensions or OPENAI_DIMENSIONS.get(model_name)
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI  # 延遲匯入，只用本機模型時不需安裝
+            # 重試由本模組統一處理
+            self._client = OpenAI(api_key=self.api_key, timeout=self.timeout, max_retries=0)
+        return self._client
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = len(self._embed_batch(["dimension probe"])[0])
+        return self._dimension
+
+    def is_retryable(self, error: Exception) -> bool:
+        if type(error).__name__ in ("RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError"):
+            return True
+        return super().is_retryable(error)
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        params = {"model": self.model_name, "input": texts}
+        if self.dimensions:
+            params["dimensions"] = self.dimensions
+        response = self.client.embeddings.create(**params)
+        data = sorted(response.data, key=lambda item: item.index)
+        return np.array([item.embedding for item in data], dtype="float32")
+
+    def describe(self) -> Dict:
+        return dict(super().describe(), dimensions=self.dimensions)
+
+
+class HTTPBackend(EmbeddingBackend):
+    """
+    POST {"model": ..., "input": [...]} 至 url；回應可為 OpenAI 格式 {"data": [{"embedding": [...]}]}
+    或 {"embeddings": [[...], ...]}
+    """
+
+    name = "http"
+
+    def __init__(self, url: str = "http://localhost:8080/v1/embeddings", model_name: str = "local",
+                 dimension: Optional[int] = None, batch_size: int = 32, max_concurrency: int = 2,
+                 timeout: float = 60.0, headers: Optional[Dict[str, str]] = None, **kwargs):
+        super().__init__(model_name, batch_size=batch_size, max_concurrency=max_concurrency, **kwargs)
+        self.url = url
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self._dimension = dimension
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = len(self._embed_batch(["dimension probe"])[0])
+        return self._dimension
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        body = json.dumps({"model": self.model_name, "input": texts}).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers=self.headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            payload = json.loads(response.read().decode("utf-8"))
+        if "data" in payload:
+            rows = [item["embedding"] for item in sorted(payload["data"], key=lambda item: item.get("index", 0))]
+        else:
+            rows = payload["embeddings"]
+        return np.array(rows, dtype="float32")
+
+    def describe(self) -> Dict:
+        return dict(super().describe(), url=self.url)
+
+
+BACKENDS = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    OpenAIBackend.name: OpenAIBackend,
+    HTTPBackend.name: HTTPBackend,
+}
+
+
+def create_backend(name: str = SentenceTransformerBackend.name, **options) -> EmbeddingBackend:
+    """依名稱建立後端；options 為各後端的參數（值為 None 者略過，使用預設）"""
+    if name not in BACKENDS:
+        raise ValueError(f"不支援的嵌入後端：{name}（可用：{', '.join(BACKENDS)}）")
+    return BACKENDS[name](**{k: v for k, v in options.items() if v is not None})
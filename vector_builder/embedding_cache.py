@@ -0,0 +1,138 @@
+# vector_builder/embedding_cache.py
+"""
+段落嵌入的磁碟快取
+- key 為 (模型名稱, 維度, 段落文字 SHA-1)，換索引類型、合併資料夾或中斷後重建都不需重新嵌入
+- 向量依序附加到單一 memmap 檔（預設 float16，體積減半），SQLite 只存 key → 列號
+- 先寫入並 fsync 向量，再提交列號；重新開啟時截掉未提交的尾端
+- 同一批內重複的文字只送模型一次
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "data/cache/embeddings")
+DEFAULT_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")  # float16 / float32
+
+VECTOR_FILE_NAME = "vectors.bin"
+INDEX_DB_NAME = "index.sqlite"
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, dimension: int, cache_dir: str = DEFAULT_CACHE_DIR,
+                 dtype: str = DEFAULT_DTYPE):
+        if dtype not in ("float16", "float32"):
+            raise ValueError(f"不支援的快取精度：{dtype}（可用：float16、float32）")
+        self.model_name = model_name
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self._row_bytes = dimension * self.dtype.itemsize
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+        # 每個 (模型, 維度, 精度) 各自一個資料夾，向量長度固定
+        slug = re.sub(r"[^0-9A-Za-z._-]+", "_", model_name)
+        self.cache_dir = Path(cache_dir) / f"{slug}-{dimension}-{dtype}"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.vector_path = self.cache_dir / VECTOR_FILE_NAME
+
+        self._conn = sqlite3.connect(str(self.cache_dir / INDEX_DB_NAME), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER)")
+        self._conn.commit()
+        # 向量檔列數（重複寫入時可能有未被索引的列，因此以最大列號計算）
+        self._count = self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM entries").fetchone()[0]
+        self._recover()
+        self._vector_file = open(self.vector_path, "ab")
+        self._vectors = None
+
+    def _recover(self):
+        expected = self._count * self._row_bytes
+        size = self.vector_path.stat().st_size if self.vector_path.exists() else 0
+        if size < expected:
+            # 向量檔遺失或被截斷：清空索引重新累積
+            logging.warning("⚠️ 嵌入快取不完整，已重設：%s", self.cache_dir)
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self._count = 0
+            expected = 0
+        if size > expected:
+            with open(self.vector_path, "r+b") as f:
+                f.truncate(expected)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _memmap(self) -> np.ndarray:
+        if self._vectors is None or len(self._vectors) != self._count:
+            self._vectors = np.memmap(self.vector_path, dtype=self.dtype, mode="r",
+                                      shape=(self._count, self.dimension)) if self._count else None
+        return self._vectors
+
+    def get_many(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """回傳 {text_key: float32 向量}，只含命中的項目"""
+        keys = list({text_key(t) for t in texts})
+        rows: Dict[str, int] = {}
+        with self._lock:
+            for start in range(0, len(keys), 900):  # SQLite 參數數量上限
+                chunk = keys[start:start + 900]
+                rows.update(self._conn.execute(
+                    f"SELECT key, row FROM entries WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall())
+            vectors = self._memmap()
+            return {key: np.asarray(vectors[row], dtype="float32") for key, row in rows.items()}
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=self.dtype)
+        if vectors.shape != (len(texts), self.dimension):
+            raise ValueError(f"向量形狀 {vectors.shape} 與文字數 {len(texts)} / 維度 {self.dimension} 不一致")
+        with self._lock:
+            self._vector_file.write(vectors.tobytes())
+            self._vector_file.flush()
+            os.fsync(self._vector_file.fileno())
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO entries VALUES (?, ?)",
+                ((text_key(t), self._count + i) for i, t in enumerate(texts))
+            )
+            self._conn.commit()
+            self._count += len(texts)
+
+    def embed(self, texts: List[str], embed_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """先查快取，只把未命中（且去重）的文字送給 embed_fn，回傳 (n, dim) float32"""
+        found = self.get_many(texts)
+        missing = list(dict.fromkeys(t for t in texts if text_key(t) not in found))
+        self.stats["misses"] += len(missing)
+        self.stats["hits"] += len(texts) - len(missing)
+
+        if missing:
+            new_vectors = np.asarray(embed_fn(missing), dtype="float32")
+            if new_vectors.shape[1] != self.dimension:
+                raise ValueError(f"嵌入維度 {new_vectors.shape[1]} 與快取維度 {self.dimension} 不一致")
+            self.put_many(missing, new_vectors)
+            # 與之後自快取讀出的精度一致，重建結果不因是否命中而不同
+            new_vectors = new_vectors.astype(self.dtype).astype("float32")
+            for text, vec in zip(missing, new_vectors):
+                found[text_key(text)] = vec
+
+        if not texts:
+            return np.zeros((0, self.dimension), dtype="float32")
+        return np.vstack([found[text_key(t)] for t in texts]).astype("float32")
+
+    def wrap(self, embed_fn: Callable[[List[str]], np.ndarray]) -> Callable[[List[str]], np.ndarray]:
+        return lambda texts: self.embed(texts, embed_fn)
+
+    def close(self):
+        with self._lock:
+            self._vector_file.close()
+            self._conn.close()
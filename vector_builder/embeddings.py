@@ -1,18 +1,16 @@
 # vector_builder/embeddings.py
-from sentence_transformers import SentenceTransformer
+from vector_builder.model_registry import get_model, DEFAULT_MODEL_NAME
 
-# 初始化模型（可根據實際使用換模型名）
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-
-def get_embedding(text: str) -> list:
+def get_embedding(text: str, model_name: str = DEFAULT_MODEL_NAME) -> list:
     """
-    使用 HuggingFace 模型將文本轉為向量
+    使用 HuggingFace 模型將文本轉為向量（模型由註冊表共用，首次呼叫時載入）
     Args:
         text (str): 要轉換的文字
+        model_name (str): 模型名稱
     Returns:
         List[float]: 向量表示
     """
-    return model.encode(text, convert_to_numpy=True).tolist()
+    return get_model(model_name).encode(text, convert_to_numpy=True).tolist()
 
 if __name__ == "__main__":
     print("🔍 測試 get_embedding()：")
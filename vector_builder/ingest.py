@@ -0,0 +1,154 @@
+# vector_builder/ingest.py
+"""
+PDF 解析與分段的平行處理
+- 每個 worker 行程各自建立 PDFProcessor / MetadataHandler，負責 PyMuPDF 擷取、分段與 metadata 擴充
+- 每份 PDF 依頁數切成數個頁段任務，單一大型 PDF 也不會整份留在記憶體
+- 結果依輸入順序逐段送回單一的嵌入／寫入階段，與 worker 數量無關（chunk_id 與順序完全一致）
+- 同時在途的頁段數有上限，避免解析速度快於嵌入時結果堆積在記憶體
+- 提供 profiler 時，各頁段的擷取／分段／metadata 耗時與 worker 峰值 RSS 隨結果送回主行程合併
+- 行程池以 spawn 啟動：解析在管線的背景執行緒中建立行程池，fork 會複製其他執行緒持有中的 lock
+"""
+
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .pdf_processor import PDFProcessor
+from .metadata_handler import MetadataHandler
+from .profiler import BuildProfiler, StageProfile, peak_rss_mb
+
+# 每個解析任務涵蓋的頁數
+PAGES_PER_TASK = 8
+
+_processor: Optional[PDFProcessor] = None
+_handler: Optional[MetadataHandler] = None
+
+
+def _init_worker():
+    global _processor, _handler
+    _processor = PDFProcessor()
+    _handler = MetadataHandler()
+
+
+def parse_pages(pdf_path: Path, base_dir: Path, start_page: int = 0, end_page: Optional[int] = None,
+                profile: Optional[StageProfile] = None) -> List[Dict]:
+    """
+    解析 PDF 的指定頁段：分段並擴充 metadata，回傳含 text 與 folder 欄位的 metadata 清單
+    """
+    if _processor is None:
+        _init_worker()
+
+    chunks = list(_processor.iter_chunks(pdf_path, start_page, end_page, profile=profile))
+    rel_path = pdf_path.relative_to(base_dir)  # 地區、產業依語料資料夾判斷
+    if profile is None:
+        enriched_chunks = _handler.enrich_batch(chunks, rel_path)
+    else:
+        with profile.timed("metadata", chunks=len(chunks)):
+            enriched_chunks = _handler.enrich_batch(chunks, rel_path)
+    folder = rel_path.parts[0]
+    for (chunk_text, _), enriched in zip(chunks, enriched_chunks):
+        enriched["text"] = chunk_text
+        enriched["folder"] = folder
+    return enriched_chunks
+
+
+def parse_pdf(pdf_path: Path, base_dir: Path) -> List[Dict]:
+    """解析整份 PDF（小檔案或除錯時使用）"""
+    return parse_pages(pdf_path, base_dir)
+
+
+# 頁段任務：(pdf_path, base_dir, start_page, end_page, 是否為該檔最後一段, 開檔錯誤)
+PageTask = Tuple[Path, Path, int, int, bool, Optional[str]]
+
+
+def _iter_page_tasks(pdf_paths: List[Path], base_dir: Path, pages_per_task: int,
+                     start_page_fn: Optional[Callable[[Path], int]] = None) -> Iterator[PageTask]:
+    """
+    逐檔讀取頁數並切成頁段任務（只開檔讀頁數，不擷取文字）；
+    start_page_fn(pdf_path) 回傳續傳時的起始頁，之前的頁不再解析。
+    """
+    if _processor is None:
+        _init_worker()
+
+    for pdf_path in pdf_paths:
+        pdf_path = Path(pdf_path)
+        try:
+            num_pages = _processor.page_count(pdf_path)
+        except Exception as e:
+            yield pdf_path, base_dir, 0, 0, True, str(e)
+            continue
+
+        first_page = min(start_page_fn(pdf_path), num_pages) if start_page_fn else 0
+        if first_page >= num_pages:
+            yield pdf_path, base_dir, first_page, first_page, True, None
+            continue
+        for start in range(first_page, num_pages, pages_per_task):
+            end = min(start + pages_per_task, num_pages)
+            yield pdf_path, base_dir, start, end, end >= num_pages, None
+
+
+def _parse_task(task: PageTask, profiling: bool = False) -> Tuple[List[Dict], Optional[str], Optional[StageProfile]]:
+    pdf_path, base_dir, start_page, end_page, _, error = task
+    if error:
+        return [], error, None
+    profile = StageProfile() if profiling else None
+    try:
+        chunks = parse_pages(pdf_path, base_dir, start_page, end_page, profile=profile)
+    except Exception as e:
+        return [], str(e), profile
+    if profile is not None:
+        profile.peak_rss_mb = peak_rss_mb()
+    return chunks, None, profile
+
+
+def iter_parsed_pages(pdf_paths: List[Path], base_dir: Path, workers: int = 1,
+                      pages_per_task: int = PAGES_PER_TASK,
+                      max_in_flight: Optional[int] = None,
+                      profiler: Optional[BuildProfiler] = None,
+                      start_page_fn: Optional[Callable[[Path], int]] = None) -> Iterator[Tuple[Path, List[Dict], Optional[str], bool]]:
+    """
+    依 pdf_paths 與頁碼順序逐段產出 (pdf_path, enriched_chunks, error, is_last)。
+    is_last 為 True 表示該檔最後一段；任一頁段失敗時，該檔之後的頁段不再產出段落，
+    錯誤訊息由最後一段回報。
+    workers <= 1 時於目前行程依序處理；否則使用行程池平行解析。
+    start_page_fn 供續傳使用：每個檔案自其回傳的頁碼（0 起算）開始解析。
+    """
+    base_dir = Path(base_dir)
+    tasks = _iter_page_tasks(pdf_paths, base_dir, pages_per_task, start_page_fn)
+    profiling = profiler is not None
+
+    def results() -> Iterator[Tuple[PageTask, List[Dict], Optional[str], Optional[StageProfile]]]:
+        if workers <= 1:
+            for task in tasks:
+                yield (task,) + _parse_task(task, profiling)
+            return
+
+        in_flight = max_in_flight or workers * 2
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            pending = deque()
+            for task in tasks:
+                pending.append((task, executor.submit(_parse_task, task, profiling)))
+                if len(pending) >= in_flight:
+                    break
+
+            while pending:
+                task, future = pending.popleft()
+                chunks, error, profile = future.result()
+                next_task = next(tasks, None)
+                if next_task is not None:
+                    pending.append((next_task, executor.submit(_parse_task, next_task, profiling)))
+                yield task, chunks, error, profile
+
+    failed: Dict[Path, str] = {}
+    for task, chunks, error, profile in results():
+        pdf_path, is_last = task[0], task[4]
+        if profile is not None:
+            profiler.merge(pdf_path, profile)
+        if error and pdf_path not in failed:
+            failed[pdf_path] = error
+        if pdf_path in failed:
+            chunks = []
+        yield pdf_path, chunks, failed.pop(pdf_path, None) if is_last else None, is_last
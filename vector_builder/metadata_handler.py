@@ -1,68 +1,194 @@
 """
 Metadata 處理模組
 負責處理和擴充 PDF chunks 的 metadata
+- 主題／產業關鍵字表由 keyword_tables.json 載入
+- 所有關鍵字編譯成一個字首樹形式的 regex，每個段落掃描一次即取得所有命中的主題與產業
+- 只比對路徑規則需要的關鍵字表（非 cases 資料夾不比對產業關鍵字）
+- 語言判斷以 UTF-8 首位元組計數中文字元，不需逐字比對
 """
 
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, FrozenSet, List, Optional, Tuple
 import re
 import json
 import logging
 
+KEYWORD_TABLES_PATH = Path(__file__).with_name("keyword_tables.json")
+# metadata 規則的版本（列入建置指紋）：分類規則修改後遞增，既有索引會整批重建
+METADATA_VERSION = 2
+_CJK_LEAD_BYTES = bytes(range(0xE5, 0xEA))
+_CJK_E4_PREFIXES = [bytes([0xE4, second]) for second in range(0xB8, 0xC0)]
+CHINESE_RATIO_THRESHOLD = 0.1
+
+
+def load_keyword_tables(path: Optional[Path] = None) -> Dict[str, Dict[str, List[str]]]:
+    """讀取關鍵字表：{"topic": {主題: [關鍵字...]}, "industry": {產業: [關鍵字...]}}（依序比對，先符合者優先）"""
+    with open(path or KEYWORD_TABLES_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """將關鍵字組成字首樹形式的 regex（共用字首只比對一次，同一位置取最長者）"""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if "" in node else "")
+
+    return build(trie)
+
+
+def _overlaps(words: List[str]) -> Dict[str, List[Tuple[str, int]]]:
+    """關鍵字 a → [(b, k)]：a 的最後 k 個字元等於 b 的開頭（不重疊掃描時 b 會被 a 吃掉）"""
+    overlaps: Dict[str, List[Tuple[str, int]]] = {}
+    for a in words:
+        for b in words:
+            if a == b or b in a:
+                continue
+            for k in range(1, min(len(a), len(b))):
+                if a[-k:] == b[:k]:
+                    overlaps.setdefault(a, []).append((b, k))
+    return overlaps
+
+
+class KeywordClassifier:
+    """
+    多關鍵字比對器：所有關鍵字編譯成一個 regex，一次掃描取得段落中出現的關鍵字。
+    - 同一位置只取最長的關鍵字：較短的關鍵字若為其子字串，編譯時即併入其類別
+    - 與命中關鍵字部分重疊的關鍵字（如 climate / esg），於命中處以 startswith 補查
+    結果與逐一關鍵字以 in 比對相同。
+    """
+
+    def __init__(self, tables: Dict[str, Dict[str, List[str]]]):
+        self.tables = tables
+        # 每個（小寫）關鍵字 → 命中時成立的 (表名, 類別)
+        hits: Dict[str, set] = {}
+        for table, categories in tables.items():
+            for category, keywords in categories.items():
+                for kw in keywords:
+                    hits.setdefault(kw.lower(), set()).add((table, category))
+        self._hits: Dict[str, FrozenSet[Tuple[str, str]]] = {
+            kw: frozenset().union(*(hits[other] for other in hits if other in kw)) for kw in hits
+        }
+        self._overlaps = _overlaps(list(hits))
+        self._pattern = re.compile(_trie_pattern(list(hits)))
+
+    def scan(self, text: str) -> FrozenSet[Tuple[str, str]]:
+        """回傳段落命中的 (表名, 類別)"""
+        text = text.lower()
+        keywords = set()
+        for match in self._pattern.finditer(text):
+            keyword = match.group()
+            keywords.add(keyword)
+            for other, k in self._overlaps.get(keyword, ()):
+                if text.startswith(other, match.end() - k):
+                    keywords.add(other)
+        return frozenset().union(*(self._hits[kw] for kw in keywords))
+
+
+
+def first_match(table: str, categories: Dict[str, List[str]], found: FrozenSet[Tuple[str, str]]) -> Optional[str]:
+    """依關鍵字表順序回傳第一個命中的類別"""
+    for category in categories:
+        if (table, category) in found:
+            return category
+    return None
+
+
+def chinese_char_count(text: str) -> int:
+    """
+    計算 U+4E00–U+9FFF 的字元數：以 UTF-8 首位元組計數（bytes.translate / count 皆為 C 實作，不需逐字比對）。
+    E5–E9 開頭者皆為中文字；E4 開頭者第二位元組需為 B8–BF（U+4E00 起）。首位元組不會出現在字元中間，計數精確。
+    """
+    if text.isascii():
+        return 0
+    data = text.encode("utf-8")
+    count = len(data) - len(data.translate(None, _CJK_LEAD_BYTES))
+    if b"\xe4" in data:
+        count += sum(data.count(prefix) for prefix in _CJK_E4_PREFIXES)
+    return count
+
+
 class MetadataHandler:
-    def __init__(self):
+    def __init__(self, keyword_tables_path: Optional[Path] = None):
+        tables = load_keyword_tables(keyword_tables_path)
+        self.topic_keywords = tables.get("topic", {})
         # 產業關鍵字對應
-        self.industry_keywords = {
-            'retail': ['retail', 'shopping', '零售', '商場'],
-            'manufacturing': ['manufacturing', 'factory', '製造', '工廠'],
-            'technology': ['technology', 'software', '科技', '軟體'],
-            'finance': ['banking', 'finance', '金融', '銀行'],
-            'energy': ['energy', 'power', '能源', '電力'],
-            'healthcare': ['healthcare', 'medical', '醫療', '健康']
-        }
-        
+        self.industry_keywords = tables.get("industry", {})
+        self._classifiers: Dict[Tuple[str, ...], KeywordClassifier] = {}
+        self._scan_name = lru_cache(maxsize=256)(self._scan)
+
+    def _classifier(self, table_names: Tuple[str, ...]) -> KeywordClassifier:
+        if table_names not in self._classifiers:
+            tables = {"topic": self.topic_keywords, "industry": self.industry_keywords}
+            self._classifiers[table_names] = KeywordClassifier({name: tables[name] for name in table_names})
+        return self._classifiers[table_names]
+
+    def _tables_for(self, pdf_path: Path) -> Tuple[str, ...]:
+        """依路徑規則決定需要比對的關鍵字表"""
+        names = ()
+        if "international" not in pdf_path.parts:
+            names += ("topic",)
+        if "cases" in pdf_path.parts:
+            names += ("industry",)
+        return names
+
+    def _scan(self, table_names: Tuple[str, ...], text: str) -> FrozenSet[Tuple[str, str]]:
+        return self._classifier(table_names).scan(text) if table_names else frozenset()
+
     def detect_language(self, text: str) -> str:
-        """檢測文本語言（簡單實現）"""
-        chinese_char_count = len(re.findall(r'[\u4e00-\u9fff]', text))
+        """檢測文本語言（中文字元比例）"""
         total_char_count = len(text.strip())
-        
         if total_char_count == 0:
             return "en"
-            
-        chinese_ratio = chinese_char_count / total_char_count
-        return "zh" if chinese_ratio > 0.1 else "en"
-    
-    def extract_topic(self, pdf_path: Path, text: str) -> str:
-        """從檔案路徑和內容提取主題"""
+        return "zh" if chinese_char_count(text) / total_char_count > CHINESE_RATIO_THRESHOLD else "en"
+
+    def _path_context(self, pdf_path: Path) -> Tuple[Tuple[str, ...], FrozenSet[Tuple[str, str]]]:
+        """只與路徑有關的部分：需比對的關鍵字表與檔名命中的類別（同一份 PDF 只掃描一次）"""
+        table_names = self._tables_for(pdf_path)
+        return table_names, self._scan_name(table_names, pdf_path.stem)
+
+    def _classify(self, pdf_path: Path, text: str,
+                  context: Optional[Tuple[Tuple[str, ...], FrozenSet[Tuple[str, str]]]] = None) -> Dict[str, str]:
+        table_names, name_found = context or self._path_context(pdf_path)
+        found = self._scan(table_names, text) | name_found
+        return {
+            "main_topic": self._topic(pdf_path, found),
+            "industry": self._industry(pdf_path, found),
+            "language": self.detect_language(text)
+        }
+
+    def _topic(self, pdf_path: Path, found) -> str:
         # 從路徑提取
         path_parts = pdf_path.parts
         if "international" in path_parts:
             return path_parts[path_parts.index("international") + 1].lower()
-        
         # 從檔名和內容關鍵字判斷
-        keywords = {
-            'sustainability': ['sustainability', 'ESG', '永續', '環境'],
-            'climate': ['climate', 'carbon', '氣候', '碳'],
-            'governance': ['governance', 'compliance', '治理', '法遵'],
-            'social': ['social', 'community', '社會', '社區']
-        }
-        
-        text_lower = text.lower()
-        for topic, kws in keywords.items():
-            if any(kw.lower() in text_lower or kw.lower() in pdf_path.stem.lower() for kw in kws):
-                return topic
-                
-        return "general"
-    
-    def extract_industry(self, pdf_path: Path, text: str) -> str:
-        """從檔案路徑和內容提取產業類別"""
+        return first_match("topic", self.topic_keywords, found) or "general"
+
+    def _industry(self, pdf_path: Path, found) -> str:
         if "cases" in pdf_path.parts:
-            text_lower = text.lower()
-            for industry, keywords in self.industry_keywords.items():
-                if any(kw.lower() in text_lower or kw.lower() in pdf_path.stem.lower() for kw in keywords):
-                    return industry
+            return first_match("industry", self.industry_keywords, found) or "cross_industry"
         return "cross_industry"
-    
+
+    def extract_topic(self, pdf_path: Path, text: str) -> str:
+        """從檔案路徑和內容提取主題"""
+        return self._classify(pdf_path, text)["main_topic"]
+
+    def extract_industry(self, pdf_path: Path, text: str) -> str:
+        """從檔案路徑和內容提取產業類別"""
+        return self._classify(pdf_path, text)["industry"]
+
     def extract_region(self, pdf_path: Path) -> str:
         """從檔案路徑提取地區"""
         if "taiwan" in pdf_path.parts:
@@ -71,17 +197,20 @@ class MetadataHandler:
             return "global"
         return "unknown"
     
-    def enrich_metadata(self, chunk_metadata: Dict, text: str) -> Dict:
-        """擴充metadata資訊"""
-        pdf_path = Path(chunk_metadata["source"])
-        
+    def enrich_metadata(self, chunk_metadata: Dict, text: str, pdf_path: Optional[Path] = None) -> Dict:
+        """
+        擴充metadata資訊
+        pdf_path 為相對於語料根目錄的路徑（如 taiwan/xxx.pdf）：地區與產業依資料夾判斷，
+        未提供時只能以檔名判斷（region 皆為 unknown）
+        """
+        pdf_path = Path(pdf_path or chunk_metadata["source"])
+        return self._enrich(chunk_metadata, text, pdf_path, self._path_context(pdf_path),
+                            self.extract_region(pdf_path))
+
+    def _enrich(self, chunk_metadata: Dict, text: str, pdf_path: Path, context, region: str) -> Dict:
         # 添加額外metadata
-        chunk_metadata.update({
-            "main_topic": self.extract_topic(pdf_path, text),
-            "industry": self.extract_industry(pdf_path, text),
-            "region": self.extract_region(pdf_path),
-            "language": self.detect_language(text)
-        })
+        chunk_metadata.update(self._classify(pdf_path, text, context))
+        chunk_metadata["region"] = region
         
         # 移除暫存的text欄位
         if "text" in chunk_metadata:
@@ -89,6 +218,18 @@ class MetadataHandler:
             
         return chunk_metadata
     
+    def enrich_batch(self, chunks: List[Tuple[str, Dict]], pdf_path: Optional[Path] = None) -> List[Dict]:
+        """
+        批次擴充同一頁段的 (text, metadata)
+        提供 pdf_path 時，關鍵字表、檔名命中與地區只依路徑計算一次，迴圈內只做段落文字的比對與語言判斷
+        """
+        if pdf_path is None:
+            return [self.enrich_metadata(chunk_metadata, text) for text, chunk_metadata in chunks]
+        pdf_path = Path(pdf_path)
+        context = self._path_context(pdf_path)
+        region = self.extract_region(pdf_path)
+        return [self._enrich(chunk_metadata, text, pdf_path, context, region) for text, chunk_metadata in chunks]
+
     def save_metadata(self, metadata_list: List[Dict], output_path: Path):
         """儲存metadata到JSON檔案"""
         try:
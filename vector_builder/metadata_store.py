@@ -0,0 +1,198 @@
+# vector_builder/metadata_store.py
+"""
+段落 metadata 的 SQLite 欄式儲存（取代 chunk_metadata.json）
+- row_id 與 FAISS 向量 ID 一致，可過濾欄位皆建立索引
+- 載入時只開啟資料庫與讀取筆數，text / title / page 等欄位於查詢命中時才讀取
+- 去重合併的段落另於 chunk_sources 表記錄各來源的可過濾欄位，以任一來源過濾皆可命中
+- 提供 chunk_metadata.json → chunk_metadata.sqlite 轉換工具
+"""
+
+import json
+import sqlite3
+import threading
+import logging
+from pathlib import Path
+from itertools import count
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .atomic_io import atomic_path
+
+METADATA_DB_NAME = "chunk_metadata.sqlite"
+METADATA_JSON_NAME = "chunk_metadata.json"
+
+# 可於查詢時過濾的 metadata 欄位
+FILTER_FIELDS = ("source", "doc", "path", "folder", "region", "industry", "language", "main_topic")
+
+# 固定欄位；其餘欄位以 JSON 存入 extra
+COLUMNS = ("chunk_id", "source", "doc", "path", "folder", "page", "title",
+           "main_topic", "industry", "region", "language", "text")
+
+
+def _split_row(meta: Dict) -> tuple:
+    extra = {k: v for k, v in meta.items() if k not in COLUMNS}
+    return tuple(meta.get(col) for col in COLUMNS) + (json.dumps(extra, ensure_ascii=False) if extra else None,)
+
+
+def write_metadata_db(db_path, metadata: Iterable[Dict], ids: Optional[Iterable[int]] = None):
+    """
+    將 metadata 寫入 SQLite（先寫暫存檔再改名，避免讀取端看到寫到一半的檔案）。
+    ids 未指定時，row_id 為列位置（0, 1, 2...）。
+    """
+    write_metadata_items(db_path, zip(ids if ids is not None else count(), metadata))
+
+
+def write_metadata_items(db_path, items: Iterable[Tuple[int, Dict]]):
+    """
+    將 (row_id, metadata) 逐筆寫入 SQLite；row_id 即向量 ID，可不連續。
+    先寫入暫存資料庫，完成後才原子取代正式檔案。
+    """
+    with atomic_path(db_path) as tmp_path:
+        _write_metadata_db(tmp_path, items)
+
+
+def _write_metadata_db(tmp_path: Path, items: Iterable[Tuple[int, Dict]]):
+    conn = sqlite3.connect(str(tmp_path))
+    try:
+        column_defs = ", ".join(f"{col} {'INTEGER' if col == 'page' else 'TEXT'}" for col in COLUMNS)
+        conn.execute(f"CREATE TABLE chunks (row_id INTEGER PRIMARY KEY, {column_defs}, extra TEXT)")
+
+        source_defs = ", ".join(f"{field} TEXT" for field in FILTER_FIELDS)
+        conn.execute(f"CREATE TABLE chunk_sources (row_id INTEGER, {source_defs})")
+
+        source_rows = []
+
+        def rows():
+            for row_id, meta in items:
+                for ref in meta.get("sources") or ():
+                    source_rows.append((int(row_id),) + tuple(ref.get(field) for field in FILTER_FIELDS))
+                yield (int(row_id),) + _split_row(meta)
+
+        placeholders = ", ".join("?" * (len(COLUMNS) + 2))
+        conn.executemany(f"INSERT INTO chunks VALUES ({placeholders})", rows())
+        conn.executemany(
+            f"INSERT INTO chunk_sources VALUES ({', '.join('?' * (len(FILTER_FIELDS) + 1))})", source_rows
+        )
+
+        for field in FILTER_FIELDS:
+            conn.execute(f"CREATE INDEX idx_{field} ON chunks ({field})")
+            conn.execute(f"CREATE INDEX idx_sources_{field} ON chunk_sources ({field})")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class ChunkMetadataStore:
+    """
+    唯讀的 metadata 存取介面，行為近似 list：
+    - len(store)、store[row_id] 取得單筆
+    - get_many(ids) 一次讀取多筆（查詢命中時使用）
+    - ids_where(filters) 以 SQL 取得符合過濾條件的 row_id
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self._conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()  # 同一連線由多個 session 執行緒共用
+        self._count = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        # 舊版資料庫沒有 chunk_sources 表
+        self._has_sources = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunk_sources'"
+        ).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _row_to_dict(self, row) -> Dict:
+        meta = {col: value for col, value in zip(COLUMNS, row[1:-1]) if value is not None}
+        if row[-1]:
+            meta.update(json.loads(row[-1]))
+        return meta
+
+    def __getitem__(self, row_id: int) -> Dict:
+        result = self.get_many([row_id])[0]
+        if result is None:
+            raise IndexError(f"找不到 row_id={row_id}")
+        return result
+
+    def get_many(self, ids: List[int]) -> List[Optional[Dict]]:
+        """依 ids 順序回傳 metadata，不存在者為 None"""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return []
+        placeholders = ", ".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT row_id, {', '.join(COLUMNS)}, extra FROM chunks WHERE row_id IN ({placeholders})", ids
+            ).fetchall()
+        by_id = {row[0]: self._row_to_dict(row) for row in rows}
+        return [by_id.get(i) for i in ids]
+
+    def ids_where(self, filters: Dict[str, Union[str, List[str]]]) -> np.ndarray:
+        """同欄位多值取聯集，不同欄位取交集；去重合併的段落只要任一來源符合即命中"""
+        clauses, params = [], []
+        for field, values in filters.items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"不支援的過濾欄位：{field}（可用：{', '.join(FILTER_FIELDS)}）")
+            if isinstance(values, str):
+                values = [values]
+            clauses.append(f"{field} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+        sql = "SELECT row_id FROM chunks"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+            if self._has_sources:
+                sql += " UNION SELECT row_id FROM chunk_sources WHERE " + " AND ".join(clauses)
+                params = params * 2
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return np.array([r[0] for r in rows], dtype="int64")
+
+    def iter_rows(self, batch_size: int = 1000) -> Iterator[Tuple[int, Dict]]:
+        """依 row_id 順序分頁讀出 (row_id, metadata)（串流建置合併既有資料時使用）"""
+        last_id = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT row_id, {', '.join(COLUMNS)}, extra FROM chunks WHERE row_id > ? ORDER BY row_id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row[0], self._row_to_dict(row)
+            last_id = rows[-1][0]
+
+    def all(self) -> List[Dict]:
+        """依 row_id 順序讀出全部 metadata（建置時需要修改內容才使用）"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT row_id, {', '.join(COLUMNS)}, extra FROM chunks ORDER BY row_id"
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def close(self):
+        self._conn.close()
+
+
+def convert_json_metadata(output_dir, remove_json: bool = False) -> bool:
+    """
+    將既有向量資料夾的 chunk_metadata.json 轉為 chunk_metadata.sqlite。
+    回傳是否有進行轉換。
+    """
+    output_dir = Path(output_dir)
+    json_path = output_dir / METADATA_JSON_NAME
+    db_path = output_dir / METADATA_DB_NAME
+    if not json_path.exists():
+        return False
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    write_metadata_db(db_path, metadata)
+    logging.info("metadata 已轉換為 SQLite：%s（%d 筆）", db_path, len(metadata))
+
+    if remove_json:
+        json_path.unlink()
+    return True
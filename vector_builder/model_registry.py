@@ -0,0 +1,40 @@
+# vector_builder/model_registry.py
+"""
+嵌入模型註冊表
+同一個行程內，每個模型名稱只載入一次 SentenceTransformer，
+VectorStore、get_embedding 與建置腳本皆由此借用同一份模型。
+"""
+
+import threading
+import logging
+from typing import Dict
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+_models: Dict[str, object] = {}
+_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def _lock_for(model_name: str) -> threading.Lock:
+    with _registry_lock:
+        return _locks.setdefault(model_name, threading.Lock())
+
+
+def get_model(model_name: str = DEFAULT_MODEL_NAME):
+    """
+    取得（必要時延遲載入）指定名稱的 SentenceTransformer 模型。
+    多執行緒同時要求同一模型時，只有第一個會實際載入，其餘等待共用。
+    """
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _lock_for(model_name):
+        model = _models.get(model_name)
+        if model is None:
+            from sentence_transformers import SentenceTransformer  # 延遲匯入，縮短啟動時間
+            logging.info("載入嵌入模型：%s", model_name)
+            model = SentenceTransformer(model_name)
+            _models[model_name] = model
+    return model
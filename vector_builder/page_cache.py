@@ -0,0 +1,95 @@
+# vector_builder/page_cache.py
+"""
+PDF 逐頁文字的磁碟快取
+- key 為 (PDF 內容 SHA-256, 頁碼)，文字以 zlib 壓縮存於 SQLite；搬移或改名的檔案直接命中
+- 路徑、大小與修改時間未變時沿用上次的雜湊，不需重新讀檔
+- 擷取器（PyMuPDF 版本與擷取方式）改變時視為未命中，重新擷取
+- 調整分段或 metadata 規則時只需讀快取重新分段，不必重新開啟 PDF
+- 平行解析時每個行程各自開啟連線（WAL 模式，寫入時等待鎖）
+"""
+
+import os
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import Dict, Optional
+
+from .build_record import file_sha256
+
+DEFAULT_CACHE_DIR = os.getenv("PAGE_CACHE_DIR", "data/cache/pages")
+CACHE_DB_NAME = "pages.sqlite"
+COMPRESS_LEVEL = 6
+
+
+class PageTextCache:
+    def __init__(self, extractor: str, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.extractor = extractor
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.stats = {"hits": 0, "misses": 0}
+
+        self._conn = sqlite3.connect(str(self.cache_dir / CACHE_DB_NAME), timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages (pdf_sha TEXT, extractor TEXT, page INTEGER, text BLOB, "
+            "PRIMARY KEY (pdf_sha, extractor, page))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files (pdf_sha TEXT, extractor TEXT, page_count INTEGER, "
+            "PRIMARY KEY (pdf_sha, extractor))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS paths (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, pdf_sha TEXT)"
+        )
+        self._conn.commit()
+        self._keys: Dict[str, str] = {}
+
+    def file_key(self, pdf_path: Path) -> str:
+        """PDF 內容雜湊；大小與修改時間未變時沿用紀錄"""
+        path = str(Path(pdf_path).resolve())
+        stat = os.stat(path)
+        memo = f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+        if memo in self._keys:
+            return self._keys[memo]
+
+        row = self._conn.execute("SELECT size, mtime_ns, pdf_sha FROM paths WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            sha = row[2]
+        else:
+            sha = file_sha256(Path(path))
+            self._conn.execute("INSERT OR REPLACE INTO paths VALUES (?, ?, ?, ?)",
+                               (path, stat.st_size, stat.st_mtime_ns, sha))
+            self._conn.commit()
+        self._keys[memo] = sha
+        return sha
+
+    def page_count(self, pdf_sha: str) -> Optional[int]:
+        row = self._conn.execute("SELECT page_count FROM files WHERE pdf_sha = ? AND extractor = ?",
+                                 (pdf_sha, self.extractor)).fetchone()
+        return row[0] if row else None
+
+    def set_page_count(self, pdf_sha: str, page_count: int):
+        self._conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (pdf_sha, self.extractor, page_count))
+        self._conn.commit()
+
+    def get_pages(self, pdf_sha: str, start_page: int, end_page: int) -> Dict[int, str]:
+        """回傳 {頁碼: 文字}，只含已快取的頁"""
+        rows = self._conn.execute(
+            "SELECT page, text FROM pages WHERE pdf_sha = ? AND extractor = ? AND page >= ? AND page < ?",
+            (pdf_sha, self.extractor, start_page, end_page)
+        ).fetchall()
+        pages = {page: zlib.decompress(blob).decode("utf-8") for page, blob in rows}
+        self.stats["hits"] += len(pages)
+        self.stats["misses"] += max(end_page - start_page - len(pages), 0)
+        return pages
+
+    def put_pages(self, pdf_sha: str, pages: Dict[int, str]):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)",
+            ((pdf_sha, self.extractor, page, zlib.compress(text.encode("utf-8"), COMPRESS_LEVEL))
+             for page, text in pages.items())
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
@@ -5,58 +5,127 @@ PDF 處理模組
 
 from pathlib import Path
 import fitz  # PyMuPDF
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterator, Optional
 import logging
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from .text_splitter import TokenTextSplitter
+from .tokenizer import count_tokens, tokenizer_name
+from .page_cache import PageTextCache
+from .profiler import StageProfile
+
+# 頁面文字的擷取方式；改變時快取視為未命中
+EXTRACTOR = f"pymupdf-{fitz.VersionBind}-text"
+# 自快取讀取／寫入的頁數單位
+CACHE_BLOCK_PAGES = 32
+
+# 分段邏輯有變動（即使參數相同）時調高版本，讓建置紀錄判定需要重新分段
+CHUNKER_VERSION = 2
 
 class PDFProcessor:
-    def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=400,
-            chunk_overlap=50,
-            separators=["\n\n", "\n", "。", ".", "!", "?", "！", "？"],
-            keep_separator=True
-        )
-        
+    def __init__(self, chunk_size: int = 300, chunk_overlap: int = 40, use_page_cache: bool = True):
+        """
+        chunk_size / chunk_overlap 以 token 計（見 tokenizer.py），檢索段落放入 prompt 時長度可預期。
+        use_page_cache：逐頁文字由 data/cache/pages 讀取，只有新增或修改的 PDF 才以 PyMuPDF 擷取。
+        """
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.text_splitter = TokenTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+        self.page_cache = PageTextCache(EXTRACTOR) if use_page_cache else None
+
+    def settings(self) -> Dict:
+        """影響分段結果的設定，用於建置紀錄的指紋"""
+        return {
+            "version": CHUNKER_VERSION,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "tokenizer": tokenizer_name()
+        }
+
+    def page_count(self, pdf_path: Path) -> int:
+        if self.page_cache is not None:
+            pdf_sha = self.page_cache.file_key(pdf_path)
+            count = self.page_cache.page_count(pdf_sha)
+            if count is not None:
+                return count
+        with fitz.open(str(pdf_path)) as doc:
+            count = len(doc)
+        if self.page_cache is not None:
+            self.page_cache.set_page_count(pdf_sha, count)
+        return count
+
+    def iter_pages(self, pdf_path: Path, start_page: int = 0, end_page: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """逐頁產出 (頁碼索引, 文字)，不會一次讀入整份 PDF 的文字；已快取的頁不開啟 PDF"""
+        if self.page_cache is None:
+            with fitz.open(str(pdf_path)) as doc:
+                end_page = len(doc) if end_page is None else min(end_page, len(doc))
+                for page_num in range(start_page, end_page):
+                    yield page_num, doc[page_num].get_text()
+            return
+
+        num_pages = self.page_count(pdf_path)
+        end_page = num_pages if end_page is None else min(end_page, num_pages)
+        pdf_sha = self.page_cache.file_key(pdf_path)
+        for block_start in range(start_page, end_page, CACHE_BLOCK_PAGES):
+            block_end = min(block_start + CACHE_BLOCK_PAGES, end_page)
+            pages = self.page_cache.get_pages(pdf_sha, block_start, block_end)
+            missing = [page_num for page_num in range(block_start, block_end) if page_num not in pages]
+            if missing:
+                with fitz.open(str(pdf_path)) as doc:
+                    extracted = {page_num: doc[page_num].get_text() for page_num in missing}
+                self.page_cache.put_pages(pdf_sha, extracted)
+                pages.update(extracted)
+            for page_num in range(block_start, block_end):
+                yield page_num, pages[page_num]
+
+    def iter_chunks(self, pdf_path: Path, start_page: int = 0, end_page: Optional[int] = None,
+                    profile: Optional[StageProfile] = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        逐頁分段並產出 (chunk, metadata)；可指定頁碼範圍供平行處理。
+        profile 不為 None 時分別累計擷取（extract）與分段（split）的耗時與計數。
+        """
+        pages = self.iter_pages(pdf_path, start_page, end_page)
+        if profile is not None:
+            pages = profile.timed_iter("extract", pages)
+        for page_num, text in pages:
+            if profile is not None:
+                profile.add("extract", pages=1, bytes=len(text.encode("utf-8")))
+            if not text.strip():
+                continue
+
+            # 分段
+            if profile is None:
+                chunks = self.text_splitter.split_text(text)
+            else:
+                with profile.timed("split") as counts:
+                    chunks = self.text_splitter.split_text(text)
+                    counts["chunks"] = len(chunks)
+                # token 數於計時區塊外計算，不計入分段耗時
+                profile.add("split", calls=0, tokens=sum(count_tokens(chunk) for chunk in chunks))
+
+            # 為每個chunk創建metadata
+            for chunk_num, chunk in enumerate(chunks):
+                chunk_lines = chunk.split('\n')
+                title = chunk_lines[0].strip() if chunk_lines else ""
+
+                metadata = {
+                    "chunk_id": f"{pdf_path.stem}-p{page_num+1}-s{chunk_num+1}",
+                    "source": pdf_path.name,
+                    "doc": pdf_path.stem.strip(),  # 與單檔向量資料夾名稱一致
+                    "path": str(pdf_path.parent.relative_to(pdf_path.parent.parent)),
+                    "page": page_num + 1,
+                    "title": title,
+                    "text": chunk  # 保存原始文本，用於後續處理
+                }
+
+                yield chunk, metadata
+
     def process_pdf(self, pdf_path: Path) -> List[Tuple[str, Dict]]:
         """處理單個PDF文件，返回chunks和對應的metadata"""
         try:
-            doc = fitz.open(str(pdf_path))
-            chunks_with_metadata = []
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text()
-                
-                if not text.strip():
-                    continue
-                    
-                # 分段
-                chunks = self.text_splitter.split_text(text)
-                
-                # 為每個chunk創建metadata
-                for chunk_num, chunk in enumerate(chunks):
-                    chunk_lines = chunk.split('\n')
-                    title = chunk_lines[0].strip() if chunk_lines else ""
-                    
-                    metadata = {
-                        "chunk_id": f"{pdf_path.stem}-p{page_num+1}-s{chunk_num+1}",
-                        "source": pdf_path.name,
-                        "path": str(pdf_path.parent.relative_to(pdf_path.parent.parent)),
-                        "page": page_num + 1,
-                        "title": title,
-                        "text": chunk  # 保存原始文本，用於後續處理
-                    }
-                    
-                    chunks_with_metadata.append((chunk, metadata))
-            
-            doc.close()
-            return chunks_with_metadata
-            
+            return list(self.iter_chunks(pdf_path))
         except Exception as e:
             logging.error(f"Error processing PDF {pdf_path}: {str(e)}")
             return []
-            
+
     def get_token_count(self, text: str) -> int:
-        """估算token數量（簡單實現，實際應使用tiktoken）"""
-        return len(text.split()) 
+        """token 數量（與分段上限使用相同的計數方式）"""
+        return count_tokens(text)
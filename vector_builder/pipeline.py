@@ -0,0 +1,162 @@
+# vector_builder/pipeline.py
+"""
+串流建置管線：頁段 → 段落 → 嵌入批次 → 寫入端
+- 解析與嵌入各自在背景執行緒執行，階段之間以有上限的 queue 相連
+- 批次不跨檔案，寫入端每收到一批即可落盤；檔案結束時另送結束標記
+- 任一階段發生例外時，例外會傳到呼叫端（寫入端）重新拋出
+- 提供 profiler 時記錄每批嵌入的耗時、段落數與輸入位元組數（embed 階段）
+"""
+
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from vector_builder.dedup import DUPLICATE_OF_FIELD
+from vector_builder.profiler import BuildProfiler
+
+DEFAULT_QUEUE_SIZE = 4
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+class PipelineItem(NamedTuple):
+    """
+    寫入端收到的項目：
+    - done=False：一批已嵌入的段落（vectors 依序對應 metadata 中非重複的段落）
+    - done=True：該檔案結束；error 非 None 表示解析或嵌入失敗
+    """
+    pdf_path: Path
+    metadata: List[Dict]
+    vectors: Optional[np.ndarray]
+    error: Optional[str]
+    done: bool
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """放入 queue；下游已停止時放棄並回傳 False"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.2)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _iter_queue(q: queue.Queue, stop: Optional[threading.Event] = None) -> Iterator:
+    while True:
+        try:
+            item = q.get(timeout=0.2)
+        except queue.Empty:
+            if stop is not None and stop.is_set():
+                return
+            continue
+        if item is _DONE:
+            return
+        if isinstance(item, _Failure):
+            raise item.exc
+        yield item
+
+
+def _run_stage(target: Callable[[], Iterable], out_q: queue.Queue, stop: threading.Event):
+    try:
+        for item in target():
+            if not _put(out_q, item, stop):
+                return
+    except BaseException as e:
+        _put(out_q, _Failure(e), stop)
+    _put(out_q, _DONE, stop)
+
+
+def _batch_chunks(parsed: Iterable[Tuple[Path, List[Dict], Optional[str], bool]], batch_size: int,
+                  skip_fn: Optional[Callable[[Path], int]],
+                  dedup_fn: Optional[Callable[[Path, Dict], bool]]) -> Iterator[Tuple[Path, List[Dict], Optional[str], bool]]:
+    """
+    將頁段結果重新切成不跨檔案的批次；skip_fn(pdf_path) 回傳該檔已寫入的段落數（續傳時略過）。
+    dedup_fn(pdf_path, metadata) 標記重複段落；重複段落仍留在批次中（保持寫入順序），但不嵌入。
+    """
+    batch: List[Dict] = []
+    to_skip: Dict[Path, int] = {}
+    for pdf_path, chunks, error, is_last in parsed:
+        if pdf_path not in to_skip:
+            to_skip[pdf_path] = skip_fn(pdf_path) if skip_fn else 0
+        for chunk in chunks:
+            if to_skip[pdf_path] > 0:
+                to_skip[pdf_path] -= 1
+                continue
+            if dedup_fn is not None:
+                dedup_fn(pdf_path, chunk)
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield pdf_path, batch, None, False
+                batch = []
+        if is_last:
+            if batch:
+                yield pdf_path, batch, None, False
+                batch = []
+            del to_skip[pdf_path]
+            yield pdf_path, [], error, True
+
+
+def iter_embedded_batches(parsed: Iterable[Tuple[Path, List[Dict], Optional[str], bool]],
+                          embed_fn: Callable[[List[str]], np.ndarray],
+                          batch_size: int = 64,
+                          skip_fn: Optional[Callable[[Path], int]] = None,
+                          dedup_fn: Optional[Callable[[Path, Dict], bool]] = None,
+                          queue_size: int = DEFAULT_QUEUE_SIZE,
+                          profiler: Optional[BuildProfiler] = None) -> Iterator[PipelineItem]:
+    """
+    parsed 為 ingest.iter_parsed_pages 的輸出；embed_fn 將一批文字轉為 (n, dim) 向量。
+    記憶體中最多只有 2 * queue_size 個批次（加上解析端在途的頁段）。
+    某批嵌入失敗時，該檔其餘批次會被捨棄並於結束標記回報錯誤，
+    讓已寫入的段落數與 chunk 順序保持一致（下次建置可從中斷處續傳）。
+    """
+    stop = threading.Event()
+    batch_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    out_q: queue.Queue = queue.Queue(maxsize=queue_size)
+
+    def embed_stage() -> Iterator[PipelineItem]:
+        failed: Dict[Path, str] = {}
+        for pdf_path, batch, error, done in _iter_queue(batch_q, stop):
+            if done:
+                yield PipelineItem(pdf_path, [], None, failed.pop(pdf_path, None) or error, True)
+                continue
+            if pdf_path in failed:
+                continue
+            texts = [meta["text"] for meta in batch if DUPLICATE_OF_FIELD not in meta]
+            try:
+                if texts and profiler is not None:
+                    with profiler.timed("embed", pdf_path, chunks=len(texts),
+                                        bytes=sum(len(text.encode("utf-8")) for text in texts)):
+                        vectors = np.ascontiguousarray(embed_fn(texts), dtype="float32")
+                elif texts:
+                    vectors = np.ascontiguousarray(embed_fn(texts), dtype="float32")
+                else:
+                    vectors = np.zeros((0, 0), dtype="float32")
+            except Exception as e:
+                failed[pdf_path] = f"向量嵌入失敗：{e}"
+                continue
+            yield PipelineItem(pdf_path, batch, vectors, None, False)
+
+    threads = [
+        threading.Thread(target=_run_stage, args=(lambda: _batch_chunks(parsed, batch_size, skip_fn, dedup_fn), batch_q, stop),
+                         name="pipeline-parse", daemon=True),
+        threading.Thread(target=_run_stage, args=(embed_stage, out_q, stop), name="pipeline-embed", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        yield from _iter_queue(out_q)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=5)
@@ -0,0 +1,235 @@
+# vector_builder/profiler.py
+"""
+建置效能剖析：各階段的耗時與計數，每次建置輸出 build_profile.json
+- 階段：extract（擷取頁面文字）、split（分段）、metadata（擴充 metadata）、
+  embed（嵌入，含快取查詢）、write（寫入暫存區）、index（訓練與儲存索引）
+- 每個階段記錄累計秒數、呼叫次數、段落數、token 數、位元組數（頁數僅 extract）
+- 解析在 worker 行程執行時，各頁段的 StageProfile 隨結果送回主行程合併；
+  平行解析時 extract／split／metadata 為各 worker 的累計時間，可能超過總耗時
+- 記錄主行程與 worker 行程的峰值 RSS（resource 模組，Windows 上略過）
+- 每次建置另附加一行摘要到 build_profile_history.jsonl，摘要表與上次建置比較吞吐量
+"""
+
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STAGES = ("extract", "split", "metadata", "embed", "write", "index")
+COUNTERS = ("seconds", "calls", "pages", "chunks", "tokens", "bytes")
+PROFILE_FILE_NAME = "build_profile.json"
+HISTORY_FILE_NAME = "build_profile_history.jsonl"
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """目前行程（或已結束的子行程中最大者）的峰值 RSS（MB）"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # Linux 以 KB 計，macOS 以 byte 計
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss / scale, 1)
+
+
+def directory_bytes(path: Path) -> int:
+    """資料夾內檔案（不含子資料夾）的總大小，用於記錄索引寫入量"""
+    return sum(p.stat().st_size for p in Path(path).iterdir() if p.is_file())
+
+
+class StageProfile:
+    """各階段的累計計數；可在 worker 行程中累計後 pickle 回主行程"""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.peak_rss_mb: Optional[float] = None
+
+    def add(self, stage: str, seconds: float = 0.0, calls: int = 1, **counts):
+        entry = self.stages.setdefault(stage, dict.fromkeys(COUNTERS, 0))
+        entry["seconds"] += seconds
+        entry["calls"] += calls
+        for name, value in counts.items():
+            entry[name] += value
+
+    @contextmanager
+    def timed(self, stage: str, **counts):
+        """計時一段程式；yield 的 dict 可於區塊內補上計數"""
+        extra: Dict[str, int] = dict(counts)
+        start = time.perf_counter()
+        try:
+            yield extra
+        finally:
+            self.add(stage, time.perf_counter() - start, **extra)
+
+    def timed_iter(self, stage: str, iterable: Iterable) -> Iterator:
+        """逐項產出 iterable 的內容，只計入取得下一項的時間（不含呼叫端處理每項的時間）"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(stage, time.perf_counter() - start, calls=0)
+                return
+            self.add(stage, time.perf_counter() - start, calls=0)
+            yield item
+
+    def merge(self, other: "StageProfile"):
+        for stage, entry in other.stages.items():
+            self.add(stage, **entry)
+        if other.peak_rss_mb is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb or 0.0, other.peak_rss_mb)
+
+    def to_dict(self) -> Dict:
+        stages = {}
+        for stage in sorted(self.stages, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES)):
+            entry = self.stages[stage]
+            stages[stage] = {name: (round(value, 4) if name == "seconds" else int(value))
+                             for name, value in entry.items() if value or name in ("seconds", "calls")}
+        return {"stages": stages, "peak_rss_mb": self.peak_rss_mb}
+
+
+class BuildProfiler:
+    """
+    整次建置的剖析結果：totals 為全部檔案的合計，files 為各 PDF 的明細。
+    嵌入階段在背景執行緒回報，以 lock 保護。
+    """
+
+    def __init__(self, base_dir: Optional[Path] = None, **info):
+        self.base_dir = Path(base_dir) if base_dir else None
+        self.info = info
+        self.totals = StageProfile()
+        self.files: Dict[str, StageProfile] = {}
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def _key(self, pdf_path: Optional[Path]) -> Optional[str]:
+        if pdf_path is None:
+            return None
+        pdf_path = Path(pdf_path)
+        if self.base_dir is not None:
+            try:
+                return pdf_path.relative_to(self.base_dir).as_posix()
+            except ValueError:
+                pass
+        return pdf_path.name
+
+    def add(self, stage: str, pdf_path: Optional[Path] = None, seconds: float = 0.0, calls: int = 1, **counts):
+        with self._lock:
+            self.totals.add(stage, seconds, calls, **counts)
+            key = self._key(pdf_path)
+            if key is not None:
+                self.files.setdefault(key, StageProfile()).add(stage, seconds, calls, **counts)
+
+    @contextmanager
+    def timed(self, stage: str, pdf_path: Optional[Path] = None, **counts):
+        extra: Dict[str, int] = dict(counts)
+        start = time.perf_counter()
+        try:
+            yield extra
+        finally:
+            self.add(stage, pdf_path, time.perf_counter() - start, **extra)
+
+    def merge(self, pdf_path: Path, profile: StageProfile):
+        """合併 worker 回傳的頁段剖析結果"""
+        with self._lock:
+            self.totals.merge(profile)
+            self.files.setdefault(self._key(pdf_path), StageProfile()).merge(profile)
+
+    def file_done(self, pdf_path: Path):
+        """檔案處理完時記錄主行程目前的峰值 RSS（只增不減，可看出哪份檔案推高記憶體）"""
+        rss = peak_rss_mb()
+        with self._lock:
+            profile = self.files.setdefault(self._key(pdf_path), StageProfile())
+            profile.peak_rss_mb = max(profile.peak_rss_mb or 0.0, rss) if rss is not None else None
+
+    def report(self) -> Dict:
+        wall = time.perf_counter() - self._start
+        totals = self.totals.to_dict()["stages"]
+        pages = totals.get("extract", {}).get("pages", 0)
+        chunks = totals.get("split", {}).get("chunks", 0)
+        tokens = totals.get("split", {}).get("tokens", 0)
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "wall_seconds": round(wall, 3),
+            **self.info,
+            "peak_rss_mb": {
+                "main": peak_rss_mb(),
+                "workers": max(filter(None, (self.totals.peak_rss_mb, peak_rss_mb(children=True))), default=None),
+            },
+            "throughput": {
+                "pages_per_second": round(pages / wall, 2) if wall else 0.0,
+                "chunks_per_second": round(chunks / wall, 2) if wall else 0.0,
+                "tokens_per_second": round(tokens / wall, 1) if wall else 0.0,
+            },
+            "stages": totals,
+            "files": {key: profile.to_dict() for key, profile in sorted(self.files.items())},
+        }
+
+    def save(self, output_dir: Path) -> Dict:
+        """寫入 build_profile.json 並附加摘要到歷史紀錄；回傳報告（含上次建置的吞吐量）"""
+        output_dir = Path(output_dir)
+        report = self.report()
+        with open(output_dir / PROFILE_FILE_NAME, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        history_path = output_dir / HISTORY_FILE_NAME
+        previous = None
+        if history_path.exists():
+            with open(history_path, "r", encoding="utf-8") as f:
+                lines = [line for line in f if line.strip()]
+            previous = json.loads(lines[-1]) if lines else None
+        summary = {key: report[key] for key in ("finished_at", "wall_seconds", "throughput", "peak_rss_mb")}
+        summary["stage_seconds"] = {stage: entry["seconds"] for stage, entry in report["stages"].items()}
+        summary.update(self.info)
+        with open(history_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+
+        report["previous"] = previous
+        return report
+
+
+def format_summary(report: Dict) -> str:
+    """各階段耗時與計數的摘要表；最耗時的階段以 ◀ 標示"""
+    stages = report["stages"]
+    total_seconds = sum(entry["seconds"] for entry in stages.values()) or 1.0
+    slowest = max(stages, key=lambda s: stages[s]["seconds"], default=None)
+    lines = [
+        f"{'階段':<10}{'秒數':>10}{'占比':>8}{'頁數':>8}{'段落':>9}{'tokens':>11}{'MB':>9}",
+        "-" * 65,
+    ]
+    for stage, entry in stages.items():
+        lines.append(
+            f"{stage:<10}{entry['seconds']:>10.2f}{entry['seconds'] / total_seconds:>8.0%}"
+            f"{entry.get('pages', 0):>8}{entry.get('chunks', 0):>9}{entry.get('tokens', 0):>11}"
+            f"{entry.get('bytes', 0) / 1e6:>9.1f}" + ("  ◀" if stage == slowest else "")
+        )
+    lines.append("-" * 65)
+
+    throughput = report["throughput"]
+    lines.append(f"總耗時 {report['wall_seconds']:.1f} 秒｜{throughput['pages_per_second']} 頁/秒｜"
+                 f"{throughput['chunks_per_second']} 段/秒｜{throughput['tokens_per_second']} tokens/秒")
+    rss = report["peak_rss_mb"]
+    if rss["main"] is not None:
+        lines.append(f"峰值 RSS：主行程 {rss['main']} MB" +
+                     (f"，worker {rss['workers']} MB" if rss["workers"] else ""))
+
+    previous = report.get("previous")
+    before = (previous or {}).get("throughput", {}).get("chunks_per_second")
+    now = throughput["chunks_per_second"]
+    # 未處理任何段落（語料未變動）時不比較
+    if before and now:
+        change = (now - before) / before
+        mark = "⚠️ " if change < -0.1 else ""
+        lines.append(f"{mark}與上次建置相比：{before} → {now} 段/秒（{change:+.0%}）")
+    return "\n".join(lines)
@@ -0,0 +1,195 @@
+# vector_builder/query_cache.py
+"""
+查詢向量與查詢結果的兩層快取
+- 第一層：行程內 LRU（OrderedDict）
+- 第二層：SQLite 磁碟快取，重新啟動後仍可使用
+- 查詢向量以 (模型, 正規化查詢) 為 key；查詢結果以 (索引版本, 範圍, 查詢, top_k) 為 key
+- 向量庫重建後 index_version 改變，舊結果自然失效並於下次寫入時清除
+"""
+
+import json
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "data/cache/query_cache.sqlite")  # 設為空字串則只用記憶體
+MAX_MEMORY_ITEMS = 5000
+MAX_DISK_ROWS = 200000
+
+
+def normalize_query(text: str) -> str:
+    """全形半形統一、合併空白，讓語意相同的查詢共用快取"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def _hash_key(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class _LRU:
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._data: "OrderedDict[str, object]" = OrderedDict()
+
+    def get(self, key: str):
+        if key in self._data:
+            self._data.move_to_end(key)
+            return self._data[key]
+        return None
+
+    def put(self, key: str, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_items:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+class QueryCache:
+    def __init__(self, db_path: Optional[str] = DEFAULT_CACHE_PATH, max_memory_items: int = MAX_MEMORY_ITEMS,
+                 max_disk_rows: int = MAX_DISK_ROWS):
+        self._vectors = _LRU(max_memory_items)
+        self._results = _LRU(max_memory_items)
+        self._lock = threading.Lock()
+        self.max_disk_rows = max_disk_rows
+        self._writes = 0
+        self._known_versions: Dict[str, str] = {}
+        self.stats = {"vector_hits": 0, "vector_misses": 0, "result_hits": 0, "result_misses": 0}
+
+        self._conn = None
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, model TEXT, vec BLOB, used_at REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, scope TEXT, index_version TEXT, "
+                "payload TEXT, used_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_scope ON results (scope)")
+            self._conn.commit()
+
+    # ---------- 查詢向量 ----------
+
+    def get_vectors(self, model_name: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        keys = [_hash_key(model_name, normalize_query(t)) for t in texts]
+        found: List[Optional[np.ndarray]] = []
+        disk_hits = []
+        with self._lock:
+            for key in keys:
+                vec = self._vectors.get(key)
+                if vec is None and self._conn is not None:
+                    row = self._conn.execute("SELECT vec FROM vectors WHERE key = ?", (key,)).fetchone()
+                    if row:
+                        vec = np.frombuffer(row[0], dtype="float32")
+                        self._vectors.put(key, vec)
+                        disk_hits.append(key)
+                found.append(vec)
+            if disk_hits:
+                # 與 get_results 相同：更新最後使用時間，修剪時才不會先淘汰常用的向量
+                now = time.time()
+                self._conn.executemany("UPDATE vectors SET used_at = ? WHERE key = ?", [(now, k) for k in disk_hits])
+                self._conn.commit()  # 立即提交，唯讀流量不留下未結束的寫入交易（其他行程才不會被鎖住）
+            hits = sum(v is not None for v in found)
+            self.stats["vector_hits"] += hits
+            self.stats["vector_misses"] += len(found) - hits
+        return found
+
+    def put_vectors(self, model_name: str, texts: List[str], vectors: np.ndarray):
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, vec in zip(texts, vectors):
+                key = _hash_key(model_name, normalize_query(text))
+                vec = np.asarray(vec, dtype="float32")
+                self._vectors.put(key, vec)
+                rows.append((key, model_name, vec.tobytes(), now))
+            if self._conn is not None and rows:
+                self._conn.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?, ?, ?)", rows)
+                self._after_write(len(rows))
+
+    # ---------- 查詢結果 ----------
+
+    def _result_key(self, index_version: str, scope: str, query: str, top_k: int) -> str:
+        return _hash_key(index_version, scope, normalize_query(query), top_k)
+
+    def get_results(self, index_version: str, scope: str, query: str, top_k: int) -> Optional[List[Dict]]:
+        key = self._result_key(index_version, scope, query, top_k)
+        with self._lock:
+            results = self._results.get(key)
+            if results is None and self._conn is not None:
+                row = self._conn.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+                if row:
+                    results = json.loads(row[0])
+                    self._results.put(key, results)
+                    self._conn.execute("UPDATE results SET used_at = ? WHERE key = ?", (time.time(), key))
+                    self._conn.commit()
+            self.stats["result_hits" if results is not None else "result_misses"] += 1
+        return [dict(r) for r in results] if results is not None else None
+
+    def put_results(self, index_version: str, scope: str, query: str, top_k: int, results: List[Dict]):
+        key = self._result_key(index_version, scope, query, top_k)
+        with self._lock:
+            self._results.put(key, [dict(r) for r in results])
+            if self._conn is None:
+                return
+            if self._known_versions.get(scope) != index_version:
+                # 該範圍的向量庫已重建：清除舊版本的結果
+                self._conn.execute("DELETE FROM results WHERE scope = ? AND index_version != ?", (scope, index_version))
+                self._known_versions[scope] = index_version
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (key, scope, index_version, json.dumps(results, ensure_ascii=False), time.time())
+            )
+            self._after_write(1)
+
+    # ---------- 維護 ----------
+
+    def _after_write(self, count: int):
+        """定期提交並將磁碟快取修剪到上限（依最後使用時間淘汰）"""
+        self._writes += count
+        self._conn.commit()
+        if self._writes < 1000:
+            return
+        self._writes = 0
+        for table in ("vectors", "results"):
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE key IN (SELECT key FROM {table} ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_rows,)
+            )
+        self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._vectors.clear()
+            self._results.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM vectors")
+                self._conn.execute("DELETE FROM results")
+                self._conn.commit()
+
+
+_query_cache: Optional[QueryCache] = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> QueryCache:
+    """行程層級的單一快取實例"""
+    global _query_cache
+    if _query_cache is None:
+        with _query_cache_lock:
+            if _query_cache is None:
+                _query_cache = QueryCache()
+    return _query_cache
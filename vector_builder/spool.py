@@ -0,0 +1,416 @@
+# vector_builder/spool.py
+"""
+建置暫存區（spool）：串流建置時每批向量與 metadata 立即落盤
+- 向量依序附加到 spool_vectors.f32（float32 原始位元組），metadata 寫入 spool_chunks.sqlite
+- 每批先寫入並 fsync 向量，再提交 metadata；中斷時最多遺失正在寫入的一批
+- 重新開啟時以已提交的 metadata 筆數為準，截掉多寫的向量位元組
+- 每批同時記錄頁面檢查點（已完整寫入的頁與其段落數），續傳時從未完成的頁開始解析，
+  不需重新擷取與分段整份 PDF
+- 全部檔案完成後以 memmap 分塊加入 FAISS 索引，metadata 逐筆轉入 chunk_metadata.sqlite
+- 去重後的重複段落只記錄來源參照（不佔向量列），於 finalize 時併入代表段落的 sources
+- 代表段落所屬檔案失敗（未標記完成）時，以暫存區中該段落的向量替重複段落建立一列（promote），來源不遺失
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Callable, Collection, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from vector_builder.dedup import CONTENT_KEY_FIELD, DUPLICATE_OF_FIELD, SOURCE_REF_FIELDS, source_ref
+
+SPOOL_DIR_NAME = "_spool"
+VECTOR_FILE_NAME = "spool_vectors.f32"
+CHUNK_DB_NAME = "spool_chunks.sqlite"
+
+# 加入索引時每次讀取的向量數
+BLOCK_SIZE = 8192
+# FAISS 建議每個分群最多使用的訓練向量數
+MAX_POINTS_PER_CENTROID = 256
+
+
+def committed_chunks(spool_dir, file_id: str) -> int:
+    """
+    回傳某檔案已提交到暫存區的段落數（續傳時略過）。
+    使用獨立的唯讀連線，可於解析執行緒呼叫。
+    """
+    db_path = Path(spool_dir) / CHUNK_DB_NAME
+    if not db_path.exists():
+        return 0
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM chunks WHERE file_id = ?", (file_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+class ResumePoint(NamedTuple):
+    start_page: int     # 自此頁（0 起算）開始重新解析
+    skip_chunks: int    # 該頁起已寫入、需略過的段落數
+
+
+def resume_point(spool_dir, file_id: str) -> ResumePoint:
+    """
+    某檔案的續傳位置：檢查點之前的頁不再解析，檢查點頁之後已寫入的段落於解析後略過。
+    沒有檢查點（舊版暫存區或尚未跨頁）時從第一頁開始，略過全部已寫入的段落。
+    使用獨立的唯讀連線，可於解析執行緒呼叫。
+    """
+    db_path = Path(spool_dir) / CHUNK_DB_NAME
+    if not db_path.exists():
+        return ResumePoint(0, 0)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        committed = conn.execute("SELECT COUNT(*) FROM chunks WHERE file_id = ?", (file_id,)).fetchone()[0]
+        try:
+            row = conn.execute("SELECT next_page, chunks_before FROM checkpoints WHERE file_id = ?",
+                               (file_id,)).fetchone()
+        except sqlite3.OperationalError:
+            row = None  # 舊版暫存區沒有 checkpoints 表
+    finally:
+        conn.close()
+    if row is None:
+        return ResumePoint(0, committed)
+    return ResumePoint(row[0], committed - row[1])
+
+
+def canonical_texts(spool_dir) -> Iterator[Tuple[str, str]]:
+    """
+    回傳暫存區中代表段落的 (content_key, text)，續傳時用於重建去重狀態。
+    使用獨立的唯讀連線，可於解析執行緒呼叫。
+    """
+    db_path = Path(spool_dir) / CHUNK_DB_NAME
+    if not db_path.exists():
+        return
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(
+            "SELECT content_key, meta FROM chunks WHERE dup_of IS NULL AND content_key IS NOT NULL ORDER BY seq"
+        )
+        for key, meta in rows:
+            yield key, json.loads(meta).get("text", "")
+    finally:
+        conn.close()
+
+
+class SpoolResult(NamedTuple):
+    # {file_id: [[起始向量 ID, 結束向量 ID), ...]}
+    file_ranges: Dict[str, List[List[int]]]
+    # {file_id: 與其有去重關聯的 file_id}（重複段落與代表段落分屬不同檔案）
+    links: Dict[str, Set[str]]
+
+
+def _stored_fingerprint(spool_dir: Path):
+    db_path = spool_dir / CHUNK_DB_NAME
+    if not db_path.exists():
+        return None
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM info WHERE key = 'fingerprint'").fetchone()
+    except sqlite3.OperationalError:
+        row = None  # 舊版暫存區沒有 info 表
+    finally:
+        conn.close()
+    return row[0] if row else ""
+
+
+class BuildSpool:
+    def __init__(self, spool_dir, dimension: int, fingerprint: str = ""):
+        self.spool_dir = Path(spool_dir)
+        if fingerprint and _stored_fingerprint(self.spool_dir) not in (None, fingerprint):
+            # 暫存內容以不同的分段／模型設定產生，不能續用
+            logging.warning("⚠️ 建置設定已變更，捨棄暫存區：%s", self.spool_dir)
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.dimension = dimension
+        self._row_bytes = dimension * 4
+        self.vector_path = self.spool_dir / VECTOR_FILE_NAME
+
+        self._conn = sqlite3.connect(str(self.spool_dir / CHUNK_DB_NAME))
+        # dup_of 非 NULL 的列為重複段落：沒有向量，meta 只存來源參照
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (seq INTEGER PRIMARY KEY, file_id TEXT, content_key TEXT, "
+            "dup_of TEXT, meta TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_file ON chunks (file_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS files (file_id TEXT PRIMARY KEY, done INTEGER)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+        # 頁面檢查點：next_page（0 起算）之前的頁已完整寫入，共 chunks_before 段；last_page 為最後一段所在頁
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints (file_id TEXT PRIMARY KEY, next_page INTEGER, "
+            "chunks_before INTEGER, last_page INTEGER)"
+        )
+        if fingerprint:
+            self._conn.execute("INSERT OR REPLACE INTO info VALUES ('fingerprint', ?)", (fingerprint,))
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM chunks WHERE dup_of IS NULL").fetchone()[0]
+        # {file_id: [已寫入段落數, 最後一段所在頁]}
+        self._progress: Dict[str, List[int]] = {}
+        self._recover()
+        self._vector_file = open(self.vector_path, "ab")
+
+    def _recover(self):
+        """以已提交的筆數為準修正向量檔長度"""
+        expected = self._count * self._row_bytes
+        size = self.vector_path.stat().st_size if self.vector_path.exists() else 0
+        if size < expected:
+            raise RuntimeError(f"暫存向量檔不完整（{size} < {expected} bytes）：{self.vector_path}")
+        if size > expected:
+            logging.warning("⚠️ 捨棄未提交的暫存向量 %d 筆", (size - expected) // self._row_bytes)
+            with open(self.vector_path, "r+b") as f:
+                f.truncate(expected)
+
+    def __len__(self) -> int:
+        """暫存的向量數（不含重複段落）"""
+        return self._count
+
+    def chunks_done(self, file_id: str) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM chunks WHERE file_id = ?", (file_id,)).fetchone()[0]
+
+    def _checkpoint(self, file_id: str, metadata_list: List[Dict]) -> Tuple[List[int], Optional[Tuple]]:
+        """
+        依本批段落的頁碼推進檢查點：段落依頁序寫入，最後一個換頁處之前的頁皆已完整寫入。
+        回傳 (寫入後的進度, checkpoints 表的新列)；本批未換頁時新列為 None。
+        """
+        if file_id not in self._progress:
+            row = self._conn.execute("SELECT last_page FROM checkpoints WHERE file_id = ?", (file_id,)).fetchone()
+            self._progress[file_id] = [self.chunks_done(file_id), row[0] if row else None]
+        done, last_page = self._progress[file_id]
+
+        boundary = None
+        for i, meta in enumerate(metadata_list):
+            page = meta.get("page")
+            if page != last_page:
+                boundary = (page, done + i)
+                last_page = page
+        progress = [done + len(metadata_list), last_page]
+        if boundary is None or boundary[0] is None:
+            return progress, None
+        page, chunks_before = boundary
+        return progress, (file_id, page - 1, chunks_before, last_page)
+
+    def append(self, file_id: str, vectors: np.ndarray, metadata_list: List[Dict]):
+        """
+        寫入一批段落；vectors 依序對應 metadata_list 中非重複的段落。回傳前兩者皆已落盤。
+        """
+        rows = []
+        for meta in metadata_list:
+            meta = dict(meta)
+            key = meta.pop(CONTENT_KEY_FIELD, None)
+            dup_of = meta.pop(DUPLICATE_OF_FIELD, None)
+            payload = source_ref(meta) if dup_of else meta
+            rows.append((file_id, key, dup_of, json.dumps(payload, ensure_ascii=False)))
+        num_vectors = sum(1 for row in rows if row[2] is None)
+
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if num_vectors and vectors.shape != (num_vectors, self.dimension):
+            raise ValueError(f"向量形狀 {vectors.shape} 與段落數 {num_vectors} / 維度 {self.dimension} 不一致")
+
+        if num_vectors:
+            self._vector_file.write(vectors.tobytes())
+            self._vector_file.flush()
+            os.fsync(self._vector_file.fileno())
+
+        # 段落與檢查點於同一個交易提交
+        progress, checkpoint = self._checkpoint(file_id, metadata_list)
+        self._conn.executemany("INSERT INTO chunks (file_id, content_key, dup_of, meta) VALUES (?, ?, ?, ?)", rows)
+        if checkpoint is not None:
+            self._conn.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?)", checkpoint)
+        self._conn.commit()
+        self._count += num_vectors
+        self._progress[file_id] = progress
+
+    def mark_done(self, file_id: str):
+        self._conn.execute("INSERT OR REPLACE INTO files VALUES (?, 1)", (file_id,))
+        self._conn.commit()
+
+    def unfinished(self, file_ids: List[str]) -> List[str]:
+        """尚未標記完成的檔案（失敗或未處理），其暫存內容需保留供下次續傳"""
+        done = {row[0] for row in self._conn.execute("SELECT file_id FROM files WHERE done = 1")}
+        return [file_id for file_id in file_ids if file_id not in done]
+
+    def retain(self, file_ids: List[str]):
+        """只保留指定檔案的完成標記（前次中斷後已刪除的檔案不會寫入索引）"""
+        keep = set(file_ids)
+        stale = [row[0] for row in self._conn.execute("SELECT file_id FROM files") if row[0] not in keep]
+        self._conn.executemany("DELETE FROM files WHERE file_id = ?", ((f,) for f in stale))
+        self._conn.commit()
+
+    def _vectors(self) -> np.ndarray:
+        if self._count == 0:
+            return np.zeros((0, self.dimension), dtype="float32")
+        return np.memmap(self.vector_path, dtype="float32", mode="r", shape=(self._count, self.dimension))
+
+    def ready_count(self) -> int:
+        """已標記完成的檔案向量數（finalize 時實際加入索引的筆數）"""
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM chunks WHERE dup_of IS NULL "
+            "AND file_id IN (SELECT file_id FROM files WHERE done = 1)"
+        ).fetchone()[0]
+
+    def _ready_mask(self, promoted: Collection[int] = ()) -> np.ndarray:
+        rows = self._conn.execute(
+            "SELECT c.seq, f.done IS NOT NULL FROM chunks c LEFT JOIN files f ON c.file_id = f.file_id "
+            "WHERE c.dup_of IS NULL ORDER BY c.seq"
+        ).fetchall()
+        return np.array([bool(done) or seq in promoted for seq, done in rows], dtype=bool)
+
+    def _orphan_canonicals(self, keys: Collection[str]) -> Dict[int, str]:
+        """
+        只存在於未完成檔案的代表段落 {seq: content_key}（每個 key 取第一列）；
+        已完成檔案中有相同 key 的代表段落時不列入
+        """
+        ready, found = set(), {}
+        for seq, key, done in self._conn.execute(
+            "SELECT c.seq, c.content_key, f.done IS NOT NULL FROM chunks c LEFT JOIN files f "
+            "ON c.file_id = f.file_id WHERE c.dup_of IS NULL AND c.content_key IS NOT NULL ORDER BY c.seq"
+        ):
+            if key not in keys:
+                continue
+            if done:
+                ready.add(key)
+            else:
+                found.setdefault(key, seq)
+        return {seq: key for key, seq in found.items() if key not in ready}
+
+    def iter_vector_blocks(self, block_size: int = BLOCK_SIZE, promoted: Collection[int] = ()) -> Iterator[np.ndarray]:
+        """分塊讀出已完成檔案的向量（中途失敗的檔案不加入索引；promoted 為額外加入的列）"""
+        vectors = self._vectors()
+        mask = self._ready_mask(promoted)
+        for start in range(0, len(vectors), block_size):
+            block_mask = mask[start:start + block_size]
+            if block_mask.any():
+                yield np.ascontiguousarray(vectors[start:start + block_size][block_mask])
+
+    def _iter_rows(self, where: str, batch_size: int = 1000) -> Iterator[Tuple[int, str, str, str, Dict]]:
+        last_seq = 0
+        while True:
+            rows = self._conn.execute(
+                f"SELECT seq, file_id, content_key, dup_of, meta FROM chunks WHERE seq > ? AND {where} "
+                "ORDER BY seq LIMIT ?", (last_seq, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for seq, file_id, key, dup_of, meta in rows:
+                yield seq, file_id, key, dup_of, json.loads(meta)
+            last_seq = rows[-1][0]
+
+    def iter_metadata(self, promoted: Collection[int] = ()) -> Iterator[Tuple[int, str, Optional[str], Dict]]:
+        """
+        依寫入順序讀出已完成檔案的 (seq, file_id, content_key, metadata)，與 iter_vector_blocks 一一對應
+        promoted 中的列（未完成檔案的代表段落）一併讀出
+        """
+        where = "file_id IN (SELECT file_id FROM files WHERE done = 1)"
+        if promoted:
+            where = f"({where} OR seq IN ({','.join(str(int(seq)) for seq in promoted)}))"
+        for seq, file_id, key, _, meta in self._iter_rows(f"dup_of IS NULL AND {where}"):
+            yield seq, file_id, key, meta
+
+    def iter_duplicates(self) -> Iterator[Tuple[str, str, Dict]]:
+        """已完成檔案的重複段落 (file_id, 代表段落 content_key, 來源參照)"""
+        for _, file_id, _, dup_of, ref in self._iter_rows(
+            "dup_of IS NOT NULL AND file_id IN (SELECT file_id FROM files WHERE done = 1)"
+        ):
+            yield file_id, dup_of, ref
+
+    def sample(self, max_rows: int) -> np.ndarray:
+        """等距抽樣作為 IVF 訓練資料"""
+        vectors = self._vectors()
+        if len(vectors) <= max_rows:
+            return np.array(vectors)
+        rows = np.linspace(0, len(vectors) - 1, max_rows).astype("int64")
+        return np.ascontiguousarray(vectors[rows])
+
+    def finalize_into(self, store, output_dir, existing_keys: Optional[Dict[str, int]] = None,
+                      id_to_file: Optional[Callable[[int], Optional[str]]] = None) -> SpoolResult:
+        """
+        將已完成檔案的暫存內容接在 store 既有向量之後並儲存到 output_dir。
+        需訓練的索引以抽樣向量訓練，向量分塊加入，全程不需把整個語料讀入記憶體。
+        未完成（解析或嵌入失敗）的檔案不會寫入，且不在建置紀錄中，下次建置會重新處理。
+        重複段落併入代表段落的 sources；代表段落已在索引中時（existing_keys: content_key → 向量 ID）
+        直接更新其 metadata，id_to_file 用於記錄跨檔案的去重關聯。
+        代表段落所屬檔案未完成時，該段落改由第一個重複段落的檔案擁有（metadata 換成其來源），
+        其他重複段落併入其 sources；失敗檔案之後重建時另有自己的一列。
+        """
+        self._vector_file.flush()
+        existing_keys = existing_keys or {}
+        links: Dict[str, Set[str]] = {}
+
+        def link(a: Optional[str], b: Optional[str]):
+            if a and b and a != b:
+                links.setdefault(a, set()).add(b)
+                links.setdefault(b, set()).add(a)
+
+        duplicates: Dict[str, List[Tuple[str, Dict]]] = {}
+        for file_id, dup_of, ref in self.iter_duplicates():
+            duplicates.setdefault(dup_of, []).append((file_id, ref))
+
+        # 代表段落已在索引中：更新其來源清單
+        existing_hits = {existing_keys[key]: key for key in duplicates if key in existing_keys}
+        if existing_hits:
+            ids, updated = [], []
+            for chunk in store.get_chunks(list(existing_hits)):
+                vector_id = chunk.pop("vector_id")
+                key = existing_hits[vector_id]
+                meta = chunk
+                meta["sources"] = meta.get("sources") or [source_ref(meta)]
+                for file_id, ref in duplicates.pop(key):
+                    meta["sources"].append(ref)
+                    link(file_id, id_to_file(vector_id) if id_to_file else None)
+                ids.append(vector_id)
+                updated.append(meta)
+            store.replace_metadata(ids, updated)
+
+        # 代表段落屬於未完成的檔案：改由重複段落的檔案擁有
+        promoted = self._orphan_canonicals(set(duplicates)) if duplicates else {}
+        if promoted:
+            logging.info("代表段落所屬檔案未完成，%d 筆重複段落改為獨立向量", len(promoted))
+
+        if not store.index.is_trained:
+            store.train(self.sample(store.index_params["nlist"] * MAX_POINTS_PER_CENTROID))
+
+        start_id = store.next_id
+        if store.index.is_trained:
+            for block in self.iter_vector_blocks(promoted=promoted):
+                store.add_index_vectors(block)
+
+        file_ranges: Dict[str, List[List[int]]] = {}
+
+        def new_rows() -> Iterator[Tuple[int, Dict]]:
+            if start_id == store.next_id:
+                return
+            for offset, (seq, file_id, key, meta) in enumerate(self.iter_metadata(promoted)):
+                vector_id = start_id + offset
+                if seq in promoted:
+                    # 第一個重複段落成為此列的擁有者，文字與向量沿用未完成檔案的代表段落
+                    file_id, ref = duplicates[key].pop(0)
+                    meta = {k: v for k, v in meta.items() if k not in SOURCE_REF_FIELDS}
+                    meta.update(ref)
+                ranges = file_ranges.setdefault(file_id, [])
+                if ranges and ranges[-1][1] == vector_id:
+                    ranges[-1][1] = vector_id + 1
+                else:
+                    ranges.append([vector_id, vector_id + 1])
+                if key in duplicates:
+                    meta["sources"] = [source_ref(meta)]
+                    for dup_file, ref in duplicates.pop(key):
+                        meta["sources"].append(ref)
+                        link(dup_file, file_id)
+                yield vector_id, meta
+
+        store.save(output_dir, metadata_rows=new_rows())
+        if duplicates:
+            logging.warning("⚠️ %d 組重複段落找不到代表段落，未記錄來源", len(duplicates))
+        return SpoolResult(file_ranges, links)
+
+    def close(self):
+        self._vector_file.close()
+        self._conn.close()
+
+    def remove(self):
+        """完成後刪除暫存區"""
+        self.close()
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
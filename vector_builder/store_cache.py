@@ -0,0 +1,119 @@
+# vector_builder/store_cache.py
+"""
+行程共用的向量庫快取
+- 同一個 Streamlit 行程內，所有 session / RAGRetriever / GuidedRAG 共用已載入的 VectorStore
+- 依記憶體預算做 LRU 淘汰（以索引與 metadata 檔案大小估算）
+- 索引以 FAISS mmap 方式開啟：IVF 系列（及 FAISS 1.10 起的 flat）多個 worker 可共用作業系統的分頁快取，
+  HNSW 與較舊 FAISS 的 flat 仍各自讀入記憶體（見 VectorStore.load）
+- 檔案在磁碟上被重建（mtime / 大小改變）時才重新載入
+"""
+
+import os
+import threading
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from vector_builder.model_registry import DEFAULT_MODEL_NAME
+from vector_builder.vector_store import VectorStore
+from vector_builder.metadata_store import METADATA_DB_NAME, METADATA_JSON_NAME
+
+DEFAULT_BUDGET_MB = int(os.getenv("VECTOR_CACHE_MB", "1024"))
+
+# 判斷向量庫是否變更時檢查的檔案
+WATCHED_FILES = ("faiss_index.index", METADATA_DB_NAME, METADATA_JSON_NAME, "vector_info.json")
+
+
+class StoreCache:
+    def __init__(self, max_bytes: int = DEFAULT_BUDGET_MB * 1024 * 1024, use_mmap: bool = True):
+        self.max_bytes = max_bytes
+        self.use_mmap = use_mmap
+        self._entries: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _signature(path: Path) -> Tuple:
+        sig = []
+        for name in WATCHED_FILES:
+            file_path = path / name
+            if file_path.exists():
+                stat = file_path.stat()
+                sig.append((name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sig)
+
+    @staticmethod
+    def _estimate_bytes(signature: Tuple) -> int:
+        return sum(size for _, _, size in signature)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry["bytes"] for entry in self._entries.values())
+
+    def get(self, path, model_name: str = DEFAULT_MODEL_NAME) -> VectorStore:
+        """
+        取得向量庫；未載入或磁碟檔案已變更時才重新讀取。
+        """
+        path = Path(path)
+        key = (str(path.resolve()), model_name)
+
+        with self._lock:
+            signature = self._signature(path)
+            entry = self._entries.get(key)
+            if entry and entry["signature"] == signature:
+                self._entries.move_to_end(key)
+                return entry["store"]
+
+            if entry:
+                logging.info("向量庫已變更，重新載入：%s", path)
+
+            store = VectorStore(model_name=model_name)
+            store.load(path, mmap=self.use_mmap)
+            self._entries[key] = {
+                "store": store,
+                "signature": signature,
+                "bytes": self._estimate_bytes(signature)
+            }
+            self._entries.move_to_end(key)
+            self._evict(keep=key)
+            return store
+
+    def _evict(self, keep: Tuple):
+        """超過記憶體預算時，從最久未使用的向量庫開始釋放（保留剛載入的那一個）"""
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._entries.pop(oldest)
+            logging.info("向量庫快取超出預算，釋放：%s", oldest[0])
+
+    def invalidate(self, path: Optional[str] = None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            resolved = str(Path(path).resolve())
+            for key in [k for k in self._entries if k[0] == resolved]:
+                self._entries.pop(key)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "stores": [k[0] for k in self._entries],
+                "total_mb": round(self.total_bytes / 1024 / 1024, 1),
+                "budget_mb": round(self.max_bytes / 1024 / 1024, 1)
+            }
+
+
+_store_cache: Optional[StoreCache] = None
+_store_cache_lock = threading.Lock()
+
+
+def get_store_cache() -> StoreCache:
+    """行程層級的單一快取實例"""
+    global _store_cache
+    if _store_cache is None:
+        with _store_cache_lock:
+            if _store_cache is None:
+                _store_cache = StoreCache()
+    return _store_cache
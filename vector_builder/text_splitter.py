@@ -0,0 +1,145 @@
+# vector_builder/text_splitter.py
+"""
+以 token 數為上限的分段器（不依賴 langchain）
+- 先依空行與標題切成段落，再依中英文句末標點切句，句子依序合併到 token 上限
+- 標題（第一章、一、1.2、Chapter 等短行）一律作為新段落的開頭，不與前一節合併
+- PDF 版面換行在段落內合併：中文直接相接，英文以空白相接
+- 相鄰段落保留 chunk_overlap 個 token 以內的句子重疊（不跨標題）
+- 單句超過上限時依逗號、頓號等再切，仍過長才依 token 硬切
+"""
+
+import re
+from typing import List, NamedTuple
+
+from .tokenizer import CJK_PATTERN, count_tokens, split_by_tokens
+
+MAX_HEADING_CHARS = 40
+
+HEADING_PATTERN = re.compile(
+    r"^(第[一二三四五六七八九十百零〇\d]+[章節條篇部編]"
+    r"|[一二三四五六七八九十]+[、．]"
+    r"|[（(][一二三四五六七八九十\d]+[)）]"
+    r"|\d+(\.\d+)*[\s、．]"
+    r"|(chapter|section|part|annex|appendix)\s)",
+    re.IGNORECASE
+)
+# 句末標點之後斷句（英文句點須後接空白，避免切開 14064.1、e.g. 之類的縮寫與編號）
+SENTENCE_PATTERN = re.compile(r"(?<=[。！？；!?;])|(?<=\.)(?=\s)")
+CLAUSE_PATTERN = re.compile(r"(?<=[，、：,:])")
+SENTENCE_ENDINGS = tuple("。！？；!?;.:：")
+
+
+class _Unit(NamedTuple):
+    text: str
+    tokens: int
+    heading: bool
+    new_line: bool   # 與前一單位之間換行（新段落或標題）
+
+
+def _is_heading(line: str) -> bool:
+    return (len(line) <= MAX_HEADING_CHARS and not line.endswith(SENTENCE_ENDINGS)
+            and HEADING_PATTERN.match(line) is not None)
+
+
+def _join_line(paragraph: str, line: str) -> str:
+    if not paragraph:
+        return line
+    if CJK_PATTERN.match(paragraph[-1]) or CJK_PATTERN.match(line[0]):
+        return paragraph + line
+    return paragraph + " " + line
+
+
+class TokenTextSplitter:
+    def __init__(self, chunk_size: int = 300, chunk_overlap: int = 40):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap 需小於 chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def _paragraphs(self, text: str) -> List[tuple]:
+        """回傳 [(段落文字, 是否為標題)]"""
+        paragraphs, current = [], ""
+        for raw_line in text.splitlines():
+            line = raw_line.strip()
+            if not line:
+                if current:
+                    paragraphs.append((current, False))
+                    current = ""
+            elif _is_heading(line):
+                if current:
+                    paragraphs.append((current, False))
+                    current = ""
+                paragraphs.append((line, True))
+            else:
+                current = _join_line(current, line)
+        if current:
+            paragraphs.append((current, False))
+        return paragraphs
+
+    def _pieces(self, sentence: str) -> List[str]:
+        """將超過上限的句子依子句、再依 token 切開"""
+        if count_tokens(sentence) <= self.chunk_size:
+            return [sentence]
+        pieces = []
+        for clause in (c for c in CLAUSE_PATTERN.split(sentence) if c):
+            if count_tokens(clause) <= self.chunk_size:
+                pieces.append(clause)
+            else:
+                pieces.extend(split_by_tokens(clause, self.chunk_size))
+        return pieces
+
+    def _units(self, text: str) -> List[_Unit]:
+        units = []
+        for paragraph, heading in self._paragraphs(text):
+            if heading:
+                units.append(_Unit(paragraph, count_tokens(paragraph), True, True))
+                continue
+            first = True
+            for sentence in SENTENCE_PATTERN.split(paragraph):
+                sentence = sentence.strip()
+                if not sentence:
+                    continue
+                for piece in self._pieces(sentence):
+                    units.append(_Unit(piece, count_tokens(piece), False, first))
+                    first = False
+        return units
+
+    def split_text(self, text: str) -> List[str]:
+        chunks: List[str] = []
+        current: List[_Unit] = []
+        carried = 0      # current 開頭由上一段帶入的重疊單位數
+        tokens = 0
+
+        def render(units: List[_Unit]) -> str:
+            parts = []
+            for i, unit in enumerate(units):
+                if i and unit.new_line:
+                    parts.append("\n")
+                elif i and not CJK_PATTERN.match(unit.text[0]):
+                    parts.append(" ")
+                parts.append(unit.text)
+            return "".join(parts).strip()
+
+        for unit in self._units(text):
+            has_new = len(current) > carried
+            if has_new and (unit.heading or tokens + unit.tokens > self.chunk_size):
+                chunks.append(render(current))
+                overlap: List[_Unit] = []
+                if not unit.heading:
+                    budget = min(self.chunk_overlap, self.chunk_size - unit.tokens)
+                    for prev in reversed(current):
+                        if prev.heading or budget - prev.tokens < 0:
+                            break
+                        overlap.insert(0, prev)
+                        budget -= prev.tokens
+                current, carried = overlap, len(overlap)
+                tokens = sum(u.tokens for u in current)
+            elif not has_new and unit.heading:
+                # 只剩重疊內容時遇到標題：捨棄重疊，從標題開始
+                current, carried, tokens = [], 0, 0
+            current.append(unit)
+            tokens += unit.tokens
+
+        if len(current) > carried:
+            chunks.append(render(current))
+        return [chunk for chunk in chunks if chunk]
@@ -0,0 +1,88 @@
+# vector_builder/tokenizer.py
+"""
+段落與 prompt 的 token 計數
+- 安裝 tiktoken 時使用 GPT 模型的實際編碼（預設 cl100k_base，可用環境變數 TOKEN_ENCODING 指定）
+- 未安裝時改用估算：中日韓字元每字 1 token，其餘文字約每 4 個字元 1 token
+- 分段器以此量測段落大小，讓檢索段落放入 prompt 時的長度可預期
+"""
+
+import logging
+import os
+import re
+import threading
+from typing import List, Optional
+
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "cl100k_base")
+
+# 中日韓文字、全形標點
+_CJK_RANGES = r"\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef"
+CJK_PATTERN = re.compile(f"[{_CJK_RANGES}]")
+_WORD_PATTERN = re.compile(f"[^\\s{_CJK_RANGES}]+")
+
+_encoding = None
+_encoding_loaded = False
+_lock = threading.Lock()
+
+
+def _get_encoding():
+    """延遲載入 tiktoken 編碼；未安裝或載入失敗時回傳 None（改用估算）"""
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+    with _lock:
+        if not _encoding_loaded:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+            except Exception as e:
+                logging.warning("⚠️ 無法載入 tiktoken（%s），token 數改用估算", e)
+                _encoding = None
+            _encoding_loaded = True
+    return _encoding
+
+
+def tokenizer_name() -> str:
+    """目前使用的計數方式（列入分段設定，改變時整批重建）"""
+    return f"tiktoken:{TOKEN_ENCODING}" if _get_encoding() is not None else "estimate"
+
+
+def estimate_tokens(text: str) -> int:
+    cjk = len(CJK_PATTERN.findall(text))
+    other = sum((len(word) + 3) // 4 for word in _WORD_PATTERN.findall(text))
+    return cjk + other
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_by_tokens(text: str, max_tokens: int) -> List[str]:
+    """將單一過長的片段（無可用的斷句點）依 token 數硬切"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        pieces = [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+        # 切在多位元組字元中間時 decode 會產生替代字元，改以字元切分
+        if not any("�" in piece for piece in pieces):
+            return pieces
+
+    pieces, start, used = [], 0, 0
+    for pos, char in enumerate(text):
+        cost = count_tokens(char) if encoding is not None else (1 if CJK_PATTERN.match(char) else 0.25)
+        if used + cost > max_tokens and pos > start:
+            pieces.append(text[start:pos])
+            start, used = pos, 0
+        used += cost
+    pieces.append(text[start:])
+    return pieces
+
+
+def truncate_to_tokens(text: str, max_tokens: Optional[int]) -> str:
+    if max_tokens is None or count_tokens(text) <= max_tokens:
+        return text
+    return split_by_tokens(text, max_tokens)[0]
@@ -1,66 +1,438 @@
 # vector_builder/vector_store.py
 import json
+import uuid
 from pathlib import Path
 import logging
-from typing import List, Dict
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 import numpy as np
 import faiss
 
-from sentence_transformers import SentenceTransformer
+from vector_builder.model_registry import DEFAULT_MODEL_NAME
+from vector_builder.embedding_backends import EmbeddingBackend, SentenceTransformerBackend
+from vector_builder.query_cache import get_query_cache
+from vector_builder.atomic_io import atomic_path, write_json_atomic
+from vector_builder.metadata_store import (
+    ChunkMetadataStore, write_metadata_items, FILTER_FIELDS, METADATA_DB_NAME, METADATA_JSON_NAME
+)
+
+# ✅ 支援的索引類型：flat 為暴力搜尋（精確），其餘為近似最近鄰（ANN）
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# IVF 每個分群至少需要的訓練向量數（FAISS 建議值）
+MIN_POINTS_PER_CENTROID = 39
+
+# 整合語料庫（全部 PDF 共用一個索引）的資料夾名稱
+CORPUS_DIR_NAME = "_corpus"
+
+# HNSW 不支援移除向量，重建時每次讀回的向量數
+REBUILD_BLOCK_SIZE = 8192
+
+# mmap 讀取旗標：IO_FLAG_MMAP 只映射 IVF 的倒排清單；flat 的向量資料需 IO_FLAG_MMAP_IFC（FAISS 1.10 起）
+_MMAP_IFC = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+MMAP_FLAGS = faiss.IO_FLAG_MMAP | _MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+
+def mmap_shares_pages(index_type: str) -> bool:
+    """以 mmap 載入時，此索引類型的向量資料是否由作業系統分頁快取共用（而非讀入各行程記憶體）"""
+    return index_type in ("ivf_flat", "ivf_pq") or (index_type == "flat" and bool(_MMAP_IFC))
+
 
 class VectorStore:
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
-        self.model_name = model_name
-        self.embed_model = SentenceTransformer(self.model_name)
-        self.dimension = self.embed_model.get_sentence_embedding_dimension()
-        self.index = faiss.IndexFlatIP(self.dimension)
-        self.metadata: List[Dict] = []
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        index_type: str = "flat",
+        nlist: int = 100,
+        nprobe: int = 8,
+        ef_search: int = 64,
+        hnsw_m: int = 32,
+        pq_m: int = 16,
+        pq_nbits: int = 8,
+        use_query_cache: bool = True,
+        backend: Optional[EmbeddingBackend] = None
+    ):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"不支援的索引類型：{index_type}（可用：{', '.join(INDEX_TYPES)}）")
+
+        # ✅ 模型名稱與維度由嵌入後端提供；預設為本機 SentenceTransformer（由註冊表共用，同一行程只載入一次）
+        self.backend = backend or SentenceTransformerBackend(model_name)
+        self.model_name = self.backend.model_name
+        self.dimension = self.backend.dimension
+
+        if index_type == "ivf_pq" and self.dimension % pq_m != 0:
+            raise ValueError(f"IVF-PQ 的 pq_m={pq_m} 必須能整除向量維度 {self.dimension}")
+
+        self.index_type = index_type
+        self.index_params = {
+            "nlist": nlist,
+            "nprobe": nprobe,
+            "ef_search": ef_search,
+            "hnsw_m": hnsw_m,
+            "pq_m": pq_m,
+            "pq_nbits": pq_nbits
+        }
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []  # 需訓練的索引在建置完成前先暫存 (ids, 向量)
+        self.index = self._create_index()
+        self.next_id = 0  # 下一個可用的向量 ID（移除向量後 ID 不重複使用）
+        # 建置時為 {向量 ID: metadata}；自 SQLite 載入後為 ChunkMetadataStore（延遲讀取）
+        self.metadata: Union[Dict[int, Dict], ChunkMetadataStore] = {}
+        # SQLite metadata 為唯讀，移除與更新先記錄，儲存時一併寫入
+        self._deleted_ids: Set[int] = set()
+        self._metadata_updates: Dict[int, Dict] = {}
+        self._field_index: Optional[Dict[str, Dict[str, np.ndarray]]] = None
+        self.use_query_cache = use_query_cache
+        self.index_version = uuid.uuid4().hex  # 每次儲存／重建時更新，查詢結果快取以此判斷是否失效
+
+    def _create_index(self, num_train: int = 0):
+        """
+        依 index_type 建立 FAISS 索引，外層包 IndexIDMap2，向量 ID 可自訂並可個別移除。
+        IVF 類索引的分群數會依訓練資料量自動下修，避免小型文件訓練失敗。
+        """
+        return faiss.IndexIDMap2(self._create_base_index(num_train))
+
+    def _create_base_index(self, num_train: int = 0):
+        params = self.index_params
+        if self.index_type == "flat":
+            return faiss.IndexFlatIP(self.dimension)
+
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(self.dimension, params["hnsw_m"], faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efSearch = params["ef_search"]
+            return index
+
+        nlist = params["nlist"]
+        if num_train:
+            nlist = max(1, min(nlist, num_train // MIN_POINTS_PER_CENTROID))
+        quantizer = faiss.IndexFlatIP(self.dimension)
+
+        if self.index_type == "ivf_pq":
+            index = faiss.IndexIVFPQ(
+                quantizer, self.dimension, nlist,
+                params["pq_m"], params["pq_nbits"], faiss.METRIC_INNER_PRODUCT
+            )
+        else:
+            index = faiss.IndexIVFFlat(quantizer, self.dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.nprobe = min(params["nprobe"], nlist)
+        return index
+
+    def train(self, sample: np.ndarray):
+        """
+        以（抽樣）向量訓練 IVF 類索引；flat / HNSW 或已訓練的索引不需訓練。
+        分群數依訓練資料量自動下修。
+        """
+        if self.index.is_trained or len(sample) == 0:
+            return
+
+        if self.index_type == "ivf_pq" and len(sample) < 2 ** self.index_params["pq_nbits"]:
+            logging.warning("⚠️ 向量數 %d 不足以訓練 IVF-PQ，改用 IVF-Flat", len(sample))
+            self.index_type = "ivf_flat"
+
+        self.index = self._create_index(num_train=len(sample))
+        self.index.train(np.ascontiguousarray(sample, dtype="float32"))
+        self.index_params["nlist"] = faiss.extract_index_ivf(self.index).nlist
+
+    def _base_index(self):
+        """取得 IndexIDMap2 內層的實際索引（舊版索引沒有外層）"""
+        if isinstance(self.index, faiss.IndexIDMap):
+            return faiss.downcast_index(self.index.index)
+        return self.index
+
+    def _has_id_map(self) -> bool:
+        return isinstance(self.index, faiss.IndexIDMap)
+
+    def _add_with_ids(self, vectors: np.ndarray, ids: np.ndarray):
+        if self._has_id_map():
+            self.index.add_with_ids(vectors, ids)
+        else:
+            # 舊版索引的向量 ID 即加入順序
+            if len(ids) and ids[0] != self.index.ntotal:
+                raise ValueError("舊版索引（無 ID 對照）只能依序加入向量，請完整重建")
+            self.index.add(vectors)
+
+    def _allocate_ids(self, count: int) -> np.ndarray:
+        ids = np.arange(self.next_id, self.next_id + count, dtype="int64")
+        self.next_id += count
+        return ids
+
+    def build(self):
+        """
+        以暫存向量訓練索引並加入（IVF 系列需先訓練才能加入向量）。
+        save、search 與 remove_ids 會自動呼叫；需單獨量測建置耗時時（例如 benchmark）可直接呼叫。
+        """
+        if not self._pending:
+            return
+
+        ids = np.concatenate([block_ids for block_ids, _ in self._pending])
+        vectors = np.vstack([block for _, block in self._pending])
+        self._pending = []
+        self.train(vectors)
+        self._add_with_ids(vectors, ids)
+
+    def add_index_vectors(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        只將向量加入索引並回傳配發的 ID（metadata 由呼叫端於 save 時提供，供串流建置使用）。
+        """
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        ids = self._allocate_ids(len(vectors))
+        self._add_with_ids(vectors, ids)
+        return ids
+
+    def remove_ids(self, ids: Iterable[int]) -> int:
+        """
+        移除指定向量 ID 的向量與 metadata，回傳實際移除的向量數。
+        HNSW 不支援移除，改為以其餘向量重建圖（需暫時多佔一份索引記憶體）。
+        """
+        ids = np.asarray(sorted({int(i) for i in ids}), dtype="int64")
+        if len(ids) == 0:
+            return 0
+        if not self._has_id_map():
+            raise ValueError("舊版索引（無 ID 對照）不支援移除向量，請完整重建")
+        self.build()
+
+        if self.index_type == "hnsw":
+            removed = self._rebuild_without(ids)
+        else:
+            removed = int(self.index.remove_ids(ids))
+
+        if isinstance(self.metadata, ChunkMetadataStore):
+            self._deleted_ids.update(int(i) for i in ids)
+        else:
+            for i in ids:
+                self.metadata.pop(int(i), None)
+        for i in ids:
+            self._metadata_updates.pop(int(i), None)
+        self._field_index = None
+        return removed
+
+    def reconstruct_all(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        讀回索引中的全部 (向量 ID, 向量)。增量建置移除過向量後 ID 不再連續，
+        因此依 id_map 中的 ID 讀回，而非假設 ID 為 0..ntotal-1（舊版索引沒有 ID 對照時 ID 即順序）。
+        """
+        self.build()
+        if not self._has_id_map():
+            return np.arange(self.index.ntotal, dtype="int64"), self.index.reconstruct_n(0, self.index.ntotal)
+        ids = faiss.vector_to_array(self.index.id_map)
+        vectors = np.empty((len(ids), self.dimension), dtype="float32")
+        for start in range(0, len(ids), REBUILD_BLOCK_SIZE):
+            vectors[start:start + REBUILD_BLOCK_SIZE] = self.index.reconstruct_batch(ids[start:start + REBUILD_BLOCK_SIZE])
+        return ids, vectors
+
+    def _rebuild_without(self, ids: np.ndarray) -> int:
+        keep = np.setdiff1d(faiss.vector_to_array(self.index.id_map), ids)
+        rebuilt = self._create_index()
+        for start in range(0, len(keep), REBUILD_BLOCK_SIZE):
+            block_ids = keep[start:start + REBUILD_BLOCK_SIZE]
+            rebuilt.add_with_ids(self.index.reconstruct_batch(block_ids), block_ids)
+        removed = int(self.index.ntotal - rebuilt.ntotal)
+        self.index = rebuilt
+        return removed
+
+    def replace_metadata(self, ids: List[int], metadata_list: List[Dict]):
+        """更新既有向量的 metadata（檔案搬移或改名時使用，不需重新嵌入）"""
+        if len(ids) != len(metadata_list):
+            raise ValueError(f"ID 數 {len(ids)} 與 metadata 數 {len(metadata_list)} 不一致")
+        for i, meta in zip(ids, metadata_list):
+            if isinstance(self.metadata, ChunkMetadataStore):
+                self._metadata_updates[int(i)] = meta
+            else:
+                self.metadata[int(i)] = meta
+        self._field_index = None
+
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """
+        調整查詢時的精確度／速度取捨（IVF 的 nprobe、HNSW 的 efSearch）。
+        """
+        if nprobe is not None:
+            self.index_params["nprobe"] = nprobe
+            if self.index_type in ("ivf_flat", "ivf_pq"):
+                faiss.extract_index_ivf(self.index).nprobe = nprobe
+        if ef_search is not None:
+            self.index_params["ef_search"] = ef_search
+            if self.index_type == "hnsw":
+                self._base_index().hnsw.efSearch = ef_search
 
     def reset(self):
         """
         重設索引與 metadata，用於重新建構整個向量資料庫。
         """
-        self.index = faiss.IndexFlatIP(self.dimension)
-        self.metadata = []
+        self._pending = []
+        self.index = self._create_index()
+        self.next_id = 0
+        self.metadata = {}
+        self._deleted_ids = set()
+        self._metadata_updates = {}
+        self._field_index = None
 
     def get_query_vector(self, text: str) -> List[float]:
-        return self.embed_model.encode(text, convert_to_numpy=True).tolist()
+        return self.backend.embed([text])[0].tolist()
+
+    def get_query_vectors(self, texts: List[str]) -> np.ndarray:
+        """
+        一次編碼多筆查詢，回傳 (n, dim) 的 float32 矩陣。
+        已快取的查詢直接取用，只有未命中的查詢送進模型（仍為一次 encode）。
+        """
+        if not self.use_query_cache:
+            return self.backend.embed(texts)
+
+        cache = get_query_cache()
+        cached = cache.get_vectors(self.model_name, texts)
+        missing = [i for i, vec in enumerate(cached) if vec is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            encoded = self.backend.embed(missing_texts)
+            cache.put_vectors(self.model_name, missing_texts, encoded)
+            for i, vec in zip(missing, encoded):
+                cached[i] = vec
+        return np.vstack(cached).astype("float32")
+
+    def _materialize_metadata(self) -> Dict[int, Dict]:
+        """需要修改 metadata 時（例如延續建置），將 SQLite 內容讀回 dict"""
+        if isinstance(self.metadata, ChunkMetadataStore):
+            store = self.metadata
+            self.metadata = dict(self.iter_metadata())
+            self._deleted_ids = set()
+            self._metadata_updates = {}
+            store.close()
+        return self.metadata
+
+    def iter_metadata(self) -> Iterator[Tuple[int, Dict]]:
+        """依向量 ID 順序逐筆產出 (向量 ID, metadata)（SQLite 分頁讀取，不全部載入）"""
+        if not isinstance(self.metadata, ChunkMetadataStore):
+            for vector_id in sorted(self.metadata):
+                yield vector_id, self.metadata[vector_id]
+            return
+        for vector_id, meta in self.metadata.iter_rows():
+            if vector_id not in self._deleted_ids:
+                yield vector_id, self._metadata_updates.get(vector_id, meta)
+
+    def get_chunks(self, ids: List[int], scores: Optional[List[float]] = None) -> List[Dict]:
+        """
+        依向量 ID 直接取得段落（不需嵌入與搜尋，供預先計算的檢索結果使用）。
+        """
+        chunks = []
+        for i, meta in enumerate(self._fetch_metadata([int(x) for x in ids])):
+            if meta is None:
+                continue
+            chunk = dict(meta)
+            chunk["vector_id"] = int(ids[i])
+            if scores is not None:
+                chunk["score"] = float(scores[i])
+            chunks.append(chunk)
+        return chunks
 
-    def add_vectors(self, vectors: List[List[float]], metadata_list: List[Dict]):
-        self.index.add(np.array(vectors).astype("float32"))
-        self.metadata.extend(metadata_list)
+    def _fetch_metadata(self, ids: List[int]) -> List[Optional[Dict]]:
+        """依向量 ID 取得 metadata（dict 直接查找；SQLite 一次查詢多筆）"""
+        if isinstance(self.metadata, ChunkMetadataStore):
+            found = self.metadata.get_many(ids)
+            if self._deleted_ids or self._metadata_updates:
+                found = [
+                    None if i in self._deleted_ids else self._metadata_updates.get(i, meta)
+                    for i, meta in zip(ids, found)
+                ]
+            return found
+        return [self.metadata[i].copy() if i in self.metadata else None for i in ids]
 
-    def save(self, output_dir):
+    def add_vectors(self, vectors: Union[np.ndarray, List[List[float]]], metadata_list: List[Dict]):
+        """加入一批向量；傳入 float32 numpy 區塊時不會另外複製"""
+        self._materialize_metadata()
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if len(vectors) != len(metadata_list):
+            raise ValueError(f"向量數 {len(vectors)} 與 metadata 數 {len(metadata_list)} 不一致")
+        ids = self._allocate_ids(len(vectors))
+        if self.index.is_trained and not self._pending:
+            self._add_with_ids(vectors, ids)
+        else:
+            self._pending.append((ids, vectors))
+        self.metadata.update(zip(ids.tolist(), metadata_list))
+        self._field_index = None
+
+    def save(self, output_dir, metadata_rows: Optional[Iterable[Tuple[int, Dict]]] = None):
+        """
+        儲存索引、metadata 與 vector_info.json。
+        metadata_rows 供串流建置使用：向量已以 add_index_vectors 加入，新增的 (向量 ID, metadata)
+        由暫存區逐筆接在既有 metadata 之後寫入，儲存後改以 ChunkMetadataStore 讀取。
+        三個檔案皆先寫入暫存檔再原子取代；vector_info.json 最後寫入，作為這次儲存完成的標記
+        （load 時以 num_vectors 檢查索引與 vector_info.json 是否出自同一次儲存）。
+        """
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        faiss.write_index(self.index, str(output_dir / 'faiss_index.index'))
+        self.build()
+        self.index_version = uuid.uuid4().hex
+        with atomic_path(output_dir / 'faiss_index.index') as tmp_path:
+            faiss.write_index(self.index, str(tmp_path))
 
-        with open(output_dir / 'chunk_metadata.json', 'w', encoding='utf-8') as f:
-            json.dump(self.metadata, f, ensure_ascii=False, indent=2)
+        db_path = output_dir / METADATA_DB_NAME
+        if metadata_rows is None and not isinstance(self.metadata, ChunkMetadataStore):
+            write_metadata_items(db_path, self.iter_metadata())
+        else:
+            write_metadata_items(db_path, chain(self.iter_metadata(), metadata_rows or []))
+            if isinstance(self.metadata, ChunkMetadataStore):
+                self.metadata.close()
+            self.metadata = ChunkMetadataStore(db_path)
+            self._deleted_ids = set()
+            self._metadata_updates = {}
+            self._field_index = None
+        legacy_json = output_dir / METADATA_JSON_NAME
+        if legacy_json.exists():
+            legacy_json.unlink()  # 已由 SQLite 取代，避免新舊 metadata 不一致
 
         vector_info = {
             "vector_dim": self.dimension,
-            "model": self.model_name
+            "model": self.model_name,
+            "backend": self.backend.name,
+            "index_type": self.index_type,
+            "index_params": self.index_params,
+            "num_vectors": int(self.index.ntotal),
+            "next_id": self.next_id,
+            "index_version": self.index_version
         }
-        with open(output_dir / 'vector_info.json', 'w', encoding='utf-8') as f:
-            json.dump(vector_info, f, ensure_ascii=False, indent=2)
+        write_json_atomic(output_dir / 'vector_info.json', vector_info)
 
-        logging.info("向量資料與 metadata 已儲存至 %s", output_dir)
+        logging.info("向量資料與 metadata 已儲存至 %s（索引類型：%s）", output_dir, self.index_type)
 
-    def load(self, output_dir):
+    def load(self, output_dir, mmap: bool = False):
+        """
+        載入向量庫。mmap=True 時以唯讀記憶體映射開啟索引（僅供查詢，不可再加入向量），
+        若索引類型不支援 mmap 則改為一般讀取。
+        mmap 實際能共用分頁的範圍依 FAISS 版本與索引類型而定：
+        - IVF 系列（ivf_flat / ivf_pq）：倒排清單以 mmap 開啟，各 worker 共用作業系統分頁快取
+        - flat：需 FAISS 提供 IO_FLAG_MMAP_IFC（1.10 起）才會映射向量資料，較舊版本仍整份讀入記憶體
+        - hnsw：圖結構一律讀入記憶體，不共用
+        """
         output_dir = Path(output_dir)
         index_path = output_dir / 'faiss_index.index'
-        metadata_path = output_dir / 'chunk_metadata.json'
+        db_path = output_dir / METADATA_DB_NAME
+        json_path = output_dir / METADATA_JSON_NAME
         info_path = output_dir / 'vector_info.json'
 
-        if not index_path.exists() or not metadata_path.exists():
-            raise FileNotFoundError("找不到 faiss_index.index 或 chunk_metadata.json")
+        if not index_path.exists() or not (db_path.exists() or json_path.exists()):
+            raise FileNotFoundError(f"找不到 faiss_index.index 或 {METADATA_DB_NAME}")
 
-        self.index = faiss.read_index(str(index_path))
+        if mmap:
+            try:
+                self.index = faiss.read_index(str(index_path), MMAP_FLAGS)
+            except RuntimeError as e:
+                logging.warning("⚠️ 索引無法以 mmap 開啟，改為一般讀取：%s", e)
+                self.index = faiss.read_index(str(index_path))
+        else:
+            self.index = faiss.read_index(str(index_path))
+        self._pending = []
 
-        with open(metadata_path, 'r', encoding='utf-8') as f:
-            self.metadata = json.load(f)
+        if db_path.exists():
+            self.metadata = ChunkMetadataStore(db_path)
+        else:
+            # 尚未轉換的舊版資料夾（可執行 migrate_chunk_metadata.py 轉換）
+            logging.warning("⚠️ %s 仍使用 chunk_metadata.json，建議轉換為 SQLite", output_dir)
+            with open(json_path, 'r', encoding='utf-8') as f:
+                self.metadata = dict(enumerate(json.load(f)))
+        self._deleted_ids = set()
+        self._metadata_updates = {}
+        self._field_index = None
+        # 舊版 vector_info.json 沒有 next_id，向量 ID 即加入順序
+        self.next_id = int(self.index.ntotal)
 
         if info_path.exists():
             with open(info_path, 'r', encoding='utf-8') as f:
@@ -69,33 +441,142 @@ class VectorStore:
                     raise ValueError(f"向量維度不一致：index 為 {info['vector_dim']}，目前為 {self.dimension}")
                 if info["model"] != self.model_name:
                     logging.warning("⚠️ 模型名稱不一致：index 為 %s，目前為 %s", info["model"], self.model_name)
+                if info.get("num_vectors", self.index.ntotal) != self.index.ntotal:
+                    # 索引已取代但 vector_info.json 尚未寫入時中斷
+                    raise RuntimeError(f"索引與 vector_info.json 不一致（{self.index.ntotal} / {info['num_vectors']} 筆），"
+                                       f"前次儲存可能中斷，請重新建置：{output_dir}")
+
+                # 舊版 vector_info.json 沒有版本欄位，以索引檔的修改時間與大小代替
+                index_stat = index_path.stat()
+                self.index_version = info.get("index_version", f"{index_stat.st_mtime_ns}-{index_stat.st_size}")
+
+                # 舊版 vector_info.json 沒有索引類型欄位，一律視為 flat
+                self.index_type = info.get("index_type", "flat")
+                self.next_id = info.get("next_id", self.next_id)
+                self.index_params.update(info.get("index_params", {}))
+                self.set_search_params(
+                    nprobe=self.index_params["nprobe"],
+                    ef_search=self.index_params["ef_search"]
+                )
+                if mmap and not mmap_shares_pages(self.index_type):
+                    logging.info("索引類型 %s 無法以 mmap 共用分頁（已讀入記憶體）：%s", self.index_type, output_dir)
         else:
+            index_stat = index_path.stat()
+            self.index_version = f"{index_stat.st_mtime_ns}-{index_stat.st_size}"
             logging.warning("⚠️ 未偵測到 vector_info.json，請確認相容性")
 
     def exists(self, output_dir) -> bool:
         output_dir = Path(output_dir)
         return all([
             (output_dir / 'faiss_index.index').exists(),
-            (output_dir / 'chunk_metadata.json').exists(),
+            (output_dir / METADATA_DB_NAME).exists() or (output_dir / METADATA_JSON_NAME).exists(),
             (output_dir / 'vector_info.json').exists()
         ])
 
-    def search(self, query: str, top_k: int = 5) -> List[Dict]:
-        if not self.metadata:
+    def _build_field_index(self) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        建立 metadata 欄位 → 值 → 向量 ID 的反向索引（首次過濾查詢時建立）。
+        metadata 以向量 ID 為 key（移除向量後 ID 可能不連續）。
+        """
+        buckets: Dict[str, Dict[str, List[int]]] = {field: {} for field in FILTER_FIELDS}
+        for idx, meta in self.metadata.items():
+            # 去重合併的段落以每個來源的欄位值建立索引
+            for ref in [meta] + list(meta.get("sources") or ()):
+                for field in FILTER_FIELDS:
+                    value = ref.get(field)
+                    if value is not None:
+                        buckets[field].setdefault(str(value), []).append(idx)
+
+        return {
+            field: {value: np.unique(np.array(ids, dtype="int64")) for value, ids in values.items()}
+            for field, values in buckets.items()
+        }
+
+    def _filter_ids(self, filters: Dict[str, Union[str, List[str]]]) -> np.ndarray:
+        """
+        依過濾條件取得符合的向量 ID（同欄位多值取聯集，不同欄位取交集）。
+        """
+        if isinstance(self.metadata, ChunkMetadataStore):
+            return self.metadata.ids_where(filters)
+
+        if self._field_index is None:
+            self._field_index = self._build_field_index()
+
+        selected = None
+        for field, values in filters.items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"不支援的過濾欄位：{field}（可用：{', '.join(FILTER_FIELDS)}）")
+            if isinstance(values, str):
+                values = [values]
+            field_values = self._field_index[field]
+            ids = [field_values[v] for v in values if v in field_values]
+            ids = np.unique(np.concatenate(ids)) if ids else np.array([], dtype="int64")
+            selected = ids if selected is None else np.intersect1d(selected, ids)
+        return selected
+
+    def _search_params(self, ids: np.ndarray):
+        """
+        產生帶有 ID 選擇器的查詢參數，讓過濾在 FAISS 搜尋內完成（而非事後篩選）。
+        """
+        selector = faiss.IDSelectorBatch(ids)
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=self.index_params["nprobe"])
+        elif self.index_type == "hnsw":
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.index_params["ef_search"])
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        return params
+
+    def search(self, query: str, top_k: int = 5, filters: Optional[Dict[str, Union[str, List[str]]]] = None) -> List[Dict]:
+        """
+        查詢最相近的段落。
+        filters 可限定來源範圍，例如 {"doc": "ISO 14064-1"}、{"region": "taiwan", "language": "zh"}
+        """
+        return self.search_batch([query], top_k=top_k, filters=filters)[0]
+
+    def search_batch(self, queries: List[str], top_k: int = 5, filters: Optional[Dict[str, Union[str, List[str]]]] = None) -> List[List[Dict]]:
+        """
+        批次查詢：所有查詢共用一次 encode 與一次 index.search，結果依查詢順序分組回傳。
+        同一批查詢共用相同的 filters。
+        """
+        if not queries:
             return []
+        if not self.metadata:
+            return [[] for _ in queries]
+
+        self.build()
 
-        query_vec = self.get_query_vector(query)
-        query_vec = np.array([query_vec], dtype="float32")
+        params = None
+        if filters:
+            ids = self._filter_ids(filters)
+            if len(ids) == 0:
+                return [[] for _ in queries]
+            top_k = min(top_k, len(ids))
+            params = self._search_params(ids)
 
-        if query_vec.shape[1] != self.index.d:
-            raise ValueError(f"查詢向量維度 {query_vec.shape[1]} 與索引維度 {self.index.d} 不一致")
+        query_vecs = self.get_query_vectors(list(queries))
+
+        if query_vecs.shape[1] != self.index.d:
+            raise ValueError(f"查詢向量維度 {query_vecs.shape[1]} 與索引維度 {self.index.d} 不一致")
+
+        if params is None:
+            scores, indices = self.index.search(query_vecs, top_k)
+        else:
+            scores, indices = self.index.search(query_vecs, top_k, params=params)
 
-        scores, indices = self.index.search(query_vec, top_k)
+        # 只讀取命中的 metadata（ANN 索引在候選不足時會回傳 -1）
+        hit_ids = sorted({int(i) for i in indices.ravel() if i >= 0})
+        hits = dict(zip(hit_ids, self._fetch_metadata(hit_ids)))
 
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.metadata):
-                chunk = self.metadata[idx].copy()
-                chunk["score"] = float(score)
-                results.append(chunk)
-        return results
\ No newline at end of file
+        batch_results = []
+        for row_scores, row_indices in zip(scores, indices):
+            results = []
+            for score, idx in zip(row_scores, row_indices):
+                chunk = hits.get(int(idx))
+                if chunk is not None:
+                    chunk = dict(chunk)
+                    chunk["score"] = float(score)
+                    chunk["vector_id"] = int(idx)
+                    results.append(chunk)
+            batch_results.append(results)
+        return batch_results